@@ -1,17 +1,44 @@
 
 __version__ = "0.0.2.dev0"
 
+import contextlib
+import os
 import sys
 
 from gfx2cuda.gfx2cuda import *
-from gfx2cuda.backends import Texture
+from gfx2cuda.backends import Texture, SharedBuffer, PeerTexture, IpcHandle
 from gfx2cuda.format import TextureFormat
 from gfx2cuda.exception import Gfx2CudaError
+from gfx2cuda.stream import Event
+from gfx2cuda.pool import TexturePool
+from gfx2cuda.cache import IpcCache
 
 _instance = None
 
+# Imported on first access, they need numpy or modules that are slow to import
+_lazy_exports = {
+    'Capture': 'gfx2cuda.capture',
+    'FrameSource': 'gfx2cuda.capture',
+    'SharedTextureRing': 'gfx2cuda.ring',
+    'Conversion': 'gfx2cuda.convert',
+    'CopyExecutor': 'gfx2cuda.executor',
+    'HostReadback': 'gfx2cuda.host',
+    'PinnedPool': 'gfx2cuda.host',
+}
+
+
+def __getattr__(name):
+    if name in _lazy_exports:
+        import importlib
+        value = getattr(importlib.import_module(_lazy_exports[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def _default_backend():
+    if 'GFX2CUDA_BACKEND' in os.environ:
+        return Backends[os.environ['GFX2CUDA_BACKEND'].upper()]
     if sys.platform == 'win32':
         return Backends.D3D11
     else:
@@ -21,6 +48,7 @@ def _default_backend():
 def _lazy_init(backend=None, **kwargs):
     global _instance
     if _instance is None:
+        # Gfx2Cuda is a singleton, threads racing here get the same instance
         _instance = Gfx2Cuda(backend=backend or _default_backend())
     if backend is not None and backend is not _instance.get_backend():
         raise Gfx2CudaError("Backend does not match initialized backend")
@@ -34,7 +62,7 @@ def texture(*args, **kwargs):
         if isinstance(args[0], list) or isinstance(args[0], tuple):
             dims = args[0]
         elif isinstance(args[0], int):
-            return _instance.lookup_shared_handle(args[0])
+            return open_ipc_texture(args[0], **kwargs)
         else:
             dims = args[0].shape
             needs_copy = args[0]
@@ -56,30 +84,161 @@ def texture(*args, **kwargs):
     else:
         raise ValueError("Too many arguments")
 
-    device = kwargs.get('device', 0)
+    device = kwargs.get('device')
     if fmt is None:
         dtype = kwargs.get('dtype', 'float')
         normalized = kwargs.get('normalized', False)
         fmt = TextureFormat.from_channels_and_dtype(dims[2], dtype, normalized)
-    tex = _instance.create_texture(dims[1], dims[0], fmt, device=device)
+    tex = _instance.create_texture(dims[1], dims[0], fmt, device=device,
+                                   keyed_mutex=kwargs.get('keyed_mutex', False),
+                                   cpu_access=kwargs.get('cpu_access', False))
     if needs_copy is not None:
         with tex:
             if hasattr(needs_copy, '__cuda_array_interface__'):
-                ptr = needs_copy.__cuda_array_interface__['data'][0]
-            else:
+                tex.copy_from(needs_copy.__cuda_array_interface__['data'][0])
+            elif hasattr(needs_copy, 'data_ptr'):
                 # Just try something here
-                ptr = needs_copy.data_ptr()
-            tex.copy_from(ptr)
+                tex.copy_from(needs_copy.data_ptr())
+            else:
+                tex.copy_from(needs_copy)
+    if kwargs.get('persistent', False):
+        tex.set_persistent()
 
     return tex
 
 
-def open_ipc_texture(handle, **kwargs):
+def texture_array(n, height, width, format, **kwargs):
+    # One texture with n layers, e.g. the frames of an inference batch
     _lazy_init(**kwargs)
-    tex = _instance.lookup_ipc_handle(handle)
-    if tex is None:
-        tex = _instance.open_ipc_handle(handle)
-    return tex
+    return _instance.create_texture(width, height, format, device=kwargs.get('device'),
+                                    keyed_mutex=kwargs.get('keyed_mutex', False), layers=n,
+                                    cpu_access=kwargs.get('cpu_access', False))
+
+
+@contextlib.contextmanager
+def map_many(textures, stream=0):
+    # Map every texture with a single driver call per texture class, a texture that is listed
+    # twice is mapped once. PeerTextures map the texture they are shared from.
+    textures = list({id(tex): tex for tex in textures}.values())
+    groups = {}
+    for tex in textures:
+        source = tex.source if isinstance(tex, PeerTexture) else tex
+        groups.setdefault(type(source), {})[id(source)] = source
+    mapped = []
+    try:
+        for cls, group in groups.items():
+            group = list(group.values())
+            cls.map_resources(group, stream)
+            mapped.append((cls, group))
+        yield textures
+    finally:
+        for cls, group in reversed(mapped):
+            cls.unmap_resources(group, stream)
+
+
+def copy_batch(pairs):
+    pairs = list(pairs)
+    with map_many(tex for tex, _ in pairs):
+        for tex, dst in pairs:
+            tex.copy_to(dst)
+
+
+def set_texture_pool(pool, **kwargs):
+    _lazy_init(**kwargs)
+    _instance.set_texture_pool(pool)
+
+
+def set_ipc_cache(cache, **kwargs):
+    _lazy_init(**kwargs)
+    _instance.set_ipc_cache(cache)
+
+
+def ipc_cache(**kwargs):
+    _lazy_init(**kwargs)
+    return _instance.ipc_cache
+
+
+def release(tex, **kwargs):
+    _lazy_init(**kwargs)
+    _instance.release_texture(tex)
+
+
+@contextlib.contextmanager
+def closing(*resources):
+    # Closes the textures and buffers when the block ends, `with tex:` maps the texture instead
+    try:
+        yield resources[0] if len(resources) == 1 else resources
+    finally:
+        for resource in resources:
+            resource.close()
+
+
+def flush_releases():
+    # Releases the resources of collected textures and buffers now instead of on the background
+    # thread
+    import gfx2cuda.finalize
+    return gfx2cuda.finalize.queue.flush()
+
+
+def release_stats():
+    import gfx2cuda.finalize
+    return gfx2cuda.finalize.queue.stats()
+
+
+def enable_profiling(gpu_time=False):
+    # Records the wall time of map, get_mapped_array, copies, unmap, flush and opens, per texture.
+    # gpu_time also measures the stages queued on streams with CUDA events.
+    import gfx2cuda.profiling
+    gfx2cuda.profiling.enable(gpu_time)
+
+
+def disable_profiling():
+    import gfx2cuda.profiling
+    gfx2cuda.profiling.disable()
+
+
+def stats(reset=False):
+    # Counters, and count, total, mean and longest time of every stage, overall and by texture
+    import gfx2cuda.profiling
+    result = gfx2cuda.profiling.stats()
+    if reset:
+        gfx2cuda.profiling.reset()
+    return result
+
+
+def dump_trace(path):
+    # Chrome trace JSON of the recent stages, returns the number of events written
+    import gfx2cuda.profiling
+    return gfx2cuda.profiling.dump_trace(path)
+
+
+def open_ipc_texture(handle, device=None, **kwargs):
+    # Opens the texture on the adapter recorded in the handle, a different device gets a
+    # PeerTexture
+    _lazy_init(**kwargs)
+    return _instance.open_ipc_handle(handle, device)
+
+
+def shared_buffer(shape, dtype='float32', **kwargs):
+    _lazy_init(**kwargs)
+    return _instance.create_buffer(shape, dtype, device=kwargs.get('device'))
+
+
+def open_ipc_buffer(handle, shape, dtype='float32', **kwargs):
+    # Shape and type are not stored with a buffer, the opening process has to know them
+    _lazy_init(**kwargs)
+    return _instance.open_ipc_buffer(handle, shape, dtype, device=kwargs.get('device'))
+
+
+def wait_all(textures):
+    for tex in textures:
+        tex.wait()
+
+
+def wait(event):
+    # await gfx2cuda.wait(event), e.g. for the event of copy_to_async or device.fence()
+    import gfx2cuda.aio
+    return gfx2cuda.aio.wait(event)
 
 
 def synchronize(**kwargs):
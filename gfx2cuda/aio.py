@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+# Polling interval of the completion thread, it backs off while nothing completes
+_MIN_DELAY = 5e-5
+_MAX_DELAY = 2e-3
+
+
+class _Poller:
+    # One background thread for the whole process that polls pending CUDA events and D3D queries
+    # and resolves the futures waiting for them on their event loops
+
+    def __init__(self):
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, event, loop, future):
+        with self._lock:
+            self._pending.append((event, loop, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='gfx2cuda-poller',
+                                                daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        delay = _MIN_DELAY
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                pending = self._pending
+                self._pending = []
+                self._wakeup.clear()
+            remaining = []
+            for event, loop, future in pending:
+                if future.cancelled():
+                    continue
+                try:
+                    done = event.query()
+                except BaseException as e:
+                    loop.call_soon_threadsafe(_resolve, future, None, e)
+                    continue
+                if done:
+                    loop.call_soon_threadsafe(_resolve, future, event, None)
+                else:
+                    remaining.append((event, loop, future))
+            if not remaining:
+                delay = _MIN_DELAY
+                continue
+            with self._lock:
+                self._pending.extend(remaining)
+                self._wakeup.set()
+            if len(remaining) == len(pending):
+                time.sleep(delay)
+                delay = min(delay * 2, _MAX_DELAY)
+            else:
+                delay = _MIN_DELAY
+
+
+def _resolve(future, result, exception):
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+_poller = _Poller()
+
+
+async def wait(event):
+    # Resolves to the event once its work has finished, without blocking the event loop
+    if event.query():
+        return event
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _poller.add(event, loop, future)
+    return await future
+
+
+class Mapping:
+    # tex.mapped(): maps on enter and unmaps on exit. With async with, the graphics work submitted
+    # so far is awaited first, so the map does not wait for it on the event loop.
+
+    def __init__(self, tex, stream=0):
+        self.tex = tex
+        self.stream = stream
+
+    def __enter__(self):
+        self.tex.map(self.stream)
+        return self.tex
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tex.unmap(self.stream)
+
+    async def __aenter__(self):
+        # Peer textures are fenced on the adapter they live on
+        await wait(getattr(self.tex, 'source', self.tex).device.fence())
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
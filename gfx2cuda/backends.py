@@ -1,30 +1,125 @@
+import collections
+import contextlib
+import ctypes
 import enum
+import functools
+import itertools
+import os
+import struct
+import sys
+import threading
+import time
 from abc import ABCMeta, abstractmethod
 
 import gfx2cuda
-import gfx2cuda.dll.dxgi
-import gfx2cuda.dll.d3d
-import gfx2cuda.dll.cuda
+import gfx2cuda.dll
+import gfx2cuda.finalize
+import gfx2cuda.profiling
 from gfx2cuda.format import TextureFormat
 from gfx2cuda.exception import Gfx2CudaError, Gfx2CudaUnsupoortedError
+from gfx2cuda.stream import Event, CudaEvent, TimingEvent, stream_handle
+
+
+INFINITE = 0xFFFFFFFF
+
+
+def _buffer_layout(obj, interface):
+    # Returns the address, row pitch and row count of a buffer, pitch and rows are None if unknown
+    if isinstance(obj, int):
+        return obj, None, None
+    elif hasattr(obj, interface):
+        desc = getattr(obj, interface)
+        ptr = desc['data'][0]
+        shape = desc['shape']
+        if len(shape) < 2:
+            return ptr, None, None
+        itemsize = int(desc['typestr'][2:])
+        row_strides = []
+        for dim in reversed(shape[1:]):
+            row_strides.insert(0, itemsize)
+            itemsize *= dim
+        strides = desc.get('strides')
+        if strides is None:
+            return ptr, itemsize, shape[0]
+        if list(strides[1:]) != row_strides:
+            raise ValueError("buffer rows must be contiguous")
+        return ptr, strides[0], shape[0]
+    kind = 'CUDA' if 'cuda' in interface else 'host'
+    raise ValueError(f"type of buffer not understood as {kind} pointer")
+
+
+def _group_by_device(resources):
+    groups = {}
+    for resource in resources:
+        groups.setdefault(id(resource.device), (resource.device, []))[1].append(resource)
+    return groups.values()
+
+
+def _check_rect(rect, width, height):
+    x, y, w, h = rect
+    if x < 0 or y < 0 or w <= 0 or h <= 0 or x + w > width or y + h > height:
+        raise ValueError(f"rect {tuple(rect)} is out of bounds for texture of {width} x {height}")
+
+
+def _buffer_offset(offset, width_in_bytes, height, pitch, rows, pixel_size):
+    x, y = offset or (0, 0)
+    if x < 0 or y < 0 or x * pixel_size + width_in_bytes > pitch or (
+            rows is not None and y + height > rows):
+        raise ValueError(f"region of {width_in_bytes // pixel_size} x {height} at {(x, y)} "
+                         "does not fit in the buffer")
+    return y * pitch + x * pixel_size
+
+
+class IpcHandle(int):
+    # A shared handle that remembers the LUID of the adapter the resource lives on
+
+    def __new__(cls, value, luid=None):
+        handle = super().__new__(cls, value)
+        handle.luid = luid
+        return handle
+
+    def __reduce__(self):
+        return IpcHandle, (int(self), self.luid)
+
+    def __repr__(self):
+        return f"IpcHandle({int(self):#x}, luid={self.luid!r})"
 
 
 class Texture:
-    def __init__(self, width, height, format, device, cpu_access=False, ptr=None):
+    _buffer_interface = '__cuda_array_interface__'
+
+    def __init__(self, width, height, format, device, cpu_access=False, ptr=None,
+                 keyed_mutex=False, layers=1):
         self.width = width
         self.height = height
         self.device = device
         self.format = format
         self.cpu_access = cpu_access
-        self.nbytes = width * height * format.get_pixel_size()
+        self.keyed_mutex = keyed_mutex
+        # Slices of a texture array, each copied with layer=i or all at once with copy_layers_to
+        self.layers = layers
+        self.nbytes = layers * width * height * format.get_pixel_size()
         self._ptr = None
         self._ipc_handle = None
         self._tex = ptr
+        self._owner = ptr is None
+        self._mapped = False
+        # Held by threads that share the texture around map, copy and unmap, see CopyExecutor
+        self.lock = threading.RLock()
+        # Mapped arrays by layer, None is the layered array of all of them
+        self._arrays = {}
+        self._texture_objects = {}
+        self.persistent = False
+        self.saved_calls = collections.Counter()
+        # Completion of the last copy and of graphics work fenced with fence_graphics
+        self._copy_event = None
+        self._fence = None
+        self._graphics_fence = None
 
     @property
     def ipc_handle(self):
         if self._ipc_handle is None:
-            self._ipc_handle = self.create_ipc_handle()
+            self._ipc_handle = IpcHandle(self.create_ipc_handle(), self.device.luid)
         return self._ipc_handle
 
     @classmethod
@@ -41,6 +136,9 @@ class Texture:
         pass
 
     def __str__(self):
+        if self.layers > 1:
+            return (f"Texture array with format {self.format} "
+                    f"({self.layers} x {self.width} x {self.height})")
         return f"Texture with format {self.format} ({self.width} x {self.height})"
 
     def __enter__(self):
@@ -50,54 +148,584 @@ class Texture:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.unmap()
 
-    def map(self):
-        gfx2cuda.dll.cuda.cuda_map_resource(self._ptr)
+    def mapped(self, stream=0):
+        # Context manager for with and async with, async with awaits the graphics work before
+        # mapping
+        import gfx2cuda.aio
+        return gfx2cuda.aio.Mapping(self, stream)
+
+    def acquire(self, key=0, timeout_ms=INFINITE):
+        # Waits until the keyed mutex is released with key, returns False on timeout
+        if not self.keyed_mutex:
+            raise Gfx2CudaUnsupoortedError("Texture was not created with a keyed mutex")
+        return self._acquire_sync(key, timeout_ms)
+
+    def release(self, key=0):
+        if not self.keyed_mutex:
+            raise Gfx2CudaUnsupoortedError("Texture was not created with a keyed mutex")
+        self._release_sync(key)
+
+    @contextlib.contextmanager
+    def keyed(self, acquire_key=0, release_key=None, timeout_ms=INFINITE):
+        # Acquires the keyed mutex and maps the texture, then unmaps and releases with release_key
+        if not self.acquire(acquire_key, timeout_ms):
+            raise Gfx2CudaError(f"Timed out acquiring the keyed mutex with key {acquire_key}")
+        try:
+            with self as ptr:
+                yield ptr
+        finally:
+            self.release(acquire_key if release_key is None else release_key)
+
+    def _acquire_sync(self, key, timeout_ms):
+        raise NotImplementedError
+
+    def _release_sync(self, key):
+        raise NotImplementedError
+
+    def map(self, stream=0):
+        if self.persistent and self._mapped:
+            self.saved_calls['map'] += 1
+            return
+        stream = stream_handle(stream)
+        span = gfx2cuda.profiling.begin(self, stream) if gfx2cuda.profiling.enabled else None
+        self._map(stream)
+        self._mapped = True
+        if span is not None:
+            span.end('map')
+
+    def unmap(self, stream=0):
+        if self.persistent:
+            self.saved_calls['unmap'] += 1
+            return
+        stream = stream_handle(stream)
+        span = gfx2cuda.profiling.begin(self, stream) if gfx2cuda.profiling.enabled else None
+        self._destroy_texture_object()
+        self._unmap(stream)
+        self._mapped = False
+        self._arrays.clear()
+        if span is not None:
+            span.end('unmap')
+
+    @classmethod
+    def map_resources(cls, textures, stream=0):
+        pending = []
+        for tex in textures:
+            if tex.persistent and tex._mapped:
+                tex.saved_calls['map'] += 1
+            else:
+                pending.append(tex)
+        if pending:
+            stream = stream_handle(stream)
+            span = None
+            if gfx2cuda.profiling.enabled:
+                span = gfx2cuda.profiling.begin(pending, stream)
+            cls._map_resources(pending, stream)
+            for tex in pending:
+                tex._mapped = True
+            if span is not None:
+                span.end('map', count=len(pending))
+
+    @classmethod
+    def unmap_resources(cls, textures, stream=0):
+        pending = []
+        for tex in textures:
+            if tex.persistent:
+                tex.saved_calls['unmap'] += 1
+            else:
+                pending.append(tex)
+        if pending:
+            stream = stream_handle(stream)
+            span = None
+            if gfx2cuda.profiling.enabled:
+                span = gfx2cuda.profiling.begin(pending, stream)
+            for tex in pending:
+                tex._destroy_texture_object()
+            cls._unmap_resources(pending, stream)
+            for tex in pending:
+                tex._mapped = False
+                tex._arrays.clear()
+            if span is not None:
+                span.end('unmap', count=len(pending))
+
+    def set_persistent(self, persistent=True, stream=0):
+        # A persistent texture stays mapped between copies until it is released back to the
+        # graphics API
+        self.persistent = persistent
+        if persistent:
+            self.reacquire(stream)
+        else:
+            self.release_to_graphics(stream)
+
+    def release_to_graphics(self, stream=0):
+        if self._mapped:
+            self._destroy_texture_object()
+            self._unmap(stream_handle(stream))
+            self._mapped = False
+            self._arrays.clear()
 
-    def unmap(self):
-        gfx2cuda.dll.cuda.cuda_unmap_resource(self._ptr)
+    def reacquire(self, stream=0):
+        if not self._mapped:
+            self._map(stream_handle(stream))
+            self._mapped = True
 
     def unregister(self):
         gfx2cuda.dll.cuda.cuda_unregister_resource(self._ptr)
 
-    def data_ptr(self):
-        return gfx2cuda.dll.cuda.cuda_get_mapped_array(self._ptr)
+    def data_ptr(self, layer=0):
+        # The mapped array stays valid until the resource is unmapped
+        if layer is not None and not 0 <= layer < self.layers:
+            raise ValueError(f"layer {layer} is out of range for {self.layers} layers")
+        array = self._arrays.get(layer)
+        if array is None:
+            span = gfx2cuda.profiling.begin(self) if gfx2cuda.profiling.enabled else None
+            array = self._arrays[layer] = self._get_mapped_array(layer)
+            if span is not None:
+                span.end('get_mapped_array')
+        else:
+            self.saved_calls['get_mapped_array'] += 1
+        return array
+
+    # Resources are mapped in the CUDA context of their adapter, copies of a mapped texture run
+    # there too
+
+    def _map(self, stream):
+        self.device.make_current()
+        gfx2cuda.dll.cuda.cuda_map_resource(self._ptr, stream)
+
+    def _unmap(self, stream):
+        self.device.make_current()
+        gfx2cuda.dll.cuda.cuda_unmap_resource(self._ptr, stream)
+
+    @classmethod
+    def _map_resources(cls, textures, stream):
+        for device, group in _group_by_device(textures):
+            device.make_current()
+            gfx2cuda.dll.cuda.cuda_map_resources([tex._ptr for tex in group], stream)
+
+    @classmethod
+    def _unmap_resources(cls, textures, stream):
+        for device, group in _group_by_device(textures):
+            device.make_current()
+            gfx2cuda.dll.cuda.cuda_unmap_resources([tex._ptr for tex in group], stream)
+
+    def _get_mapped_array(self, layer):
+        if layer is None:
+            return gfx2cuda.dll.cuda.cuda_get_mapped_layers(self._ptr)
+        return gfx2cuda.dll.cuda.cuda_get_mapped_array(self._ptr, layer)
 
-    def copy_to(self, dst):
-        if isinstance(dst, int):
-            ptr = dst
-        elif hasattr(dst, '__cuda_array_interface__'):
-            ptr = dst.__cuda_array_interface__['data'][0]
+    def copy_to(self, dst, rect=None, dst_offset=None, pitch=None, convert=None, layer=0):
+        # convert is a gfx2cuda.Conversion or a dict of its arguments, applied during the copy
+        span = self._begin_copy(layer) if gfx2cuda.profiling.enabled else None
+        if convert is None:
+            plan = self._plan_copy_to(dst, rect, dst_offset, pitch)
+            self._copy_to(*plan, layer=layer)
         else:
-            raise ValueError("type of dst not understood as CUDA pointer")
-        wbytes = self.nbytes // self.height
-        gfx2cuda.dll.cuda.cuda_memcpy2d_atod(ptr, self.data_ptr(), wbytes, self.height)
-
-    def copy_from(self, src):
-        if isinstance(src, int):
-            ptr = src
-        elif hasattr(src, '__cuda_array_interface__'):
-            ptr = src.__cuda_array_interface__['data'][0]
+            plan = self._plan_convert(dst, rect, dst_offset, pitch, convert)
+            self._convert_to(*plan, layer=layer)
+        self._mark_copy()
+        if span is not None:
+            span.end(*self._copy_stage(plan, convert))
+
+    def copy_from(self, src, rect=None, dst_offset=None, pitch=None, layer=0):
+        span = self._begin_copy(layer) if gfx2cuda.profiling.enabled else None
+        plan = self._plan_copy_from(src, rect, dst_offset, pitch)
+        self._copy_from(*plan, layer=layer)
+        self._mark_copy()
+        if span is not None:
+            span.end(*self._copy_stage(plan))
+
+    def copy_to_async(self, dst, stream=0, rect=None, dst_offset=None, pitch=None, convert=None,
+                      layer=0):
+        stream = stream_handle(stream)
+        span = self._begin_copy(layer, stream) if gfx2cuda.profiling.enabled else None
+        if convert is None:
+            plan = self._plan_copy_to(dst, rect, dst_offset, pitch)
+            self._copy_to(*plan, stream=stream, layer=layer)
         else:
-            raise ValueError("type of dst not understood as CUDA pointer")
-        wbytes = self.nbytes // self.height
-        gfx2cuda.dll.cuda.cuda_memcpy2d_dtoa(self.data_ptr(), ptr, wbytes, self.height)
+            plan = self._plan_convert(dst, rect, dst_offset, pitch, convert)
+            self._convert_to(*plan, stream=stream, layer=layer)
+        self._fence = self._record_event(stream)
+        if span is not None:
+            span.end(*self._copy_stage(plan, convert))
+        return self._fence
+
+    def copy_from_async(self, src, stream=0, rect=None, dst_offset=None, pitch=None, layer=0):
+        stream = stream_handle(stream)
+        span = self._begin_copy(layer, stream) if gfx2cuda.profiling.enabled else None
+        plan = self._plan_copy_from(src, rect, dst_offset, pitch)
+        self._copy_from(*plan, stream=stream, layer=layer)
+        self._fence = self._record_event(stream)
+        if span is not None:
+            span.end(*self._copy_stage(plan))
+        return self._fence
+
+    def copy_layers_to(self, dst, rect=None):
+        # Copies the same region of every layer into a [layers, H, W, C] buffer with a single 3D
+        # copy
+        span = self._begin_copy(None) if gfx2cuda.profiling.enabled else None
+        plan = self._plan_copy_layers(dst, rect)
+        self._copy_layers_to(*plan)
+        self._mark_copy()
+        if span is not None:
+            span.end('memcpy3d', plan[1] * plan[5] * self.layers)
+
+    def copy_layers_from(self, src, rect=None):
+        span = self._begin_copy(None) if gfx2cuda.profiling.enabled else None
+        plan = self._plan_copy_layers(src, rect)
+        self._copy_layers_from(*plan)
+        self._mark_copy()
+        if span is not None:
+            span.end('memcpy3d', plan[1] * plan[5] * self.layers)
+
+    def copy_layers_to_async(self, dst, stream=0, rect=None):
+        stream = stream_handle(stream)
+        span = self._begin_copy(None, stream) if gfx2cuda.profiling.enabled else None
+        plan = self._plan_copy_layers(dst, rect)
+        self._copy_layers_to(*plan, stream=stream)
+        self._fence = self._record_event(stream)
+        if span is not None:
+            span.end('memcpy3d', plan[1] * plan[5] * self.layers)
+        return self._fence
+
+    def copy_layers_from_async(self, src, stream=0, rect=None):
+        stream = stream_handle(stream)
+        span = self._begin_copy(None, stream) if gfx2cuda.profiling.enabled else None
+        plan = self._plan_copy_layers(src, rect)
+        self._copy_layers_from(*plan, stream=stream)
+        self._fence = self._record_event(stream)
+        if span is not None:
+            span.end('memcpy3d', plan[1] * plan[5] * self.layers)
+        return self._fence
+
+    def _begin_copy(self, layer, stream=None):
+        # The mapped array is looked up first, so it is timed as its own stage and not as part of
+        # the copy
+        self.data_ptr(layer)
+        return gfx2cuda.profiling.begin(self, stream_handle(stream))
+
+    # Copies to and from host memory are staged in page-locked buffers of the device's host_pool
+
+    def copy_to_host(self, out=None, rect=None, layer=0, stream=0):
+        # Returns out, or a [h, w, elements] NumPy array backed by a staging buffer until it is
+        # dropped
+        import numpy as np
+        buf = self._copy_to_host_async(rect, layer, stream)
+        buf.event.wait()
+        buf.event = None
+        array = np.asarray(buf)
+        if out is None:
+            return array
+        height = array.shape[0]
+        width_in_bytes = buf.nbytes // height
+        ptr, pitch, rows = _buffer_layout(out, '__array_interface__')
+        pitch = pitch or width_in_bytes
+        if (pitch < width_in_bytes or (rows or height) < height
+                or np.asarray(out).nbytes < buf.nbytes):
+            raise ValueError(f"out is too small for {height} rows of {width_in_bytes} bytes")
+        region = _host_region(ptr, pitch, width_in_bytes, height)
+        region[:] = array.reshape(height, -1).view(np.uint8)
+        return out
+
+    def copy_from_host(self, src, dst_offset=None, layer=0, stream=0):
+        # src is a [h, w, elements] array written at dst_offset. It is staged before the call
+        # returns, the returned event completes when the texture was written.
+        import numpy as np
+        src = np.ascontiguousarray(src)
+        height, width = src.shape[:2]
+        x, y = dst_offset or (0, 0)
+        _check_rect((x, y, width, height), self.width, self.height)
+        pixel_size = self.format.get_pixel_size()
+        pitch = width * pixel_size
+        if src.nbytes != pitch * height:
+            raise ValueError(
+                f"array of {src.shape} {src.dtype} does not hold {width} x {height} {self.format}")
+        pool = self.device.host_pool
+        ptr = pool.acquire(pitch * height)
+        _host_region(ptr, pitch, pitch, height)[:] = src.reshape(height, -1).view(np.uint8)
+        stream = stream_handle(stream)
+        span = self._begin_copy(layer, stream) if gfx2cuda.profiling.enabled else None
+        self._copy_from_host(ptr, pitch, x * pixel_size, y, pitch, height, stream, layer)
+        self._fence = self._record_event(stream)
+        pool.release(ptr, pitch * height, self._fence)
+        if span is not None:
+            span.end('memcpy2d', pitch * height)
+        return self._fence
+
+    def _copy_to_host_async(self, rect, layer, stream):
+        # Queues the copy into a staging buffer, buf.event completes when it has arrived
+        x, y, w, h = self._region(rect)
+        pixel_size = self.format.get_pixel_size()
+        pitch = w * pixel_size
+        buf = self.device.host_pool.take(
+            pitch * h, (h, w, self.format.elements), self.format.dtype)
+        stream = stream_handle(stream)
+        span = self._begin_copy(layer, stream) if gfx2cuda.profiling.enabled else None
+        self._copy_to_host(buf.ptr, pitch, x * pixel_size, y, pitch, h, stream, layer)
+        buf.event = self._fence = self._record_event(stream)
+        if span is not None:
+            span.end('memcpy2d', pitch * h)
+        return buf
+
+    def readback(self, depth=2, rect=None, layer=0, stream=0):
+        # Double buffered copies to host memory, see gfx2cuda.host.HostReadback
+        import gfx2cuda.host
+        return gfx2cuda.host.HostReadback(self, depth, rect, layer, stream)
+
+    def _copy_stage(self, plan, convert=None):
+        # Stage name and bytes written by a planned copy or conversion
+        if convert is not None:
+            _, rect, conversion = plan
+            return 'convert', conversion.nbytes(self.format, rect[2], rect[3])
+        return 'memcpy2d', plan[4] * plan[5]
+
+    def _timing_event(self, stream):
+        return TimingEvent(stream)
+
+    def fence_graphics(self):
+        # Marks the graphics work submitted so far, wait() and is_ready() also cover it
+        self._graphics_fence = self.device.fence()
+
+    def is_ready(self):
+        for name in ('_fence', '_graphics_fence'):
+            fence = getattr(self, name)
+            if fence is not None:
+                if not fence.query():
+                    return False
+                setattr(self, name, None)
+        return True
+
+    def wait(self):
+        for name in ('_fence', '_graphics_fence'):
+            fence = getattr(self, name)
+            if fence is not None:
+                fence.wait()
+                setattr(self, name, None)
+
+    def _mark_copy(self, stream=None):
+        # Synchronous copies reuse one event per texture
+        stream = stream_handle(stream)
+        if self._copy_event is None:
+            self._copy_event = self._record_event(stream)
+        else:
+            self._copy_event.record(stream)
+        self._fence = self._copy_event
+
+    def copy_rects_to(self, dst, rects, layer=0):
+        # Gathers equally sized regions into consecutive slices of dst, e.g. a [N, H, W, C] tensor
+        rects = [self._region(rect) for rect in rects]
+        if not rects:
+            return
+        w, h = rects[0][2:]
+        if any(rect[2:] != (w, h) for rect in rects):
+            raise ValueError("all rects must have the same size")
+        pixel_size = self.format.get_pixel_size()
+        pitch = w * pixel_size
+        ptr, buffer_pitch, rows = _buffer_layout(dst, self._buffer_interface)
+        if buffer_pitch is not None and len(rects) * h * pitch > buffer_pitch * rows:
+            raise ValueError(f"buffer is too small for {len(rects)} regions of {w} x {h}")
+        span = self._begin_copy(layer) if gfx2cuda.profiling.enabled else None
+        for i, (x, y, _, _) in enumerate(rects):
+            self._copy_to(ptr + i * h * pitch, pitch, x * pixel_size, y, pitch, h, layer=layer)
+        self._mark_copy()
+        if span is not None:
+            span.end('memcpy2d', len(rects) * h * pitch, count=len(rects))
+
+    def _region(self, rect):
+        if rect is None:
+            return 0, 0, self.width, self.height
+        _check_rect(rect, self.width, self.height)
+        return tuple(rect)
+
+    def _plan_copy_to(self, dst, rect, dst_offset, pitch):
+        pixel_size = self.format.get_pixel_size()
+        x, y, w, h = self._region(rect)
+        ptr, buffer_pitch, rows = _buffer_layout(dst, self._buffer_interface)
+        pitch = pitch or buffer_pitch or w * pixel_size
+        ptr += _buffer_offset(dst_offset, w * pixel_size, h, pitch, rows, pixel_size)
+        return ptr, pitch, x * pixel_size, y, w * pixel_size, h
+
+    def _plan_copy_from(self, src, rect, dst_offset, pitch):
+        pixel_size = self.format.get_pixel_size()
+        x, y = dst_offset or (0, 0)
+        if rect is None:
+            rect = (0, 0, self.width - x, self.height - y)
+        _check_rect((x, y) + tuple(rect[2:]), self.width, self.height)
+        ptr, buffer_pitch, rows = _buffer_layout(src, self._buffer_interface)
+        pitch = pitch or buffer_pitch or self.width * pixel_size
+        ptr += _buffer_offset(rect[:2], rect[2] * pixel_size, rect[3], pitch, rows, pixel_size)
+        return ptr, pitch, x * pixel_size, y, rect[2] * pixel_size, rect[3]
+
+    def _plan_copy_layers(self, buf, rect):
+        # The buffer holds the layers back to back with tightly packed rows
+        x, y, w, h = self._region(rect)
+        pitch = w * self.format.get_pixel_size()
+        ptr, layer_pitch, layers = _buffer_layout(buf, self._buffer_interface)
+        if layer_pitch is not None and (layers != self.layers or layer_pitch != pitch * h):
+            raise ValueError(f"buffer must be a contiguous [{self.layers}, {h}, {w}, ...] array")
+        return ptr, pitch, x, y, w, h
+
+    def _plan_convert(self, dst, rect, dst_offset, pitch, convert):
+        import gfx2cuda.convert
+        if dst_offset is not None or pitch is not None:
+            raise ValueError("dst_offset and pitch can not be combined with a conversion")
+        conversion = gfx2cuda.convert.as_conversion(convert)
+        rect = self._region(rect)
+        nbytes = conversion.nbytes(self.format, rect[2], rect[3])
+        ptr, buffer_pitch, rows = _buffer_layout(dst, self._buffer_interface)
+        if buffer_pitch is not None and buffer_pitch * rows < nbytes:
+            shape = conversion.shape(self.format, *rect[2:])
+            raise ValueError(f"buffer is too small for {shape} {conversion.dtype}")
+        return ptr, rect, conversion
+
+    def _convert_to(self, dst, rect, conversion, stream=None, layer=0):
+        # One kernel reads the mapped array through a texture object and writes the converted
+        # pixels
+        import gfx2cuda.convert
+        texture_object = self._texture_objects.get(layer)
+        if texture_object is None:
+            texture_object = gfx2cuda.dll.cuda.cuda_create_texture_object(self.data_ptr(layer))
+            self._texture_objects[layer] = texture_object
+        gfx2cuda.convert.launch(texture_object, dst, rect, self.format, conversion,
+                                stream_handle(stream))
+
+    def _destroy_texture_object(self):
+        # The texture objects die with the mapping, after the conversions reading them have
+        # finished
+        if self._texture_objects:
+            if self._fence is not None:
+                self._fence.wait()
+            for texture_object in self._texture_objects.values():
+                gfx2cuda.dll.cuda.cuda_destroy_texture_object(texture_object)
+            self._texture_objects.clear()
+
+    # Device to device copies never block the host, so synchronous copies are queued on the calling
+    # thread's default stream like asynchronous ones and tracked with the texture's copy event
+
+    def _copy_to(self, dst, pitch, x_in_bytes, y, width_in_bytes, height, stream=None, layer=0):
+        gfx2cuda.dll.cuda.cuda_memcpy2d_atod_async(
+            dst, self.data_ptr(layer), width_in_bytes, height, stream_handle(stream), x_in_bytes,
+            y, pitch)
+
+    def _copy_from(self, src, pitch, x_in_bytes, y, width_in_bytes, height, stream=None, layer=0):
+        gfx2cuda.dll.cuda.cuda_memcpy2d_dtoa_async(
+            self.data_ptr(layer), src, width_in_bytes, height, stream_handle(stream), x_in_bytes,
+            y, pitch)
+
+    def _copy_to_host(self, dst, pitch, x_in_bytes, y, width_in_bytes, height, stream=None,
+                      layer=0):
+        gfx2cuda.dll.cuda.cuda_memcpy2d_atod_async(
+            dst, self.data_ptr(layer), width_in_bytes, height, stream_handle(stream), x_in_bytes,
+            y, pitch, gfx2cuda.dll.cuda.cudaMemcpyDeviceToHost)
+
+    def _copy_from_host(self, src, pitch, x_in_bytes, y, width_in_bytes, height, stream=None,
+                        layer=0):
+        gfx2cuda.dll.cuda.cuda_memcpy2d_dtoa_async(
+            self.data_ptr(layer), src, width_in_bytes, height, stream_handle(stream), x_in_bytes,
+            y, pitch, gfx2cuda.dll.cuda.cudaMemcpyHostToDevice)
+
+    def _copy_layers_to(self, dst, pitch, x, y, width, height, stream=None):
+        gfx2cuda.dll.cuda.cuda_memcpy3d_atod(dst, self.data_ptr(None), x, y, width, height,
+                                             self.layers, pitch, self.format.get_pixel_size(),
+                                             stream_handle(stream))
+
+    def _copy_layers_from(self, src, pitch, x, y, width, height, stream=None):
+        gfx2cuda.dll.cuda.cuda_memcpy3d_dtoa(self.data_ptr(None), src, x, y, width, height,
+                                             self.layers, pitch, self.format.get_pixel_size(),
+                                             stream_handle(stream))
+
+    def _record_event(self, stream):
+        return CudaEvent(stream)
+
+    @property
+    def closed(self):
+        return self._ptr is None and self._tex is None
+
+    def close(self):
+        # Unmaps, unregisters and releases the graphics resource now, the texture is unusable
+        # afterwards
+        release = self._detach()
+        if release is not None:
+            release()
+
+    def _detach(self):
+        # Moves the resources out of the texture and returns a function releasing them. It holds no
+        # reference to the texture, so it can run on the release queue after the texture is
+        # collected.
+        if self.closed:
+            return None
+        release = functools.partial(type(self)._release, self.device, self._ptr, self._mapped,
+                                    list(self._texture_objects.values()), self._fence,
+                                    self._graphics_resources())
+        self._texture_objects.clear()
+        self._arrays.clear()
+        self._mapped = False
+        self._ptr = None
+        self._tex = None
+        return release
+
+    def _graphics_resources(self):
+        return [self._tex]
+
+    @classmethod
+    def _release(cls, device, ptr, mapped, texture_objects, fence, graphics):
+        device.make_current()
+        if texture_objects:
+            if fence is not None:
+                fence.wait()
+            for texture_object in texture_objects:
+                gfx2cuda.dll.cuda.cuda_destroy_texture_object(texture_object)
+        if ptr is not None:
+            if mapped:
+                gfx2cuda.dll.cuda.cuda_unmap_resource(ptr, None)
+            gfx2cuda.dll.cuda.cuda_unregister_resource(ptr)
+        cls._release_graphics(graphics)
+
+    @classmethod
+    def _release_graphics(cls, graphics):
+        # Dropping the last reference releases the graphics resource
+        pass
 
     def __del__(self):
-        self.unregister()
+        gfx2cuda.finalize.defer(self._detach())
 
 
 class D3D11Texture(Texture):
-    def __init__(self, width, height, format, device, cpu_access=False, ptr=None):
-        super().__init__(width, height, format, device, cpu_access, ptr)
+    def __init__(self, width, height, format, device, cpu_access=False, ptr=None,
+                 keyed_mutex=False, layers=1):
+        super().__init__(width, height, format, device, cpu_access, ptr, keyed_mutex, layers)
         if self._tex is None:
             dxgi_fmt = format.get_dxgi_format()
-            self._tex = gfx2cuda.dll.d3d.d3d11_create_texture_2d(width, height, device.handle, dxgi_fmt, cpu_access)
+            # D3D only allows CPU access to staging textures, which CUDA cannot register. Host
+            # copies of cpu_access textures go through page-locked buffers instead, see
+            # copy_to_host.
+            self._tex = gfx2cuda.dll.d3d.d3d11_create_texture_2d(
+                width, height, device.handle, dxgi_fmt, False, keyed_mutex, layers)
+        else:
+            # A reference of our own, released explicitly when the texture is closed
+            self._tex = self._tex.QueryInterface(gfx2cuda.dll.d3d.ID3D11Texture2D)
+        self._keyed_mutex = gfx2cuda.dll.dxgi.get_keyed_mutex(self._tex) if keyed_mutex else None
 
     @classmethod
     def create_from_ptr(cls, ptr, device):
-        width, height, dxgi_fmt = gfx2cuda.dll.d3d.d3d11_texture_desc(ptr)
+        width, height, dxgi_fmt, misc_flags, layers = gfx2cuda.dll.d3d.d3d11_texture_desc(ptr)
         fmt = TextureFormat.from_dxgi_format(dxgi_fmt)
-        return cls(width, height, fmt, device, ptr=ptr)
+        keyed_mutex = bool(misc_flags & 256)  # D3D11_RESOURCE_MISC_SHARED_KEYEDMUTEX
+        return cls(width, height, fmt, device, ptr=ptr, keyed_mutex=keyed_mutex, layers=layers)
+
+    def _acquire_sync(self, key, timeout_ms):
+        return gfx2cuda.dll.dxgi.dxgi_acquire_sync(self._keyed_mutex, key, timeout_ms)
+
+    def _release_sync(self, key):
+        gfx2cuda.dll.dxgi.dxgi_release_sync(self._keyed_mutex, key)
+
+    def _graphics_resources(self):
+        keyed_mutex, self._keyed_mutex = self._keyed_mutex, None
+        return [keyed_mutex, self._tex]
+
+    @classmethod
+    def _release_graphics(cls, graphics):
+        for pointer in graphics:
+            gfx2cuda.dll.d3d.com_release(pointer)
 
     def create_ipc_handle(self):
         dxgi_ptr = gfx2cuda.dll.dxgi.get_dxgi_resource(self._tex)
@@ -110,8 +738,9 @@ class D3D11Texture(Texture):
 
 
 class OpenGLTexture(Texture):
-    def __init__(self, width, height, format, device, cpu_access=False, ptr=None):
-        super().__init__(width, height, format, device, cpu_access, ptr)
+    def __init__(self, width, height, format, device, cpu_access=False, ptr=None,
+                 keyed_mutex=False, layers=1):
+        super().__init__(width, height, format, device, cpu_access, ptr, keyed_mutex, layers)
         if self._tex is None:
             raise NotImplementedError
 
@@ -126,29 +755,595 @@ class OpenGLTexture(Texture):
         raise NotImplementedError
 
 
+class PeerTexture:
+    # A texture shared by a process on another adapter. It is opened on its own adapter and copies
+    # are staged through a buffer there, then moved between the GPUs with a peer copy.
+
+    def __init__(self, source, device):
+        self.source = source
+        self.device = device
+        self.width = source.width
+        self.height = source.height
+        self.format = source.format
+        self.layers = source.layers
+        self.nbytes = source.nbytes
+        self.lock = source.lock
+        self._staging = None
+
+    @property
+    def ipc_handle(self):
+        return self.source.ipc_handle
+
+    def __str__(self):
+        return f"{self.source} shared from {self.source.device.name} to {self.device.name}"
+
+    def __enter__(self):
+        self.map()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.unmap()
+
+    def mapped(self, stream=0):
+        import gfx2cuda.aio
+        return gfx2cuda.aio.Mapping(self, stream)
+
+    def map(self, stream=0):
+        self.source.map(stream)
+
+    def unmap(self, stream=0):
+        self.source.unmap(stream)
+
+    def wait(self):
+        self.source.wait()
+
+    def is_ready(self):
+        return self.source.is_ready()
+
+    def _staging_buffer(self):
+        if self._staging is None:
+            self._staging = self.source.device.allocate(self.source.nbytes // self.layers)
+        return self._staging
+
+    @staticmethod
+    def _copy_peer(dst, dst_pitch, dst_device, src, src_pitch, src_device, width_in_bytes,
+                   height):
+        # The peer copy is linear, pitched rows are copied one by one
+        if dst_pitch == src_pitch == width_in_bytes:
+            src_device.copy_peer(dst, dst_device, src, width_in_bytes * height)
+            return
+        for row in range(height):
+            src_device.copy_peer(dst + row * dst_pitch, dst_device, src + row * src_pitch,
+                                 width_in_bytes)
+
+    def copy_to(self, dst, rect=None, dst_offset=None, pitch=None, layer=0):
+        # Same arguments as Texture.copy_to, the region is staged with tightly packed rows
+        ptr, pitch, x_in_bytes, y, width_in_bytes, height = self.source._plan_copy_to(
+            dst, rect, dst_offset, pitch)
+        staging = self._staging_buffer()
+        self.source._copy_to(staging, width_in_bytes, x_in_bytes, y, width_in_bytes, height,
+                             layer=layer)
+        self._copy_peer(ptr, pitch, self.device, staging, width_in_bytes, self.source.device,
+                        width_in_bytes, height)
+        self.source._mark_copy()
+
+    def copy_from(self, src, rect=None, dst_offset=None, pitch=None, layer=0):
+        ptr, pitch, x_in_bytes, y, width_in_bytes, height = self.source._plan_copy_from(
+            src, rect, dst_offset, pitch)
+        staging = self._staging_buffer()
+        self._copy_peer(staging, width_in_bytes, self.source.device, ptr, pitch, self.device,
+                        width_in_bytes, height)
+        self.source._copy_from(staging, width_in_bytes, x_in_bytes, y, width_in_bytes, height,
+                               layer=layer)
+        self.source._mark_copy()
+
+    @property
+    def closed(self):
+        return self.source.closed
+
+    def close(self):
+        release = self._detach()
+        if release is not None:
+            release()
+
+    def _detach(self):
+        staging = self._detach_staging()
+        source = self.source._detach()
+        if staging is None or source is None:
+            return staging or source
+
+        def release():
+            staging()
+            source()
+        return release
+
+    def _detach_staging(self):
+        if self._staging is None:
+            return None
+        release = functools.partial(self.source.device.free, self._staging)
+        self._staging = None
+        return release
+
+    def __del__(self):
+        # The source texture is released by its own finalizer
+        gfx2cuda.finalize.defer(self._detach_staging())
+
+
+class SharedBuffer:
+    # A linear buffer that CUDA maps as plain device memory. While mapped it is readable and
+    # writable in place through __cuda_array_interface__ and DLPack, e.g. with torch.as_tensor or
+    # torch.from_dlpack.
+
+    def __init__(self, shape, dtype, device, ptr=None):
+        import numpy as np
+        dtype = np.dtype(dtype)
+        self.shape = tuple(int(dim) for dim in shape)
+        self.dtype = dtype.name
+        self._typestr = dtype.str
+        self.nbytes = int(np.prod(self.shape)) * dtype.itemsize
+        self.device = device
+        self._ptr = None
+        self._ipc_handle = None
+        self._buf = ptr
+        self._owner = ptr is None
+        self._mapped = False
+        self._data = None
+        # Stream of the last map, DLPack consumers wait for it
+        self._stream = None
+
+    @property
+    def ipc_handle(self):
+        if self._ipc_handle is None:
+            self._ipc_handle = IpcHandle(self.create_ipc_handle(), self.device.luid)
+        return self._ipc_handle
+
+    @abstractmethod
+    def create_ipc_handle(self):
+        pass
+
+    @abstractmethod
+    def register(self):
+        pass
+
+    def __str__(self):
+        return f"Shared buffer of {self.dtype} {self.shape}"
+
+    def __enter__(self):
+        self.map()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.unmap()
+
+    def map(self, stream=0):
+        self._stream = stream_handle(stream)
+        self._map(self._stream)
+        self._mapped = True
+
+    def unmap(self, stream=0):
+        self._unmap(stream_handle(stream))
+        self._mapped = False
+        self._data = None
+
+    def data_ptr(self):
+        if not self._mapped:
+            raise Gfx2CudaError("Buffer is not mapped")
+        if self._data is None:
+            self._data = self._get_mapped_pointer()
+        return self._data
+
+    def _interface(self):
+        return {
+            'shape': self.shape,
+            'typestr': self._typestr,
+            'data': (self.data_ptr(), False),
+            'strides': None,
+            'version': 3,
+        }
+
+    def __dlpack__(self, stream=None):
+        # The consumer's stream waits for the map, which is queued on the stream passed to map().
+        # As in the DLPack protocol None is the legacy default stream and -1 means the consumer
+        # synchronizes itself.
+        import gfx2cuda.dlpack
+        ptr = self.data_ptr()
+        if stream != -1:
+            event = self._record_event(self._stream)
+            event.wait_stream(gfx2cuda.dll.cuda.cudaStreamLegacy if stream is None else stream)
+        device_type, device_id = self.__dlpack_device__()
+        return gfx2cuda.dlpack.to_dlpack(ptr, self.shape, self.dtype, device_type, device_id, self)
+
+    def __dlpack_device__(self):
+        import gfx2cuda.dlpack
+        return gfx2cuda.dlpack.kDLCUDA, self.device.dev
+
+    def unregister(self):
+        gfx2cuda.dll.cuda.cuda_unregister_resource(self._ptr)
+
+    def _map(self, stream):
+        gfx2cuda.dll.cuda.cuda_map_resource(self._ptr, stream)
+
+    def _unmap(self, stream):
+        gfx2cuda.dll.cuda.cuda_unmap_resource(self._ptr, stream)
+
+    def _record_event(self, stream):
+        return CudaEvent(stream)
+
+    def _get_mapped_pointer(self):
+        ptr, size = gfx2cuda.dll.cuda.cuda_get_mapped_pointer(self._ptr)
+        if size < self.nbytes:
+            raise Gfx2CudaError(f"Mapped buffer has {size} bytes, expected at least {self.nbytes}")
+        return ptr
+
+    @property
+    def closed(self):
+        return self._ptr is None and self._buf is None
+
+    def close(self):
+        release = self._detach()
+        if release is not None:
+            release()
+
+    def _detach(self):
+        # Like Texture._detach
+        if self.closed:
+            return None
+        release = functools.partial(type(self)._release, self.device, self._ptr, self._mapped,
+                                    self._graphics_resources())
+        self._mapped = False
+        self._data = None
+        self._ptr = None
+        self._buf = None
+        return release
+
+    def _graphics_resources(self):
+        return [self._buf]
+
+    @classmethod
+    def _release(cls, device, ptr, mapped, graphics):
+        device.make_current()
+        if ptr is not None:
+            if mapped:
+                gfx2cuda.dll.cuda.cuda_unmap_resource(ptr, None)
+            gfx2cuda.dll.cuda.cuda_unregister_resource(ptr)
+        cls._release_graphics(graphics)
+
+    @classmethod
+    def _release_graphics(cls, graphics):
+        pass
+
+    def __del__(self):
+        gfx2cuda.finalize.defer(self._detach())
+
+
+class D3D11SharedBuffer(SharedBuffer):
+    def __init__(self, shape, dtype, device, ptr=None):
+        super().__init__(shape, dtype, device, ptr)
+        if self._buf is None:
+            self._buf = gfx2cuda.dll.d3d.d3d11_create_buffer(self.nbytes, device.handle)
+        else:
+            self._buf = self._buf.QueryInterface(gfx2cuda.dll.d3d.ID3D11Buffer)
+
+    @classmethod
+    def _release_graphics(cls, graphics):
+        for pointer in graphics:
+            gfx2cuda.dll.d3d.com_release(pointer)
+
+    @property
+    def __cuda_array_interface__(self):
+        return self._interface()
+
+    def create_ipc_handle(self):
+        dxgi_ptr = gfx2cuda.dll.dxgi.get_dxgi_resource(self._buf)
+        handle = gfx2cuda.dll.dxgi.get_shared_handle(dxgi_ptr)
+        gfx2cuda.dll.dxgi.dxgi_resource_release(dxgi_ptr)
+        return handle.value
+
+    def register(self):
+        # Consumers write to the buffer in place, so it is not mapped read-only like textures
+        self._ptr = gfx2cuda.dll.cuda.cuda_register_d3d_resource(
+            self._buf, gfx2cuda.dll.cuda.cudaGraphicsMapFlagsNone)
+
+
+# Width, height, DXGI format, flags and the keyed mutex key and owner, stored in front of the
+# pixel data
+_simulated_header = struct.Struct('<4I2Q')
+_SIMULATED_KEYED_MUTEX = 1
+# The number of layers is kept in the high bits of the flags
+_SIMULATED_LAYERS_SHIFT = 16
+
+
+_simulated_handles = itertools.count(1)
+
+
+def _new_simulated_handle():
+    return (os.getpid() << 32) | next(_simulated_handles)
+
+
+def _simulated_shm_name(handle):
+    return f"gfx2cuda_{handle:x}"
+
+
+def _open_shared_memory(name):
+    from multiprocessing import shared_memory
+    if sys.version_info >= (3, 13):
+        # Only the creating process may unlink the segment
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _close_shared_memory(shm, owner):
+    shm.close()
+    if owner:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _host_region(ptr, pitch, width_in_bytes, height):
+    import numpy as np
+    buf = (ctypes.c_ubyte * ((height - 1) * pitch + width_in_bytes)).from_address(ptr)
+    return np.lib.stride_tricks.as_strided(
+        np.ctypeslib.as_array(buf), shape=(height, width_in_bytes), strides=(pitch, 1))
+
+
+class SimulatedTexture(Texture):
+    _buffer_interface = '__array_interface__'
+
+    def __init__(self, width, height, format, device, cpu_access=False, ptr=None,
+                 keyed_mutex=False, layers=1):
+        # numpy and shared memory are imported here to keep them out of `import gfx2cuda`
+        import numpy as np
+        from multiprocessing import shared_memory
+        super().__init__(width, height, format, device, cpu_access, ptr, keyed_mutex, layers)
+        if self._tex is None:
+            handle = _new_simulated_handle()
+            size = _simulated_header.size + self.nbytes
+            name = _simulated_shm_name(handle)
+            self._tex = shared_memory.SharedMemory(name=name, create=True, size=size)
+            flags = layers << _SIMULATED_LAYERS_SHIFT
+            if keyed_mutex:
+                flags |= _SIMULATED_KEYED_MUTEX
+            _simulated_header.pack_into(self._tex.buf, 0, width, height, format.get_dxgi_format(),
+                                        flags, 0, 0)
+        # Key the mutex was last released with and whether it is currently acquired
+        self._sync = np.ndarray((2,), dtype=np.uint64, buffer=self._tex.buf, offset=16)
+
+    @classmethod
+    def create_from_ptr(cls, ptr, device):
+        width, height, dxgi_fmt, flags, _, _ = _simulated_header.unpack_from(ptr.buf, 0)
+        fmt = TextureFormat.from_dxgi_format(dxgi_fmt)
+        return cls(width, height, fmt, device, ptr=ptr,
+                   keyed_mutex=bool(flags & _SIMULATED_KEYED_MUTEX),
+                   layers=flags >> _SIMULATED_LAYERS_SHIFT)
+
+    def _acquire_sync(self, key, timeout_ms):
+        # Without an atomic compare and swap this assumes one waiter per key, as in the usual
+        # ping-pong
+        start = time.perf_counter()
+        while self._sync[1] or self._sync[0] != key:
+            if timeout_ms != INFINITE and (time.perf_counter() - start) * 1000 >= timeout_ms:
+                return False
+            time.sleep(1e-4)
+        self._sync[1] = 1
+        return True
+
+    def _release_sync(self, key):
+        if not self._sync[1]:
+            raise Gfx2CudaError("Keyed mutex is not acquired")
+        self._sync[0] = key
+        self._sync[1] = 0
+
+    def create_ipc_handle(self):
+        return int(self._tex.name.rsplit('_', 1)[1], 16)
+
+    def register(self):
+        import numpy as np
+        self._ptr = np.ndarray(
+            (self.layers, self.height, self.width * self.format.get_pixel_size()), dtype=np.uint8,
+            buffer=self._tex.buf, offset=_simulated_header.size)
+
+    def unregister(self):
+        self._ptr = None
+
+    def mapped_array(self, layer=0):
+        self.data_ptr(layer)
+        return self._ptr if layer is None else self._ptr[layer]
+
+    def _map(self, stream):
+        if self._mapped:
+            raise Gfx2CudaError("Resource is already mapped")
+
+    def _unmap(self, stream):
+        if not self._mapped:
+            raise Gfx2CudaError("Resource is not mapped")
+
+    @classmethod
+    def _map_resources(cls, textures, stream):
+        for tex in textures:
+            tex._map(stream)
+
+    @classmethod
+    def _unmap_resources(cls, textures, stream):
+        for tex in textures:
+            tex._unmap(stream)
+
+    def _get_mapped_array(self, layer):
+        if not self._mapped:
+            raise Gfx2CudaError("Resource is not mapped")
+        return self._ptr[layer or 0].ctypes.data
+
+    def _copy_to(self, dst, pitch, x_in_bytes, y, width_in_bytes, height, stream=None, layer=0):
+        region = self.mapped_array(layer)[y:y + height, x_in_bytes:x_in_bytes + width_in_bytes]
+        _host_region(dst, pitch, width_in_bytes, height)[:] = region
+
+    def _copy_from(self, src, pitch, x_in_bytes, y, width_in_bytes, height, stream=None, layer=0):
+        region = self.mapped_array(layer)[y:y + height, x_in_bytes:x_in_bytes + width_in_bytes]
+        region[:] = _host_region(src, pitch, width_in_bytes, height)
+
+    # Everything is host memory here
+    _copy_to_host = _copy_to
+    _copy_from_host = _copy_from
+
+    def _copy_layers_to(self, dst, pitch, x, y, width, height, stream=None):
+        pixel_size = self.format.get_pixel_size()
+        region = self.mapped_array(None)[:, y:y + height, x * pixel_size:(x + width) * pixel_size]
+        _host_region(dst, pitch, pitch, height * self.layers)[:] = region.reshape(-1, pitch)
+
+    def _copy_layers_from(self, src, pitch, x, y, width, height, stream=None):
+        pixel_size = self.format.get_pixel_size()
+        region = self.mapped_array(None)[:, y:y + height, x * pixel_size:(x + width) * pixel_size]
+        region[:] = _host_region(src, pitch, pitch, height * self.layers).reshape(region.shape)
+
+    def _convert_to(self, dst, rect, conversion, stream=None, layer=0):
+        import numpy as np
+        import gfx2cuda.convert
+        x, y, w, h = rect
+        pixel_size = self.format.get_pixel_size()
+        region = self.mapped_array(layer)[y:y + h, x * pixel_size:(x + w) * pixel_size]
+        pixels = region.view(self.format.dtype).reshape(h, w, self.format.elements)
+        out = gfx2cuda.convert.reference(pixels, self.format, conversion)
+        _host_region(dst, out.nbytes, out.nbytes, 1)[:] = out.reshape(1, -1).view(np.uint8)
+
+    def _record_event(self, stream):
+        return Event()
+
+    def _timing_event(self, stream):
+        return None
+
+    def _detach(self):
+        # The views into the shared memory have to go before it can be closed
+        self._sync = None
+        self._ptr = None
+        return super()._detach()
+
+    def _graphics_resources(self):
+        return self._tex, self._owner
+
+    @classmethod
+    def _release_graphics(cls, graphics):
+        _close_shared_memory(*graphics)
+
+
+class SimulatedSharedBuffer(SharedBuffer):
+    # Host memory in a shared memory segment, exposed through __array_interface__ and CPU DLPack
+
+    def __init__(self, shape, dtype, device, ptr=None):
+        from multiprocessing import shared_memory
+        super().__init__(shape, dtype, device, ptr)
+        if self._buf is None:
+            name = _simulated_shm_name(_new_simulated_handle())
+            self._buf = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=max(self.nbytes, 1))
+        elif len(self._buf.buf) < self.nbytes:
+            raise Gfx2CudaError(
+                f"Shared buffer has {len(self._buf.buf)} bytes, expected {self.nbytes}")
+
+    @property
+    def __array_interface__(self):
+        return self._interface()
+
+    def __dlpack_device__(self):
+        import gfx2cuda.dlpack
+        return gfx2cuda.dlpack.kDLCPU, 0
+
+    def create_ipc_handle(self):
+        return int(self._buf.name.rsplit('_', 1)[1], 16)
+
+    def register(self):
+        self._ptr = ctypes.addressof(ctypes.c_char.from_buffer(self._buf.buf))
+
+    def unregister(self):
+        self._ptr = None
+
+    def _map(self, stream):
+        if self._mapped:
+            raise Gfx2CudaError("Resource is already mapped")
+
+    def _unmap(self, stream):
+        if not self._mapped:
+            raise Gfx2CudaError("Resource is not mapped")
+
+    def _get_mapped_pointer(self):
+        return self._ptr
+
+    def _record_event(self, stream):
+        return Event()
+
+    def _detach(self):
+        self._ptr = None
+        return super()._detach()
+
+    def _graphics_resources(self):
+        return self._buf, self._owner
+
+    @classmethod
+    def _release_graphics(cls, graphics):
+        _close_shared_memory(*graphics)
+
+
 class Backends(enum.Enum):
     D3D11 = 0
     OPENGL = 1
+    SIMULATED = 2
 
 
 class Device(metaclass=ABCMeta):
-    def __init__(self, name=None, adapter=None, backend=None):
+    def __init__(self, name=None, adapter=None, backend=None, luid=None):
         self.name = name or "Unknown Adapter"
         self.backend = backend
         self.adapter = adapter
+        self.luid = luid
         self.handle = None
         self.dev = -1
+        self._host_pool = None
 
-    def create_texture(self, width, height, format):
+    def create_texture(self, width, height, format, keyed_mutex=False, layers=1, cpu_access=False):
         if self.backend == Backends.D3D11:
-            tex = D3D11Texture(width, height, format, self)
+            cls = D3D11Texture
         elif self.backend == Backends.OPENGL:
-            tex = OpenGLTexture(width, height, format, self)
+            cls = OpenGLTexture
+        elif self.backend == Backends.SIMULATED:
+            cls = SimulatedTexture
         else:
             raise Gfx2CudaError("The specified backend is invalid!")
+        tex = cls(width, height, format, self, cpu_access, keyed_mutex=keyed_mutex, layers=layers)
+        self.make_current()
         tex.register()
         return tex
 
+    @property
+    def host_pool(self):
+        # Page-locked staging buffers for copies between textures and host memory
+        if self._host_pool is None:
+            import gfx2cuda.host
+            self._host_pool = gfx2cuda.host.PinnedPool(self)
+        return self._host_pool
+
+    def allocate_host(self, nbytes):
+        raise NotImplementedError
+
+    def free_host(self, ptr):
+        raise NotImplementedError
+
+    def create_buffer(self, shape, dtype):
+        if self.backend == Backends.D3D11:
+            buf = D3D11SharedBuffer(shape, dtype, self)
+        elif self.backend == Backends.SIMULATED:
+            buf = SimulatedSharedBuffer(shape, dtype, self)
+        elif self.backend == Backends.OPENGL:
+            raise NotImplementedError
+        else:
+            raise Gfx2CudaError("The specified backend is invalid!")
+        self.make_current()
+        buf.register()
+        return buf
+
+    @abstractmethod
+    def open_ipc_buffer(self, handle, shape, dtype):
+        pass
+
     @abstractmethod
     def init_context(self):
         pass
@@ -161,6 +1356,24 @@ class Device(metaclass=ABCMeta):
     def open_ipc_handle(self, handle):
         pass
 
+    def fence(self):
+        # Returns an event that completes when the graphics work submitted so far has finished
+        raise NotImplementedError
+
+    def make_current(self):
+        # Makes the CUDA context of the adapter current for the calling thread
+        pass
+
+    def allocate(self, nbytes):
+        raise NotImplementedError
+
+    def free(self, ptr):
+        raise NotImplementedError
+
+    def copy_peer(self, dst, dst_device, src, nbytes):
+        # Copies nbytes from src on this device to dst on dst_device
+        raise NotImplementedError
+
     def has_cuda(self):
         if self.dev == -1:
             try:
@@ -175,27 +1388,69 @@ class Device(metaclass=ABCMeta):
             return D3D11Device.discover_devices()
         elif backend == Backends.OPENGL:
             return OpenGLDevice.discover_devices()
+        elif backend == Backends.SIMULATED:
+            return SimulatedDevice.discover_devices()
         else:
             raise Gfx2CudaError("The specified backend is invalid!")
 
 
 class D3D11Device(Device):
-    def __init__(self, name=None, adapter=None, backend=None):
-        super().__init__(name, adapter, backend)
+    def __init__(self, name=None, adapter=None, backend=None, luid=None):
+        super().__init__(name, adapter, backend, luid)
         self.handle, self.context = gfx2cuda.dll.d3d.d3d_initialize_device(adapter)
+        # The immediate context is not thread safe, fences are also polled from a background thread
+        self.context_lock = threading.Lock()
 
     def init_context(self):
         self.dev = gfx2cuda.dll.cuda.cuda_device_d3d_adapter(self.adapter)
 
+    def make_current(self):
+        gfx2cuda.dll.cuda.cuda_set_device(self.dev)
+
+    def allocate(self, nbytes):
+        self.make_current()
+        return gfx2cuda.dll.cuda.cuda_malloc(nbytes)
+
+    def free(self, ptr):
+        gfx2cuda.dll.cuda.cuda_free(ptr)
+
+    def allocate_host(self, nbytes):
+        self.make_current()
+        return gfx2cuda.dll.cuda.cuda_host_alloc(nbytes)
+
+    def free_host(self, ptr):
+        gfx2cuda.dll.cuda.cuda_free_host(ptr)
+
+    def copy_peer(self, dst, dst_device, src, nbytes):
+        gfx2cuda.dll.cuda.cuda_memcpy_peer(dst, dst_device.dev, src, self.dev, nbytes)
+
     def synchronize(self):
-        gfx2cuda.dll.d3d.d3d11_flush(self.context)
+        span = gfx2cuda.profiling.begin(self) if gfx2cuda.profiling.enabled else None
+        with self.context_lock:
+            gfx2cuda.dll.d3d.d3d11_flush(self.context)
+        if span is not None:
+            span.end('flush')
+
+    def fence(self):
+        query = gfx2cuda.dll.d3d.d3d11_create_event_query(self.handle)
+        with self.context_lock:
+            gfx2cuda.dll.d3d.d3d11_end_query(self.context, query)
+        return D3D11QueryEvent(self, query)
 
     def open_ipc_handle(self, handle):
         ptr = gfx2cuda.dll.d3d.d3d11_open_shared_handle(handle, self.handle)
         tex = D3D11Texture.create_from_ptr(ptr, self)
+        self.make_current()
         tex.register()
         return tex
 
+    def open_ipc_buffer(self, handle, shape, dtype):
+        ptr = gfx2cuda.dll.d3d.d3d11_open_shared_buffer(handle, self.handle)
+        buf = D3D11SharedBuffer(shape, dtype, self, ptr)
+        self.make_current()
+        buf.register()
+        return buf
+
     @classmethod
     def discover_devices(cls):
         dxgi_factory = gfx2cuda.dll.dxgi.new_dxgi_factory()
@@ -204,14 +1459,33 @@ class D3D11Device(Device):
         devices = []
         for dxgi_adapter in dxgi_adapters:
             dxgi_adapter_desc = gfx2cuda.dll.dxgi.dxgi_adapter_description(dxgi_adapter)
-            devices += [cls(name=dxgi_adapter_desc, adapter=dxgi_adapter, backend=Backends.D3D11)]
+            luid = gfx2cuda.dll.dxgi.dxgi_adapter_luid(dxgi_adapter)
+            devices += [cls(name=dxgi_adapter_desc, adapter=dxgi_adapter, backend=Backends.D3D11,
+                            luid=luid)]
 
         return devices
 
 
+class D3D11QueryEvent(Event):
+    def __init__(self, device, query):
+        self._device = device
+        self._query = query
+
+    def query(self):
+        with self._device.context_lock:
+            return gfx2cuda.dll.d3d.d3d11_query_done(self._device.context, self._query)
+
+    def wait(self):
+        # D3D11 queries can only be polled, back off up to 1 ms between polls
+        delay = 1e-5
+        while not self.query():
+            time.sleep(delay)
+            delay = min(delay * 2, 1e-3)
+
+
 class OpenGLDevice(Device):
-    def __init__(self, name=None, adapter=None, backend=None):
-        super().__init__(name, adapter, backend)
+    def __init__(self, name=None, adapter=None, backend=None, luid=None):
+        super().__init__(name, adapter, backend, luid)
 
     def init_context(self):
         raise NotImplementedError
@@ -222,6 +1496,58 @@ class OpenGLDevice(Device):
     def open_ipc_handle(self, handle):
         raise NotImplementedError
 
+    def open_ipc_buffer(self, handle, shape, dtype):
+        raise NotImplementedError
+
     @classmethod
     def discover_devices(cls):
         raise NotImplementedError
+
+
+class SimulatedDevice(Device):
+    def __init__(self, name=None, adapter=None, backend=None, luid=None):
+        super().__init__(name, adapter, backend, luid)
+        self._allocations = {}
+
+    def init_context(self):
+        self.dev = self.adapter
+
+    def synchronize(self):
+        pass
+
+    def fence(self):
+        return Event()
+
+    def allocate(self, nbytes):
+        buf = ctypes.create_string_buffer(nbytes)
+        self._allocations[ctypes.addressof(buf)] = buf
+        return ctypes.addressof(buf)
+
+    def free(self, ptr):
+        del self._allocations[ptr]
+
+    # Plain host memory stands in for page-locked memory
+    allocate_host = allocate
+    free_host = free
+
+    def copy_peer(self, dst, dst_device, src, nbytes):
+        ctypes.memmove(dst, src, nbytes)
+
+    def open_ipc_handle(self, handle):
+        shm = _open_shared_memory(_simulated_shm_name(handle))
+        tex = SimulatedTexture.create_from_ptr(shm, self)
+        tex.register()
+        return tex
+
+    def open_ipc_buffer(self, handle, shape, dtype):
+        shm = _open_shared_memory(_simulated_shm_name(handle))
+        buf = SimulatedSharedBuffer(shape, dtype, self, shm)
+        buf.register()
+        return buf
+
+    @classmethod
+    def discover_devices(cls):
+        # GFX2CUDA_SIMULATED_ADAPTERS sets the number of adapters, all processes should agree on it
+        count = int(os.environ.get('GFX2CUDA_SIMULATED_ADAPTERS', 1))
+        return [cls(name=f"Simulated Adapter {i}", adapter=i, backend=Backends.SIMULATED,
+                    luid=i + 1) for i in range(count)]
@@ -0,0 +1,305 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import gfx2cuda
+from gfx2cuda.exception import Gfx2CudaError
+
+# python -m gfx2cuda.bench [--formats ...] [--sizes ...] [--output results.json]
+#                          [--baseline baseline.json]
+# python -m gfx2cuda.bench --compare results.json --baseline baseline.json
+
+_size_names = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160),
+    '8k': (7680, 4320),
+}
+default_sizes = ['64x64', '256x256', '720p', '1080p', '4k', '8k']
+
+
+def parse_size(size):
+    if size.lower() in _size_names:
+        return _size_names[size.lower()]
+    try:
+        width, height = size.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"size {size!r} is not WIDTHxHEIGHT or one of {list(_size_names)}")
+
+
+def select_backend(name=None):
+    # The requested backend, else D3D11 when it initializes and the host memory backend otherwise
+    name = name or os.environ.get('GFX2CUDA_BACKEND')
+    candidates = [gfx2cuda.Backends[name.upper()]] if name else []
+    if not candidates and sys.platform == 'win32':
+        candidates.append(gfx2cuda.Backends.D3D11)
+    candidates.append(gfx2cuda.Backends.SIMULATED)
+    for backend in candidates:
+        try:
+            gfx2cuda._lazy_init(backend)
+            return backend
+        except (Gfx2CudaError, OSError, ImportError, AttributeError) as e:
+            # Hosts without DirectX lack comtypes or the D3D entry points
+            print(f"{backend.name} backend is not available: {e}", file=sys.stderr)
+    raise Gfx2CudaError("No backend is available")
+
+
+def summarize(samples, nbytes=None):
+    ms = np.asarray(samples) * 1e3
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    result = {
+        'samples': len(ms),
+        'mean_ms': float(ms.mean()),
+        'min_ms': float(ms.min()),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'max_ms': float(ms.max()),
+    }
+    if nbytes:
+        result['bytes'] = nbytes
+        result['gbps'] = nbytes / (p50 / 1e3) / 1e9
+    return result
+
+
+def _measure(run, repeat, warmup, max_seconds):
+    # At least 3 samples, then stop early once max_seconds have passed
+    samples = []
+    start = time.perf_counter()
+    for i in range(warmup + repeat):
+        begin = time.perf_counter()
+        run()
+        if i >= warmup:
+            samples.append(time.perf_counter() - begin)
+            if len(samples) >= 3 and time.perf_counter() - start > max_seconds:
+                break
+    return samples
+
+
+def bench_copy(backend, fmt, width, height, direction, repeat, warmup, max_seconds):
+    # One frame: map, copy the whole texture to or from a linear device buffer, unmap and wait for
+    # it
+    tex = gfx2cuda.texture([height, width, fmt.channels], fmt, backend=backend)
+    buf = tex.device.allocate(tex.nbytes)
+    copy = tex.copy_to if direction == 'to' else tex.copy_from
+
+    def run():
+        tex.map()
+        copy(buf)
+        tex.unmap()
+        tex.wait()
+    try:
+        return _measure(run, repeat, warmup, max_seconds)
+    finally:
+        tex.device.free(buf)
+        tex.close()
+
+
+def _ipc_consumer(conn, backend_name):
+    # Opens every handle it receives as a new texture, copies it once and reports the timings
+    backend = gfx2cuda.Backends[backend_name]
+    gfx2cuda.set_ipc_cache(gfx2cuda.IpcCache(capacity=0), backend=backend)
+    conn.send('ready')
+    buf = None
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        handle, sent = message
+        start = time.perf_counter_ns()
+        tex = gfx2cuda.open_ipc_texture(handle)
+        opened = time.perf_counter_ns()
+        if buf is None:
+            buf = tex.device.allocate(tex.nbytes)
+        with tex:
+            tex.copy_to(buf)
+        tex.wait()
+        done = time.perf_counter_ns()
+        gfx2cuda.release(tex)
+        conn.send((opened - start, done - sent))
+    if buf is not None:
+        tex.device.free(buf)
+
+
+def bench_ipc(backend, fmt, width, height, repeat, warmup):
+    # Handoff is from sending a new texture's handle until the other process has opened it and
+    # copied a frame out of it, perf_counter is system wide on Linux and Windows
+    context = multiprocessing.get_context('spawn')
+    conn, child_conn = context.Pipe()
+    process = context.Process(target=_ipc_consumer, args=(child_conn, backend.name), daemon=True)
+    process.start()
+    try:
+        conn.recv()
+        opens = []
+        handoffs = []
+        for i in range(warmup + repeat):
+            tex = gfx2cuda.texture([height, width, fmt.channels], fmt, backend=backend)
+            handle = tex.ipc_handle
+            conn.send((handle, time.perf_counter_ns()))
+            open_ns, handoff_ns = conn.recv()
+            tex.close()
+            if i >= warmup:
+                opens.append(open_ns / 1e9)
+                handoffs.append(handoff_ns / 1e9)
+        conn.send(None)
+        process.join()
+    finally:
+        if process.is_alive():
+            process.kill()
+    return opens, handoffs
+
+
+def run(args):
+    backend = select_backend(args.backend)
+    device = gfx2cuda._instance.device
+    formats = [gfx2cuda.TextureFormat[name.upper()] for name in args.formats] if args.formats \
+        else list(gfx2cuda.TextureFormat)
+    results = []
+
+    def add(name, entry):
+        entry = dict(name=name, **entry)
+        results.append(entry)
+        if 'p50_ms' in entry:
+            rate = f" {entry['gbps']:8.2f} GB/s" if 'gbps' in entry else ''
+            print(f"{name:<40} p50 {entry['p50_ms']:9.3f} ms  p99 {entry['p99_ms']:9.3f} ms{rate}",
+                  file=sys.stderr)
+        else:
+            print(f"{name:<40} {entry.get('error', entry.get('skipped'))}", file=sys.stderr)
+
+    for fmt in formats:
+        for width, height in args.sizes:
+            nbytes = width * height * fmt.get_pixel_size()
+            for direction in args.directions:
+                name = f"copy_{direction}/{fmt.name}/{width}x{height}"
+                case = {'format': fmt.name, 'width': width, 'height': height,
+                        'direction': direction}
+                if nbytes > args.max_bytes:
+                    add(name, dict(case, skipped=f"{nbytes} bytes exceed --max-bytes"))
+                    continue
+                try:
+                    samples = bench_copy(backend, fmt, width, height, direction, args.repeat,
+                                         args.warmup, args.max_seconds)
+                except Gfx2CudaError as e:
+                    add(name, dict(case, error=str(e)))
+                    continue
+                add(name, dict(case, **summarize(samples, nbytes)))
+            gfx2cuda.flush_releases()
+
+    if args.ipc_repeat:
+        fmt = gfx2cuda.TextureFormat[args.ipc_format.upper()]
+        width, height = args.ipc_size
+        opens, handoffs = bench_ipc(backend, fmt, width, height, args.ipc_repeat, args.warmup)
+        case = {'format': fmt.name, 'width': width, 'height': height}
+        add(f"ipc_open/{fmt.name}/{width}x{height}", dict(case, **summarize(opens)))
+        add(f"ipc_handoff/{fmt.name}/{width}x{height}", dict(case, **summarize(handoffs)))
+
+    return {
+        'meta': {
+            'backend': backend.name,
+            'device': device.name,
+            'gfx2cuda': gfx2cuda.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    # Cases whose median got slower than the baseline's by more than threshold, a fraction
+    base = {entry['name']: entry for entry in baseline['results'] if 'p50_ms' in entry}
+    regressions = []
+    for entry in current['results']:
+        before = base.get(entry['name'])
+        if before is None or 'p50_ms' not in entry:
+            continue
+        ratio = entry['p50_ms'] / before['p50_ms']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'name': entry['name'],
+                'baseline_p50_ms': before['p50_ms'],
+                'p50_ms': entry['p50_ms'],
+                'ratio': ratio,
+            })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m gfx2cuda.bench',
+        description="Copy throughput and IPC handoff latency of gfx2cuda")
+    parser.add_argument('--backend',
+                        help="d3d11 or simulated, by default D3D11 if it is available")
+    parser.add_argument('--formats', nargs='+', metavar='FORMAT',
+                        help="TextureFormat names, all by default")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, metavar='SIZE',
+                        default=[parse_size(size) for size in default_sizes],
+                        help=f"WIDTHxHEIGHT or one of {list(_size_names)}, "
+                             f"default {' '.join(default_sizes)}")
+    parser.add_argument('--directions', nargs='+', choices=['to', 'from'], default=['to', 'from'],
+                        help="copy_to (texture to buffer) and/or copy_from")
+    parser.add_argument('--repeat', type=int, default=20, help="samples per case")
+    parser.add_argument('--warmup', type=int, default=2, help="untimed runs before the samples")
+    parser.add_argument('--max-seconds', type=float, default=1.0,
+                        help="stop sampling a case after this long, with at least 3 samples")
+    parser.add_argument('--max-bytes', type=int, default=1 << 30,
+                        help="skip textures larger than this")
+    parser.add_argument('--ipc-repeat', type=int, default=20,
+                        help="handoffs to measure, 0 to skip")
+    parser.add_argument('--ipc-format', default='RGBA8UNORM')
+    parser.add_argument('--ipc-size', type=parse_size, default=parse_size('1080p'))
+    parser.add_argument('--output', '-o', help="write the JSON results here instead of stdout")
+    parser.add_argument('--baseline',
+                        help="results to compare with, regressions make the exit code 1")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="slowdown of the median that counts as a regression, "
+                             "default 0.1 for 10%%")
+    parser.add_argument('--compare', metavar='RESULTS',
+                        help="compare these results instead of running")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        if not args.baseline:
+            raise SystemExit("--compare needs --baseline")
+        with open(args.compare) as f:
+            results = json.load(f)
+    else:
+        results = run(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=1)
+        else:
+            json.dump(results, sys.stdout, indent=1)
+            print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']}: "
+                  f"p50 {regression['baseline_p50_ms']:.3f} ms -> {regression['p50_ms']:.3f} ms "
+                  f"({regression['ratio']:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
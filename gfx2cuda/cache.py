@@ -0,0 +1,157 @@
+import collections
+import threading
+import weakref
+
+import gfx2cuda.finalize
+
+
+class IpcCache:
+    # Textures opened from IPC handles. Every open takes a reference and gfx2cuda.release gives it
+    # back, textures without references stay cached until the cache is over capacity, least
+    # recently released first, and are then unregistered and released. Textures in use are only
+    # referenced weakly, so a texture dropped without gfx2cuda.release leaves the cache when it
+    # is collected.
+
+    def __init__(self, capacity=16):
+        # Released textures kept open for the next open of their handle, each holds a registered
+        # texture of the full size
+        self.capacity = capacity
+        self.opens = 0
+        self.hits = 0
+        self.evictions = 0
+        # Weak reference, reference count and id of the texture by key
+        self._entries = {}
+        self._keys = {}
+        # Unreferenced textures by key from least to most recently released
+        self._idle = collections.OrderedDict()
+        # Keys being opened, other threads opening the same key wait for the event
+        self._opening = {}
+        # Keys of collected textures, appended by the weak reference callbacks which may run
+        # while the lock is held
+        self._collected = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, key, open):
+        # Returns the texture for key and takes a reference, open() is called on a miss. Opens
+        # are slow and run without the lock, hits on other keys do not wait for them.
+        while True:
+            with self._lock:
+                self._purge()
+                tex = self._hit(key)
+                if tex is not None:
+                    return tex
+                opening = self._opening.get(key)
+                if opening is None:
+                    opening = self._opening[key] = threading.Event()
+                    break
+            opening.wait()
+        try:
+            tex = open()
+        except BaseException:
+            with self._lock:
+                del self._opening[key]
+            opening.set()
+            raise
+        with self._lock:
+            del self._opening[key]
+            self.opens += 1
+            self._add(key, tex)
+            evicted = self._trim()
+        opening.set()
+        self._free(evicted)
+        return tex
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0]() if entry is not None else None
+
+    def release(self, tex):
+        # Returns False for textures that are not in the cache
+        with self._lock:
+            self._purge()
+            key = self._keys.get(id(tex))
+            entry = self._entries.get(key)
+            if entry is None or entry[0]() is not tex:
+                return False
+            entry[1] = max(entry[1] - 1, 0)
+            if entry[1] == 0:
+                self._idle[key] = tex
+            evicted = self._trim()
+        self._free(evicted)
+        return True
+
+    def clear(self):
+        # Frees the unreferenced textures, referenced ones are left to their users
+        with self._lock:
+            evicted = [self._evict(key) for key in list(self._idle)]
+            self._entries.clear()
+            self._keys.clear()
+        self._free(evicted)
+
+    def stats(self):
+        with self._lock:
+            self._purge()
+            return {
+                'opens': self.opens,
+                'hits': self.hits,
+                'evictions': self.evictions,
+                'cached': len(self._entries),
+                'in_use': len(self._entries) - len(self._idle),
+            }
+
+    def __len__(self):
+        with self._lock:
+            self._purge()
+            return len(self._entries)
+
+    def _hit(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        tex = entry[0]()
+        if tex is None or tex.closed:
+            # Collected, or closed by its user, open it again
+            self._idle.pop(key, None)
+            self._remove(key)
+            return None
+        self.hits += 1
+        entry[1] += 1
+        self._idle.pop(key, None)
+        return tex
+
+    def _add(self, key, tex):
+        ref = weakref.ref(tex, lambda ref: self._collected.append((key, ref)))
+        self._entries[key] = [ref, 1, id(tex)]
+        self._keys[id(tex)] = key
+
+    def _remove(self, key):
+        _, _, tex_id = self._entries.pop(key)
+        # The id may already belong to a texture opened after this one was collected
+        if self._keys.get(tex_id) == key:
+            del self._keys[tex_id]
+
+    def _purge(self):
+        while self._collected:
+            key, ref = self._collected.popleft()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is ref:
+                self._remove(key)
+
+    def _trim(self):
+        evicted = []
+        while len(self._entries) > self.capacity and self._idle:
+            evicted.append(self._evict(next(iter(self._idle))))
+        return evicted
+
+    def _evict(self, key):
+        tex = self._idle.pop(key)
+        self._remove(key)
+        self.evictions += 1
+        return tex
+
+    @staticmethod
+    def _free(textures):
+        # Unregistering waits for the GPU, it is left to the release queue
+        for tex in textures:
+            gfx2cuda.finalize.defer(tex._detach())
@@ -0,0 +1,240 @@
+import time
+from abc import ABCMeta, abstractmethod
+
+import numpy as np
+
+import gfx2cuda
+import gfx2cuda.dll
+import gfx2cuda.rects
+from gfx2cuda.backends import Backends, D3D11Texture
+from gfx2cuda.exception import Gfx2CudaError
+from gfx2cuda.format import TextureFormat
+
+
+class FrameSource(metaclass=ABCMeta):
+    def __init__(self, width, height, format, backend):
+        self.width = width
+        self.height = height
+        self.format = format
+        self.backend = backend
+
+    @abstractmethod
+    def acquire(self, timeout_ms):
+        # Returns the texture holding the next frame and the number of frames presented since the
+        # previous one, or (None, 0) when no frame arrived within the timeout
+        pass
+
+    @abstractmethod
+    def release(self):
+        pass
+
+    def updated_rects(self):
+        # Regions of the acquired frame that changed since the previous acquired frame, None if
+        # unknown
+        return None
+
+    def close(self):
+        pass
+
+
+class DuplicationSource(FrameSource):
+    def __init__(self, device, output=0):
+        self.device = device
+        self._output = gfx2cuda.dll.dxgi.get_dxgi_output(device.adapter, output)
+        width, height = gfx2cuda.dll.dxgi.dxgi_output_size(self._output)
+        super().__init__(width, height, TextureFormat.BGRA8UNORM, Backends.D3D11)
+        self._duplication = gfx2cuda.dll.dxgi.dxgi_duplicate_output(self._output, device.handle)
+        # The duplicated surface changes between frames, so it is copied on the device into a
+        # texture that is registered with CUDA once
+        ptr = gfx2cuda.dll.d3d.d3d11_create_texture_2d(
+            width, height, device.handle, self.format.get_dxgi_format(), False)
+        self.texture = D3D11Texture(width, height, self.format, device, ptr=ptr)
+        self.texture.register()
+        self._acquired = False
+        self._updated = None
+
+    def acquire(self, timeout_ms):
+        if self._duplication is None and not self._duplicate():
+            # Not possible while e.g. the secure desktop is shown, retried at most every second
+            time.sleep(min(timeout_ms, 1000) / 1000)
+            return None, 0
+        try:
+            frame_info, frame = gfx2cuda.dll.dxgi.dxgi_acquire_next_frame(
+                self._duplication, timeout_ms)
+        except gfx2cuda.dll.dxgi.comtypes.COMError as e:
+            if e.hresult != gfx2cuda.dll.dxgi.DXGI_ERROR_ACCESS_LOST:
+                raise
+            # Mode changes and secure desktops invalidate the duplication, the old one has to be
+            # released before the output can be duplicated again
+            gfx2cuda.dll.d3d.com_release(self._duplication)
+            self._duplication = None
+            self._duplicate()
+            return None, 0
+        if frame is None:
+            return None, 0
+        self._acquired = True
+        with self.device.context_lock:
+            gfx2cuda.dll.d3d.d3d11_copy_resource(self.device.context, self.texture._tex, frame)
+        self._updated = self._read_updated_rects(frame_info)
+        return self.texture, frame_info.AccumulatedFrames
+
+    def _duplicate(self):
+        # Fails for a while after a mode switch or on the secure desktop
+        try:
+            self._duplication = gfx2cuda.dll.dxgi.dxgi_duplicate_output(
+                self._output, self.device.handle)
+        except gfx2cuda.dll.dxgi.comtypes.COMError:
+            return False
+        return True
+
+    def _read_updated_rects(self, frame_info):
+        # Moved regions already hold their new content in the acquired surface, so they are copied
+        # from it like dirty regions instead of being moved inside the destination
+        size = frame_info.TotalMetadataBufferSize
+        if size == 0:
+            return []
+        moves = gfx2cuda.dll.dxgi.dxgi_frame_move_rects(self._duplication, size)
+        dirty = gfx2cuda.dll.dxgi.dxgi_frame_dirty_rects(self._duplication, size)
+        return gfx2cuda.rects.from_ltrb([dst for _, dst in moves] + dirty)
+
+    def updated_rects(self):
+        return self._updated
+
+    def release(self):
+        if self._acquired:
+            gfx2cuda.dll.dxgi.dxgi_release_frame(self._duplication)
+            self._acquired = False
+
+    def close(self):
+        self.release()
+        gfx2cuda.dll.d3d.com_release(self._duplication)
+        self._duplication = None
+
+
+def _default_allocator(source):
+    shape = (source.height, source.width, source.format.elements)
+    if source.backend == Backends.SIMULATED:
+        return lambda: np.empty(shape, dtype=source.format.dtype)
+    try:
+        import torch
+    except ImportError:
+        raise Gfx2CudaError(
+            "torch is needed to allocate capture buffers, pass an allocator instead")
+    # torch has no unsigned 16 and 32 bit types, their bits are kept in the signed types
+    dtype = source.format.dtype
+    dtype = getattr(torch, {'uint16': 'int16', 'uint32': 'int32'}.get(dtype, dtype))
+    return lambda: torch.empty(shape, dtype=dtype, device='cuda')
+
+
+class Capture:
+    def __init__(self, output=0, buffers=3, timeout_ms=100, source=None, allocator=None,
+                 incremental=False, **kwargs):
+        if source is None:
+            gfx2cuda._lazy_init(**kwargs)
+            source = DuplicationSource(gfx2cuda._instance.device, output)
+        self.source = source
+        self.timeout_ms = timeout_ms
+        allocator = allocator or _default_allocator(source)
+        # Incremental capture only copies changed regions into a single persistent buffer
+        self.incremental = incremental
+        if incremental:
+            buffers = 1
+        # A returned buffer stays untouched for the next buffers - 1 grabs
+        self._ring = [allocator() for _ in range(buffers)]
+        self._pending = None
+        self.updated_fraction = 0.0
+        self._index = -1
+        self.frames_captured = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self.timeouts = 0
+        self.timestamp = None
+
+    def grab(self, timeout_ms=None, copy=True):
+        if timeout_ms is None:
+            timeout_ms = self.timeout_ms
+        texture, accumulated = self.source.acquire(timeout_ms)
+        if texture is None:
+            self.timeouts += 1
+            return None
+        try:
+            if self.incremental:
+                updated = self.source.updated_rects()
+                if updated is None or self._pending is None:
+                    self._pending = None
+                else:
+                    self._pending = gfx2cuda.rects.coalesce(self._pending + updated)
+            if copy:
+                index = (self._index + 1) % len(self._ring)
+                with texture:
+                    self._copy_frame(texture, self._ring[index])
+                self._index = index
+        finally:
+            self.source.release()
+        # Frames presented while nobody was acquiring were never seen
+        self.frames_dropped += max(accumulated - 1, 0)
+        if not copy:
+            self.frames_skipped += 1
+            return None
+        self.frames_captured += 1
+        self.timestamp = time.perf_counter()
+        return self._ring[self._index]
+
+    def _copy_frame(self, texture, buffer):
+        if self._pending is None:
+            texture.copy_to(buffer)
+            self.updated_fraction = 1.0
+        else:
+            rects = gfx2cuda.rects.clip(self._pending, texture.width, texture.height)
+            for x, y, w, h in rects:
+                texture.copy_to(buffer, rect=(x, y, w, h), dst_offset=(x, y))
+            self.updated_fraction = gfx2cuda.rects.coverage(rects, texture.width, texture.height)
+        if self.incremental:
+            self._pending = []
+
+    def latest(self):
+        if self._index < 0:
+            return None
+        return self._ring[self._index]
+
+    def frames(self, timeout_ms=None, on_timeout='wait', skip=0, target_fps=None):
+        # on_timeout is one of 'wait' (keep waiting), 'repeat' (yield the latest frame again) or
+        # 'stop'
+        if on_timeout not in ('wait', 'repeat', 'stop'):
+            raise ValueError(f"unknown timeout policy {on_timeout}")
+        interval = 1.0 / target_fps if target_fps else 0.0
+        deadline = time.perf_counter()
+        count = 0
+        while self.source is not None:
+            copy = count % (skip + 1) == skip
+            if copy and interval:
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                # A slow consumer is not followed by a burst of frames to catch up
+                deadline = max(deadline + interval, time.perf_counter())
+            timeouts = self.timeouts
+            frame = self.grab(timeout_ms, copy=copy)
+            if self.timeouts != timeouts:
+                if on_timeout == 'stop':
+                    return
+                if on_timeout == 'repeat' and self._index >= 0:
+                    yield self.latest()
+                continue
+            count += 1
+            if frame is not None:
+                yield frame
+
+    def __iter__(self):
+        return self.frames()
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
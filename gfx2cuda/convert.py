@@ -0,0 +1,213 @@
+import ctypes
+
+import numpy as np
+
+import gfx2cuda.dll
+from gfx2cuda.exception import Gfx2CudaUnsupoortedError
+
+_dtypes = ('float32', 'float16', 'uint8')
+_layouts = ('HWC', 'CHW')
+
+
+def unpack(pixels, format):
+    # Splits the channels of packed formats, [H, W, 1] elements to [H, W, C] values
+    if not format.packed:
+        return pixels
+    element = pixels[..., 0].astype(np.uint32)
+    channels = []
+    shift = 0
+    for bits in format.bits:
+        value = (element >> shift) & ((1 << bits) - 1)
+        if format.name.endswith('FLOAT'):
+            value = _unsigned_float(value, bits - 5)
+        channels.append(value)
+        shift += bits
+    return np.stack(channels, axis=-1)
+
+
+def _unsigned_float(value, mantissa_bits):
+    # The 11 and 10 bit floats of R11G11B10: 5 exponent bits with a bias of 15, no sign
+    exponent = (value >> mantissa_bits).astype(np.int32)
+    mantissa = (value & ((1 << mantissa_bits) - 1)) / float(1 << mantissa_bits)
+    out = np.where(exponent == 0, mantissa * 2.0 ** -14, (1 + mantissa) * np.exp2(exponent - 15.0))
+    out = np.where(exponent == 31, np.where(mantissa == 0, np.inf, np.nan), out)
+    return out.astype(np.float32)
+
+
+class Conversion:
+    # Applied per pixel while copying: select and reorder channels, scale normalized formats to
+    # [0, 1], then (value - mean) / std, written as dtype in HWC or CHW layout
+
+    def __init__(self, dtype='float32', channels=None, normalize=True, mean=None, std=None,
+                 layout='HWC'):
+        self.dtype = np.dtype(dtype).name
+        if self.dtype not in _dtypes:
+            raise ValueError(f"conversion to {self.dtype} is not supported, use one of {_dtypes}")
+        if layout not in _layouts:
+            raise ValueError(f"unknown layout {layout}, use one of {_layouts}")
+        self.channels = channels
+        self.normalize = normalize
+        self.mean = mean
+        self.std = std
+        self.layout = layout
+
+    def _key(self):
+        def freeze(value):
+            return tuple(np.atleast_1d(value).tolist()) if value is not None else None
+        channels = self.channels if isinstance(self.channels, str) else freeze(self.channels)
+        return (self.dtype, channels, self.normalize, freeze(self.mean), freeze(self.std),
+                self.layout)
+
+    def __eq__(self, other):
+        return isinstance(other, Conversion) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def source_channels(self, format):
+        if self.channels is None:
+            return list(range(format.channels))
+        names = format.order
+        if isinstance(self.channels, str):
+            if any(name not in names for name in self.channels):
+                raise ValueError(f"channels {self.channels} are not all in {format} ({names})")
+            return [names.index(name) for name in self.channels]
+        indices = [int(index) for index in self.channels]
+        if any(index < 0 or index >= format.channels for index in indices):
+            raise ValueError(f"channels {self.channels} are out of range for {format}")
+        return indices
+
+    def coefficients(self, format):
+        # Source channel, factor and offset of every output channel: out = in * factor + offset
+        indices = self.source_channels(format)
+        scale = np.ones(len(indices))
+        if self.normalize and format.normalized:
+            scale = np.array([1.0 / (2 ** format.bits[index] - 1) for index in indices])
+        count = len(indices)
+        mean = 0.0 if self.mean is None else self.mean
+        std = 1.0 if self.std is None else self.std
+        mean = np.broadcast_to(np.asarray(mean, np.float64), (count,))
+        std = np.broadcast_to(np.asarray(std, np.float64), (count,))
+        factors = (scale / std).astype(np.float32)
+        offsets = (-mean / std).astype(np.float32)
+        return indices, factors, offsets
+
+    def shape(self, format, width, height):
+        channels = len(self.source_channels(format))
+        if self.layout == 'CHW':
+            return channels, height, width
+        return height, width, channels
+
+    def nbytes(self, format, width, height):
+        return int(np.prod(self.shape(format, width, height))) * np.dtype(self.dtype).itemsize
+
+
+def as_conversion(convert):
+    if isinstance(convert, Conversion):
+        return convert
+    if isinstance(convert, dict):
+        return Conversion(**convert)
+    raise ValueError("convert must be a Conversion or a dict of its arguments")
+
+
+def reference(pixels, format, conversion):
+    # pixels is a [H, W, format.elements] array of the format's element type
+    indices, factors, offsets = conversion.coefficients(format)
+    out = unpack(pixels, format)[..., indices].astype(np.float32) * factors + offsets
+    if conversion.dtype == 'uint8':
+        out = np.clip(np.rint(out), 0, 255)
+    out = out.astype(conversion.dtype)
+    if conversion.layout == 'CHW':
+        out = out.transpose(2, 0, 1)
+    return np.ascontiguousarray(out)
+
+
+_kernel_template = r"""
+__device__ unsigned short to_half(float v)
+{{
+    unsigned short h;
+    asm("cvt.rn.f16.f32 %0, %1;" : "=h"(h) : "f"(v));
+    return h;
+}}
+
+extern "C" __global__ void convert(cudaTextureObject_t src, {out_type} *dst, int x0, int y0,
+                                   int width, int height)
+{{
+    int x = blockIdx.x * blockDim.x + threadIdx.x;
+    int y = blockIdx.y * blockDim.y + threadIdx.y;
+    if (x >= width || y >= height)
+        return;
+    {fetch_type} p = tex2D<{fetch_type}>(src, x0 + x + 0.5f, y0 + y + 0.5f);
+    float v[4] = {{{components}}};
+{stores}
+}}
+"""
+
+_fetch_types = {
+    'uint8': ('unsigned char', 'uchar'),
+    'uint16': ('unsigned short', 'ushort'),
+    # Half textures are read as float
+    'float16': ('float', 'float'),
+    'float32': ('float', 'float'),
+    'uint32': ('unsigned int', 'uint'),
+}
+
+_stores = {
+    'float32': ('float', '{}'),
+    'float16': ('unsigned short', 'to_half({})'),
+    'uint8': ('unsigned char', '(unsigned char)fminf(fmaxf(rintf({}), 0.0f), 255.0f)'),
+}
+
+
+def kernel_source(format, conversion):
+    # CUDA can only map textures with 1, 2 or 4 channels of 8, 16 or 32 bits
+    if format.packed or format.channels not in (1, 2, 4):
+        raise Gfx2CudaUnsupoortedError(f"conversion from {format} is not supported")
+    scalar, vector = _fetch_types[format.dtype]
+    if format.channels == 1:
+        fetch_type = scalar
+        components = ['(float)p']
+    else:
+        fetch_type = f"{vector}{format.channels}"
+        components = [f"(float)p.{name}" for name in 'xyzw'[:format.channels]]
+    components += ['0.0f'] * (4 - len(components))
+
+    indices, factors, offsets = conversion.coefficients(format)
+    out_type, store = _stores[conversion.dtype]
+    count = len(indices)
+    stores = []
+    for i, (index, factor, offset) in enumerate(zip(indices, factors, offsets)):
+        if conversion.layout == 'CHW':
+            position = f"({i} * height + y) * width + x"
+        else:
+            position = f"(y * width + x) * {count} + {i}"
+        value = f"v[{index}] * {float(factor)!r}f + {float(offset)!r}f"
+        stores.append(f"    dst[{position}] = {store.format(value)};")
+    return _kernel_template.format(out_type=out_type, fetch_type=fetch_type,
+                                   components=', '.join(components), stores='\n'.join(stores))
+
+
+_kernels = {}
+
+
+def _kernel(format, conversion):
+    # Compiled once per device, format and conversion
+    dev = gfx2cuda.dll.cuda.cuda_get_device()
+    key = (dev, format, conversion)
+    if key not in _kernels:
+        capability = gfx2cuda.dll.cuda.cuda_compute_capability(dev)
+        ptx = gfx2cuda.dll.nvrtc.nvrtc_compile(
+            kernel_source(format, conversion), 'convert.cu',
+            [f"--gpu-architecture=compute_{capability[0]}{capability[1]}"])
+        module = gfx2cuda.dll.driver.cu_module_load_data(ptx)
+        _kernels[key] = (module, gfx2cuda.dll.driver.cu_module_get_function(module, 'convert'))
+    return _kernels[key][1]
+
+
+def launch(texture_object, dst, rect, format, conversion, stream=0):
+    x, y, width, height = rect
+    block = (16, 16, 1)
+    grid = ((width + block[0] - 1) // block[0], (height + block[1] - 1) // block[1], 1)
+    args = [ctypes.c_ulonglong(texture_object), ctypes.c_void_p(dst), ctypes.c_int(x),
+            ctypes.c_int(y), ctypes.c_int(width), ctypes.c_int(height)]
+    gfx2cuda.dll.driver.cu_launch_kernel(_kernel(format, conversion), grid, block, args, stream)
@@ -0,0 +1,55 @@
+import ctypes
+import functools
+import glob
+import importlib
+import os
+import sys
+
+
+def __getattr__(name):
+    # The bindings are imported on first use, d3d and dxgi need comtypes which only exists on
+    # Windows
+    if name in ('cuda', 'driver', 'nvrtc', 'd3d', 'dxgi'):
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.lru_cache(maxsize=None)
+def find_toolkit_library(name):
+    # Finds a CUDA toolkit library such as cudart or nvrtc. CUDA_PATH is set by the installers on
+    # Windows, the toolkit's default prefix and the loader's search path cover Linux.
+    if sys.platform == 'win32':
+        bits = 64 if ctypes.sizeof(ctypes.c_void_p) == 8 else 32
+        patterns = [f"bin/{name}{bits}_*.dll"]
+    else:
+        patterns = [f"{directory}/lib{name}.so*"
+                    for directory in ('lib64', 'lib', 'targets/*/lib')]
+    roots = [os.getenv('CUDA_PATH'), os.getenv('CUDA_HOME'), '/usr/local/cuda']
+    for root in filter(None, roots):
+        for pattern in patterns:
+            found = sorted(path for path in glob.glob(os.path.join(root, pattern))
+                           if '.alt.' not in path)
+            if found:
+                return found[0]
+    import ctypes.util
+    return ctypes.util.find_library(name)
+
+
+def bind(lib, prototypes):
+    for name, (restype, argtypes) in prototypes.items():
+        # Libraries built without D3D11 interop lack some of the functions
+        func = getattr(lib, name, None)
+        if func is not None:
+            func.restype = restype
+            func.argtypes = argtypes
+    return lib
+
+
+class LazyLibrary:
+    # Stands in for a library until the first call, load() then replaces it in its module
+
+    def __init__(self, load):
+        self._load = load
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
@@ -1,60 +1,407 @@
-import os
 from ctypes import *
-import glob
 
-CUDA_PATH = os.getenv('CUDA_PATH')
-if sizeof(c_void_p) == 8:
-    _cu_re = '/bin/cudart64_*'
-else:  # == 4
-    _cu_re = '/bin/cudart32_*'
+from gfx2cuda.dll import LazyLibrary, bind, find_toolkit_library
+from gfx2cuda.exception import Gfx2CudaError, Gfx2CudaRuntimeError
 
-cu_path = glob.glob(CUDA_PATH + _cu_re)[0]
-cu = cdll.LoadLibrary(cu_path)
+cudaSuccess = 0
+cudaErrorNotReady = 600
+cudaMemcpyHostToDevice = 1
+cudaMemcpyDeviceToHost = 2
+cudaMemcpyDeviceToDevice = 3
+cudaEventDefault = 0
+cudaEventDisableTiming = 2
+# Handle of the legacy default stream, which synchronizes with all blocking streams
+cudaStreamLegacy = 1
+# Handle of the calling thread's default stream, it synchronizes with the legacy default stream
+cudaStreamPerThread = 2
+# Page-locked memory usable from every CUDA context
+cudaHostAllocPortable = 1
+cudaGraphicsMapFlagsNone = 0
+cudaGraphicsMapFlagsReadOnly = 1
+cudaResourceTypeArray = 0
+cudaAddressModeClamp = 1
+cudaDevAttrComputeCapabilityMajor = 75
+cudaDevAttrComputeCapabilityMinor = 76
+
+
+class cudaResourceDesc(Structure):
+    # Only the array member of the union is used, the padding covers the largest member
+    _fields_ = [
+        ('resType', c_int),
+        ('array', c_void_p),
+        ('_union', c_byte * 48),
+    ]
+
+
+class cudaTextureDesc(Structure):
+    # Fields added by later CUDA versions are left zero in the padding
+    _fields_ = [
+        ('addressMode', c_int * 3),
+        ('filterMode', c_int),
+        ('readMode', c_int),
+        ('sRGB', c_int),
+        ('borderColor', c_float * 4),
+        ('normalizedCoords', c_int),
+        ('_reserved', c_byte * 128),
+    ]
+
+
+class cudaPos(Structure):
+    _fields_ = [('x', c_size_t), ('y', c_size_t), ('z', c_size_t)]
+
+
+class cudaPitchedPtr(Structure):
+    _fields_ = [('ptr', c_void_p), ('pitch', c_size_t), ('xsize', c_size_t), ('ysize', c_size_t)]
+
+
+class cudaExtent(Structure):
+    _fields_ = [('width', c_size_t), ('height', c_size_t), ('depth', c_size_t)]
+
+
+class cudaMemcpy3DParms(Structure):
+    _fields_ = [
+        ('srcArray', c_void_p),
+        ('srcPos', cudaPos),
+        ('srcPtr', cudaPitchedPtr),
+        ('dstArray', c_void_p),
+        ('dstPos', cudaPos),
+        ('dstPtr', cudaPitchedPtr),
+        ('extent', cudaExtent),
+        ('kind', c_int),
+    ]
+
+
+# Result and argument types of every runtime function, set once when the library is loaded.
+# Memcpy arguments change on every call and are declared as c_void_p, which converts Python ints
+# much faster than the integer types; size_t and int take a pointer-sized slot on the x86 and x64
+# conventions. Functions left without argument types are only called with cached ctypes objects
+# and small ints, which ctypes passes without any conversion.
+_prototypes = {
+    'cudaGetErrorName': (c_char_p, [c_int]),
+    'cudaD3D11GetDevice': (c_int, [POINTER(c_int), c_void_p]),
+    'cudaGraphicsD3D11RegisterResource': (c_int, [POINTER(c_void_p), c_void_p, c_uint]),
+    'cudaGraphicsResourceSetMapFlags': (c_int, [c_void_p, c_uint]),
+    'cudaGraphicsUnregisterResource': (c_int, [c_void_p]),
+    'cudaGraphicsMapResources': (c_int, None),
+    'cudaGraphicsUnmapResources': (c_int, None),
+    'cudaGraphicsSubResourceGetMappedArray': (c_int, None),
+    'cudaGraphicsResourceGetMappedMipmappedArray': (c_int, [POINTER(c_void_p), c_void_p]),
+    'cudaGetMipmappedArrayLevel': (c_int, [POINTER(c_void_p), c_void_p, c_uint]),
+    'cudaGraphicsResourceGetMappedPointer': (
+        c_int, [POINTER(c_void_p), POINTER(c_size_t), c_void_p]),
+    'cudaMemcpy2DFromArrayAsync': (c_int, [c_void_p] * 9),
+    'cudaMemcpy2DToArrayAsync': (c_int, [c_void_p] * 9),
+    'cudaMemcpy3D': (c_int, [POINTER(cudaMemcpy3DParms)]),
+    'cudaMemcpy3DAsync': (c_int, [POINTER(cudaMemcpy3DParms), c_void_p]),
+    'cudaEventCreateWithFlags': (c_int, [POINTER(c_void_p), c_uint]),
+    'cudaEventRecord': (c_int, None),
+    'cudaEventQuery': (c_int, None),
+    'cudaEventSynchronize': (c_int, [c_void_p]),
+    'cudaEventDestroy': (c_int, [c_void_p]),
+    'cudaEventElapsedTime': (c_int, [POINTER(c_float), c_void_p, c_void_p]),
+    'cudaStreamWaitEvent': (c_int, [c_void_p, c_void_p, c_uint]),
+    'cudaGetDevice': (c_int, [POINTER(c_int)]),
+    'cudaSetDevice': (c_int, [c_int]),
+    'cudaMalloc': (c_int, [POINTER(c_void_p), c_size_t]),
+    'cudaFree': (c_int, [c_void_p]),
+    'cudaHostAlloc': (c_int, [POINTER(c_void_p), c_size_t, c_uint]),
+    'cudaFreeHost': (c_int, [c_void_p]),
+    'cudaMemcpyPeer': (c_int, [c_void_p, c_int, c_void_p, c_int, c_size_t]),
+    'cudaDeviceGetAttribute': (c_int, [POINTER(c_int), c_int, c_int]),
+    'cudaCreateTextureObject': (
+        c_int,
+        [POINTER(c_ulonglong), POINTER(cudaResourceDesc), POINTER(cudaTextureDesc), c_void_p]),
+    'cudaDestroyTextureObject': (c_int, [c_ulonglong]),
+}
+
+
+def load_library(path=None):
+    global cu
+    path = path or find_toolkit_library('cudart')
+    if path is None:
+        raise Gfx2CudaError(
+            "CUDA runtime library not found, set CUDA_PATH to the toolkit's location")
+    cu = bind(cdll.LoadLibrary(path), _prototypes)
+    return cu
+
+
+def _raise(ret, func):
+    name = None
+    if hasattr(cu, 'cudaGetErrorName'):
+        name = cu.cudaGetErrorName(ret)
+    name = name.decode() if name else 'unknown error'
+    raise Gfx2CudaRuntimeError(f"{func} failed with {name} ({ret})", ret)
+
+
+cu = LazyLibrary(load_library)
+
+# Stream arguments of the per-frame calls, the default streams are passed without building an
+# object
+_stream_args = {0: None, cudaStreamPerThread: c_void_p(cudaStreamPerThread)}
+
+
+def _stream(stream):
+    arg = _stream_args.get(stream)
+    return c_void_p(stream) if arg is None and stream else arg
+
+
+class GraphicsResource:
+    # A registered resource with the argument objects of the per-frame calls built once
+
+    __slots__ = ('handle', '_ref', '_array', '_array_ref')
+
+    def __init__(self, handle):
+        self.handle = handle
+        self._ref = pointer(handle)
+        self._array = c_void_p()
+        self._array_ref = pointer(self._array)
 
 
 def cuda_device_d3d_adapter(adapter):
     dev = c_int()
     ret = cu.cudaD3D11GetDevice(byref(dev), cast(adapter, c_void_p))
-    assert ret == 0, ret
+    if ret:
+        _raise(ret, 'cudaD3D11GetDevice')
     return dev.value
 
 
-def cuda_map_resource(resource):
-    ret = cu.cudaGraphicsMapResources(1, byref(resource), 0)
-    assert ret == 0, ret
+def cuda_map_resource(resource, stream=0):
+    ret = cu.cudaGraphicsMapResources(1, resource._ref, _stream(stream))
+    if ret:
+        _raise(ret, 'cudaGraphicsMapResources')
+
+
+def cuda_unmap_resource(resource, stream=0):
+    ret = cu.cudaGraphicsUnmapResources(1, resource._ref, _stream(stream))
+    if ret:
+        _raise(ret, 'cudaGraphicsUnmapResources')
+
 
+def cuda_map_resources(resources, stream=0):
+    array = (c_void_p * len(resources))(*[resource.handle.value for resource in resources])
+    ret = cu.cudaGraphicsMapResources(len(resources), array, _stream(stream))
+    if ret:
+        _raise(ret, 'cudaGraphicsMapResources')
 
-def cuda_unmap_resource(resource):
-    ret = cu.cudaGraphicsUnmapResources(1, byref(resource), 0)
-    assert ret == 0, ret
+
+def cuda_unmap_resources(resources, stream=0):
+    array = (c_void_p * len(resources))(*[resource.handle.value for resource in resources])
+    ret = cu.cudaGraphicsUnmapResources(len(resources), array, _stream(stream))
+    if ret:
+        _raise(ret, 'cudaGraphicsUnmapResources')
 
 
 def cuda_unregister_resource(resource):
-    ret = cu.cudaGraphicsUnregisterResource(resource)
-    assert ret == 0, ret
+    ret = cu.cudaGraphicsUnregisterResource(resource.handle)
+    if ret:
+        _raise(ret, 'cudaGraphicsUnregisterResource')
+
+
+def cuda_memcpy2d_atod_async(dst, src, width_in_bytes, height, stream, w_offset=0, h_offset=0,
+                             dst_pitch=None, kind=cudaMemcpyDeviceToDevice):
+    ret = cu.cudaMemcpy2DFromArrayAsync(dst, dst_pitch or width_in_bytes, src, w_offset, h_offset,
+                                        width_in_bytes, height, kind, stream)
+    if ret:
+        _raise(ret, 'cudaMemcpy2DFromArrayAsync')
+
+
+def cuda_memcpy2d_dtoa_async(dst, src, width_in_bytes, height, stream, w_offset=0, h_offset=0,
+                             src_pitch=None, kind=cudaMemcpyDeviceToDevice):
+    ret = cu.cudaMemcpy2DToArrayAsync(dst, w_offset, h_offset, src, src_pitch or width_in_bytes,
+                                      width_in_bytes, height, kind, stream)
+    if ret:
+        _raise(ret, 'cudaMemcpy2DToArrayAsync')
+
+
+def _memcpy3d(parms, stream):
+    if stream is None:
+        ret = cu.cudaMemcpy3D(byref(parms))
+    else:
+        ret = cu.cudaMemcpy3DAsync(byref(parms), stream)
+    if ret:
+        _raise(ret, 'cudaMemcpy3D')
+
+
+def cuda_memcpy3d_atod(dst, src, x, y, width, height, layers, dst_pitch, pixel_size, stream=None):
+    # Positions and extents are in array elements, pixels, and the layers are the depth
+    parms = cudaMemcpy3DParms(srcArray=src, srcPos=cudaPos(x, y, 0),
+                              dstPtr=cudaPitchedPtr(dst, dst_pitch, width * pixel_size, height),
+                              extent=cudaExtent(width, height, layers),
+                              kind=cudaMemcpyDeviceToDevice)
+    _memcpy3d(parms, stream)
 
 
-def cuda_memcpy2d_atod(dst, src, width_in_bytes, height):
-    ret = cu.cudaMemcpy2DFromArray(c_void_p(dst), width_in_bytes, c_void_p(src), 0, 0, width_in_bytes, height, 3)
-    assert ret == 0, ret
+def cuda_memcpy3d_dtoa(dst, src, x, y, width, height, layers, src_pitch, pixel_size, stream=None):
+    parms = cudaMemcpy3DParms(dstArray=dst, dstPos=cudaPos(x, y, 0),
+                              srcPtr=cudaPitchedPtr(src, src_pitch, width * pixel_size, height),
+                              extent=cudaExtent(width, height, layers),
+                              kind=cudaMemcpyDeviceToDevice)
+    _memcpy3d(parms, stream)
 
 
-def cuda_memcpy2d_dtoa(dst, src, width_in_bytes, height):
-    ret = cu.cudaMemcpy2DToArray(c_void_p(dst), 0, 0, c_void_p(src), width_in_bytes, width_in_bytes, height, 3)
-    assert ret == 0, ret
+def cuda_event_create(timing=False):
+    event = c_void_p()
+    flags = cudaEventDefault if timing else cudaEventDisableTiming
+    ret = cu.cudaEventCreateWithFlags(byref(event), flags)
+    if ret:
+        _raise(ret, 'cudaEventCreateWithFlags')
+    return event
 
 
-def cuda_get_mapped_array(resource):
+def cuda_event_record(event, stream=0):
+    ret = cu.cudaEventRecord(event, _stream(stream))
+    if ret:
+        _raise(ret, 'cudaEventRecord')
+
+
+def cuda_event_query(event):
+    ret = cu.cudaEventQuery(event)
+    if ret and ret != cudaErrorNotReady:
+        _raise(ret, 'cudaEventQuery')
+    return ret == cudaSuccess
+
+
+def cuda_event_synchronize(event):
+    ret = cu.cudaEventSynchronize(event)
+    if ret:
+        _raise(ret, 'cudaEventSynchronize')
+
+
+def cuda_event_elapsed_time(start, end):
+    # Milliseconds between two timing events, end must have completed
+    ms = c_float()
+    ret = cu.cudaEventElapsedTime(byref(ms), start, end)
+    if ret:
+        _raise(ret, 'cudaEventElapsedTime')
+    return ms.value
+
+
+def cuda_stream_wait_event(stream, event):
+    # Work queued on stream afterwards waits for the event, the host does not
+    ret = cu.cudaStreamWaitEvent(_stream(stream), event, 0)
+    if ret:
+        _raise(ret, 'cudaStreamWaitEvent')
+
+
+def cuda_event_destroy(event):
+    ret = cu.cudaEventDestroy(event)
+    if ret:
+        _raise(ret, 'cudaEventDestroy')
+
+
+def cuda_get_mapped_array(resource, index=0):
+    ret = cu.cudaGraphicsSubResourceGetMappedArray(resource._array_ref, resource.handle, index, 0)
+    if ret:
+        _raise(ret, 'cudaGraphicsSubResourceGetMappedArray')
+    return resource._array.value
+
+
+def cuda_get_mapped_layers(resource):
+    # A texture array as one layered array, the first mip level of its mipmapped array
+    mipmapped = c_void_p()
+    ret = cu.cudaGraphicsResourceGetMappedMipmappedArray(byref(mipmapped), resource.handle)
+    if ret:
+        _raise(ret, 'cudaGraphicsResourceGetMappedMipmappedArray')
     array = c_void_p()
-    ret = cu.cudaGraphicsSubResourceGetMappedArray(byref(array), resource, 0, 0)
-    assert ret == 0, ret
+    ret = cu.cudaGetMipmappedArrayLevel(byref(array), mipmapped, 0)
+    if ret:
+        _raise(ret, 'cudaGetMipmappedArrayLevel')
     return array.value
 
 
-def cuda_register_d3d_resource(d3d_resource):
-    resource = c_void_p()
-    ret = cu.cudaGraphicsD3D11RegisterResource(byref(resource), cast(d3d_resource, c_void_p), 0)
-    assert ret == 0, ret
-    ret = cu.cudaGraphicsResourceSetMapFlags(resource, 1)
-    assert ret == 0, ret
-    return resource
+def cuda_get_mapped_pointer(resource):
+    size = c_size_t()
+    ret = cu.cudaGraphicsResourceGetMappedPointer(resource._array_ref, byref(size),
+                                                  resource.handle)
+    if ret:
+        _raise(ret, 'cudaGraphicsResourceGetMappedPointer')
+    return resource._array.value, size.value
+
+
+def cuda_register_d3d_resource(d3d_resource, map_flags=cudaGraphicsMapFlagsReadOnly):
+    handle = c_void_p()
+    ret = cu.cudaGraphicsD3D11RegisterResource(byref(handle), cast(d3d_resource, c_void_p), 0)
+    if ret:
+        _raise(ret, 'cudaGraphicsD3D11RegisterResource')
+    ret = cu.cudaGraphicsResourceSetMapFlags(handle, map_flags)
+    if ret:
+        _raise(ret, 'cudaGraphicsResourceSetMapFlags')
+    return GraphicsResource(handle)
+
+
+def cuda_get_device():
+    dev = c_int()
+    ret = cu.cudaGetDevice(byref(dev))
+    if ret:
+        _raise(ret, 'cudaGetDevice')
+    return dev.value
+
+
+def cuda_set_device(dev):
+    ret = cu.cudaSetDevice(dev)
+    if ret:
+        _raise(ret, 'cudaSetDevice')
+
+
+def cuda_malloc(nbytes):
+    ptr = c_void_p()
+    ret = cu.cudaMalloc(byref(ptr), nbytes)
+    if ret:
+        _raise(ret, 'cudaMalloc')
+    return ptr.value
+
+
+def cuda_free(ptr):
+    ret = cu.cudaFree(ptr)
+    if ret:
+        _raise(ret, 'cudaFree')
+
+
+def cuda_host_alloc(nbytes):
+    ptr = c_void_p()
+    ret = cu.cudaHostAlloc(byref(ptr), nbytes, cudaHostAllocPortable)
+    if ret:
+        _raise(ret, 'cudaHostAlloc')
+    return ptr.value
+
+
+def cuda_free_host(ptr):
+    ret = cu.cudaFreeHost(ptr)
+    if ret:
+        _raise(ret, 'cudaFreeHost')
+
+
+def cuda_memcpy_peer(dst, dst_dev, src, src_dev, nbytes):
+    ret = cu.cudaMemcpyPeer(dst, dst_dev, src, src_dev, nbytes)
+    if ret:
+        _raise(ret, 'cudaMemcpyPeer')
+
+
+def cuda_compute_capability(dev):
+    capability = []
+    for attribute in (cudaDevAttrComputeCapabilityMajor, cudaDevAttrComputeCapabilityMinor):
+        value = c_int()
+        ret = cu.cudaDeviceGetAttribute(byref(value), attribute, dev)
+        if ret:
+            _raise(ret, 'cudaDeviceGetAttribute')
+        capability.append(value.value)
+    return tuple(capability)
+
+
+def cuda_create_texture_object(array):
+    # Reads the array's elements unfiltered at unnormalized coordinates
+    resource_desc = cudaResourceDesc(resType=cudaResourceTypeArray, array=array)
+    texture_desc = cudaTextureDesc()
+    texture_desc.addressMode[:] = [cudaAddressModeClamp] * 3
+    texture = c_ulonglong()
+    ret = cu.cudaCreateTextureObject(byref(texture), byref(resource_desc), byref(texture_desc),
+                                     None)
+    if ret:
+        _raise(ret, 'cudaCreateTextureObject')
+    return texture.value
+
+
+def cuda_destroy_texture_object(texture):
+    ret = cu.cudaDestroyTextureObject(texture)
+    if ret:
+        _raise(ret, 'cudaDestroyTextureObject')
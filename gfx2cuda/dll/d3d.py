@@ -37,6 +37,24 @@ class D3D11_TEXTURE2D_DESC(ctypes.Structure):
     ]
 
 
+class D3D11_BUFFER_DESC(ctypes.Structure):
+    _fields_ = [
+        ("ByteWidth", wintypes.UINT),
+        ("Usage", wintypes.UINT),
+        ("BindFlags", wintypes.UINT),
+        ("CPUAccessFlags", wintypes.UINT),
+        ("MiscFlags", wintypes.UINT),
+        ("StructureByteStride", wintypes.UINT),
+    ]
+
+
+class D3D11_QUERY_DESC(ctypes.Structure):
+    _fields_ = [
+        ("Query", wintypes.UINT),
+        ("MiscFlags", wintypes.UINT),
+    ]
+
+
 class D3D11_MAPPED_SUBRESOURCE(ctypes.Structure):
     _fields_ = [
         ("pData", ctypes.c_void_p),
@@ -71,6 +89,13 @@ class ID3D11Texture2D(ID3D11Resource):
     ]
 
 
+class ID3D11Buffer(ID3D11Resource):
+    _iid_ = comtypes.GUID("{48570b85-d1ee-4fcd-a250-eb350722b037}")
+    _methods_ = [
+        comtypes.STDMETHOD(None, "GetDesc", [ctypes.POINTER(D3D11_BUFFER_DESC)]),
+    ]
+
+
 class ID3D11View(ID3D11DeviceChild):
     _iid_ = comtypes.GUID("{839d1216-bb2e-412b-b7f4-a9dbebe08ed1}")
     _methods_ = [
@@ -85,6 +110,20 @@ class ID3D11RenderTargetView(ID3D11View):
     ]
 
 
+class ID3D11Asynchronous(ID3D11DeviceChild):
+    _iid_ = comtypes.GUID("{4b35d0cd-1e15-4258-9c98-1b1333f6dd3b}")
+    _methods_ = [
+        comtypes.STDMETHOD(wintypes.UINT, "GetDataSize"),
+    ]
+
+
+class ID3D11Query(ID3D11Asynchronous):
+    _iid_ = comtypes.GUID("{d6c00747-87b7-425e-b84d-44d108560afd}")
+    _methods_ = [
+        comtypes.STDMETHOD(None, "GetDesc", [ctypes.POINTER(D3D11_QUERY_DESC)]),
+    ]
+
+
 class ID3D11DeviceContext(ID3D11DeviceChild):
     _iid_ = comtypes.GUID("{c0bfa96c-e089-44fb-8eaf-26f8796190da}")
     _methods_ = [
@@ -108,9 +147,13 @@ class ID3D11DeviceContext(ID3D11DeviceChild):
         comtypes.STDMETHOD(None, "IASetPrimitiveTopology"),
         comtypes.STDMETHOD(None, "VSSetShaderResources"),
         comtypes.STDMETHOD(None, "VSSetSamplers"),
-        comtypes.STDMETHOD(None, "Begin"),
-        comtypes.STDMETHOD(None, "End"),
-        comtypes.STDMETHOD(comtypes.HRESULT, "GetData"),
+        comtypes.STDMETHOD(None, "Begin", [ctypes.POINTER(ID3D11Asynchronous)]),
+        comtypes.STDMETHOD(None, "End", [ctypes.POINTER(ID3D11Asynchronous)]),
+        comtypes.STDMETHOD(
+            comtypes.HRESULT,
+            "GetData",
+            [ctypes.POINTER(ID3D11Asynchronous), ctypes.c_void_p, wintypes.UINT, wintypes.UINT],
+        ),
         comtypes.STDMETHOD(None, "SetPredication"),
         comtypes.STDMETHOD(None, "GSSetShaderResources"),
         comtypes.STDMETHOD(None, "GSSetSamplers"),
@@ -220,7 +263,11 @@ class ID3D11DeviceContext(ID3D11DeviceChild):
 class ID3D11Device(comtypes.IUnknown):
     _iid_ = comtypes.GUID("{db6f6ddb-ac77-4e88-8253-819df9bbf140}")
     _methods_ = [
-        comtypes.STDMETHOD(comtypes.HRESULT, "CreateBuffer"),
+        comtypes.STDMETHOD(comtypes.HRESULT, "CreateBuffer", [
+            ctypes.POINTER(D3D11_BUFFER_DESC),
+            ctypes.POINTER(None),
+            ctypes.POINTER(ctypes.POINTER(ID3D11Buffer)),
+        ]),
         comtypes.STDMETHOD(comtypes.HRESULT, "CreateTexture1D"),
         comtypes.STDMETHOD(
             comtypes.HRESULT,
@@ -253,7 +300,10 @@ class ID3D11Device(comtypes.IUnknown):
         comtypes.STDMETHOD(comtypes.HRESULT, "CreateDepthStencilState"),
         comtypes.STDMETHOD(comtypes.HRESULT, "CreateRasterizerState"),
         comtypes.STDMETHOD(comtypes.HRESULT, "CreateSamplerState"),
-        comtypes.STDMETHOD(comtypes.HRESULT, "CreateQuery"),
+        comtypes.STDMETHOD(comtypes.HRESULT, "CreateQuery", [
+            ctypes.POINTER(D3D11_QUERY_DESC),
+            ctypes.POINTER(ctypes.POINTER(ID3D11Query)),
+        ]),
         comtypes.STDMETHOD(comtypes.HRESULT, "CreatePredicate"),
         comtypes.STDMETHOD(comtypes.HRESULT, "CreateCounter"),
         comtypes.STDMETHOD(comtypes.HRESULT, "CreateDeferredContext"),
@@ -306,13 +356,44 @@ def d3d11_flush(d3d_device_context):
     d3d_device_context.Flush()
 
 
-def d3d11_create_texture_2d(width, height, d3d_device, fmt, cpu_access):
+def d3d11_create_event_query(d3d_device):
+    query_desc = D3D11_QUERY_DESC()
+    query_desc.Query = 0  # D3D11_QUERY_EVENT
+    query = ctypes.POINTER(ID3D11Query)()
+    d3d_device.CreateQuery(ctypes.byref(query_desc), ctypes.byref(query))
+    return query
+
+
+def d3d11_end_query(d3d_device_context, query):
+    d3d_device_context.End(query)
+
+
+def d3d11_query_done(d3d_device_context, query):
+    done = wintypes.BOOL()
+    # S_FALSE while the GPU has not reached the query yet
+    return d3d_device_context.GetData(query, ctypes.byref(done), ctypes.sizeof(done), 0) == 0
+
+
+def d3d11_copy_resource(d3d_device_context, dst, src):
+    d3d_device_context.CopyResource(dst, src)
+
+
+def com_release(pointer):
+    # Releases the reference now and clears the pointer, so comtypes does not release it again
+    # when collected
+    if pointer:
+        pointer.Release()
+        ctypes.cast(ctypes.pointer(pointer), ctypes.POINTER(ctypes.c_void_p)).contents.value = None
+
+
+def d3d11_create_texture_2d(width, height, d3d_device, fmt, cpu_access, keyed_mutex=False,
+                            array_size=1):
     texture_desc = D3D11_TEXTURE2D_DESC()
 
     texture_desc.Width = width
     texture_desc.Height = height
     texture_desc.MipLevels = 1
-    texture_desc.ArraySize = 1
+    texture_desc.ArraySize = array_size
     texture_desc.SampleDesc.Count = 1
     texture_desc.SampleDesc.Quality = 0
     texture_desc.Usage = 0  # D3D11_USAGE_DEFAULT,
@@ -324,19 +405,48 @@ def d3d11_create_texture_2d(width, height, d3d_device, fmt, cpu_access):
         texture_desc.CPUAccessFlags = 65536 | 131072  # D3D11_CPU_ACCESS_WRITE|D3D11_CPU_ACCESS_READ
     # texture_desc.CPUAccessFlags = 131072  # D3D11_CPU_ACCESS_READ
     # texture_desc.MiscFlags = 2048  # D3D11_RESOURCE_MISC_SHARED_NTHANDLE
-    # texture_desc.MiscFlags = 256  # D3D11_RESOURCE_MISC_SHARED_KEYEDMUTEX
-    texture_desc.MiscFlags = 2  # D3D11_RESOURCE_MISC_SHARED
+    if keyed_mutex:
+        texture_desc.MiscFlags = 256  # D3D11_RESOURCE_MISC_SHARED_KEYEDMUTEX
+    else:
+        texture_desc.MiscFlags = 2  # D3D11_RESOURCE_MISC_SHARED
 
     d3d11_texture = ctypes.POINTER(ID3D11Texture2D)()
     d3d_device.CreateTexture2D(ctypes.byref(texture_desc), None, ctypes.byref(d3d11_texture))
     return d3d11_texture
 
 
+def d3d11_create_buffer(nbytes, d3d_device, shared=True):
+    buffer_desc = D3D11_BUFFER_DESC()
+    # Raw views need a multiple of 4 bytes
+    buffer_desc.ByteWidth = (nbytes + 3) // 4 * 4
+    buffer_desc.Usage = 0  # D3D11_USAGE_DEFAULT
+    buffer_desc.BindFlags = 8 | 128  # D3D11_BIND_SHADER_RESOURCE | D3D11_BIND_UNORDERED_ACCESS
+    buffer_desc.MiscFlags = 32  # D3D11_RESOURCE_MISC_BUFFER_ALLOW_RAW_VIEWS
+    if shared:
+        buffer_desc.MiscFlags |= 2  # D3D11_RESOURCE_MISC_SHARED
+
+    d3d11_buffer = ctypes.POINTER(ID3D11Buffer)()
+    d3d_device.CreateBuffer(ctypes.byref(buffer_desc), None, ctypes.byref(d3d11_buffer))
+    return d3d11_buffer
+
+
+def d3d11_open_shared_buffer(handle, d3d_device):
+    resource = ctypes.POINTER(ID3D11Buffer)()
+    d3d_device.OpenSharedResource(handle, ID3D11Buffer._iid_, ctypes.byref(resource))
+    return resource
+
+
 def d3d11_texture_desc(d3d11_texture):
     d3d11_texture_description = D3D11_TEXTURE2D_DESC()
     d3d11_texture.GetDesc(ctypes.byref(d3d11_texture_description))
 
-    return d3d11_texture_description.Width, d3d11_texture_description.Height, d3d11_texture_description.Format
+    return (
+        d3d11_texture_description.Width,
+        d3d11_texture_description.Height,
+        d3d11_texture_description.Format,
+        d3d11_texture_description.MiscFlags,
+        d3d11_texture_description.ArraySize,
+    )
 
 
 def d3d11_open_shared_handle(handle, d3d_device):
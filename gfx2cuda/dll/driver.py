@@ -0,0 +1,62 @@
+import sys
+from ctypes import *
+
+from gfx2cuda.dll import LazyLibrary, bind
+from gfx2cuda.exception import Gfx2CudaError, Gfx2CudaRuntimeError
+
+CUDA_SUCCESS = 0
+
+_prototypes = {
+    'cuGetErrorName': (c_int, [c_int, POINTER(c_char_p)]),
+    'cuModuleLoadData': (c_int, [POINTER(c_void_p), c_char_p]),
+    'cuModuleGetFunction': (c_int, [POINTER(c_void_p), c_void_p, c_char_p]),
+    'cuLaunchKernel': (
+        c_int, [c_void_p, c_uint, c_uint, c_uint, c_uint, c_uint, c_uint, c_uint, c_void_p,
+                POINTER(c_void_p), POINTER(c_void_p)]),
+}
+
+
+def load_library(path=None):
+    # The driver library is installed with the display driver, not with the toolkit
+    global cu
+    path = path or ('nvcuda.dll' if sys.platform == 'win32' else 'libcuda.so.1')
+    try:
+        cu = bind(cdll.LoadLibrary(path), _prototypes)
+    except OSError as e:
+        raise Gfx2CudaError(f"CUDA driver library {path} could not be loaded: {e}")
+    return cu
+
+
+def _raise(ret, func):
+    name = c_char_p()
+    cu.cuGetErrorName(ret, byref(name))
+    name = name.value.decode() if name.value else 'unknown error'
+    raise Gfx2CudaRuntimeError(f"{func} failed with {name} ({ret})", ret)
+
+
+cu = LazyLibrary(load_library)
+
+
+def cu_module_load_data(image):
+    # Modules are loaded into the context that is current, the runtime's primary context
+    module = c_void_p()
+    ret = cu.cuModuleLoadData(byref(module), image)
+    if ret:
+        _raise(ret, 'cuModuleLoadData')
+    return module
+
+
+def cu_module_get_function(module, name):
+    function = c_void_p()
+    ret = cu.cuModuleGetFunction(byref(function), module, name.encode())
+    if ret:
+        _raise(ret, 'cuModuleGetFunction')
+    return function
+
+
+def cu_launch_kernel(function, grid, block, args, stream=0):
+    # args are ctypes objects, the kernel receives a pointer to each
+    params = (c_void_p * len(args))(*[addressof(arg) for arg in args])
+    ret = cu.cuLaunchKernel(function, *grid, *block, 0, stream, params, None)
+    if ret:
+        _raise(ret, 'cuLaunchKernel')
@@ -7,10 +7,17 @@ from .d3d import (
     ID3D11Device,
     ID3D11DeviceContext,
     ID3D11Texture2D,
+    com_release,
     d3d11_create_texture_2d,
 )
 
 
+WAIT_TIMEOUT = 0x102
+INFINITE = 0xFFFFFFFF
+DXGI_ERROR_ACCESS_LOST = -2005270490  # 0x887A0026
+DXGI_ERROR_WAIT_TIMEOUT = -2005270489  # 0x887A0027
+
+
 class LUID(ctypes.Structure):
     _fields_ = [("LowPart", wintypes.DWORD), ("HighPart", wintypes.LONG)]
 
@@ -44,6 +51,10 @@ class DXGI_OUTDUPL_POINTER_POSITION(ctypes.Structure):
     _fields_ = [("Position", wintypes.POINT), ("Visible", wintypes.BOOL)]
 
 
+class DXGI_OUTDUPL_MOVE_RECT(ctypes.Structure):
+    _fields_ = [("SourcePoint", wintypes.POINT), ("DestinationRect", wintypes.RECT)]
+
+
 class DXGI_OUTDUPL_FRAME_INFO(ctypes.Structure):
     _fields_ = [
         ("LastPresentTime", wintypes.LARGE_INTEGER),
@@ -113,6 +124,14 @@ class IDXGIResource1(IDXGIResource):
     ]
 
 
+class IDXGIKeyedMutex(IDXGIDeviceSubObject):
+    _iid_ = comtypes.GUID("{9d8e1289-d7b3-465f-8126-250e349af85d}")
+    _methods_ = [
+        comtypes.STDMETHOD(comtypes.HRESULT, "AcquireSync", [ctypes.c_uint64, wintypes.DWORD]),
+        comtypes.STDMETHOD(comtypes.HRESULT, "ReleaseSync", [ctypes.c_uint64]),
+    ]
+
+
 class IDXGISurface(IDXGIDeviceSubObject):
     _iid_ = comtypes.GUID("{cafcb56c-6ac3-4889-bf47-9e23bbd260ec}")
     _methods_ = [
@@ -142,8 +161,16 @@ class IDXGIOutputDuplication(IDXGIObject):
                 ctypes.POINTER(ctypes.POINTER(IDXGIResource)),
             ],
         ),
-        comtypes.STDMETHOD(comtypes.HRESULT, "GetFrameDirtyRects"),
-        comtypes.STDMETHOD(comtypes.HRESULT, "GetFrameMoveRects"),
+        comtypes.STDMETHOD(
+            comtypes.HRESULT,
+            "GetFrameDirtyRects",
+            [wintypes.UINT, ctypes.POINTER(wintypes.RECT), ctypes.POINTER(wintypes.UINT)],
+        ),
+        comtypes.STDMETHOD(
+            comtypes.HRESULT,
+            "GetFrameMoveRects",
+            [wintypes.UINT, ctypes.POINTER(DXGI_OUTDUPL_MOVE_RECT), ctypes.POINTER(wintypes.UINT)],
+        ),
         comtypes.STDMETHOD(comtypes.HRESULT, "GetFramePointerShape"),
         comtypes.STDMETHOD(comtypes.HRESULT, "MapDesktopSurface"),
         comtypes.STDMETHOD(comtypes.HRESULT, "UnMapDesktopSurface"),
@@ -261,12 +288,75 @@ def dxgi_adapter_description(dxgi_adapter):
     return desc.Description
 
 
+def dxgi_adapter_luid(dxgi_adapter):
+    # The LUID identifies the adapter across processes until the next reboot
+    desc = DXGI_ADAPTER_DESC1()
+    dxgi_adapter.GetDesc1(ctypes.byref(desc))
+    return (desc.AdapterLuid.HighPart & 0xFFFFFFFF) << 32 | desc.AdapterLuid.LowPart
+
+
+def get_dxgi_output(dxgi_adapter, output):
+    dxgi_output = ctypes.POINTER(IDXGIOutput)()
+    dxgi_adapter.EnumOutputs(output, ctypes.byref(dxgi_output))
+    return dxgi_output.QueryInterface(IDXGIOutput1)
+
+
+def dxgi_output_size(dxgi_output):
+    desc = DXGI_OUTPUT_DESC()
+    dxgi_output.GetDesc(ctypes.byref(desc))
+    rect = desc.DesktopCoordinates
+    return rect.right - rect.left, rect.bottom - rect.top
+
+
+def dxgi_duplicate_output(dxgi_output, d3d_device):
+    duplication = ctypes.POINTER(IDXGIOutputDuplication)()
+    dxgi_output.DuplicateOutput(d3d_device, ctypes.byref(duplication))
+    return duplication
+
+
+def dxgi_acquire_next_frame(duplication, timeout_ms):
+    frame_info = DXGI_OUTDUPL_FRAME_INFO()
+    resource = ctypes.POINTER(IDXGIResource)()
+    try:
+        duplication.AcquireNextFrame(timeout_ms, ctypes.byref(frame_info), ctypes.byref(resource))
+    except comtypes.COMError as e:
+        if e.hresult == DXGI_ERROR_WAIT_TIMEOUT:
+            return None, None
+        raise
+    return frame_info, resource.QueryInterface(ID3D11Texture2D)
+
+
+def dxgi_frame_dirty_rects(duplication, buffer_size):
+    buffer = (wintypes.RECT * (buffer_size // ctypes.sizeof(wintypes.RECT)))()
+    required = wintypes.UINT()
+    duplication.GetFrameDirtyRects(ctypes.sizeof(buffer), buffer, ctypes.byref(required))
+    count = required.value // ctypes.sizeof(wintypes.RECT)
+    return [(r.left, r.top, r.right, r.bottom) for r in buffer[:count]]
+
+
+def dxgi_frame_move_rects(duplication, buffer_size):
+    buffer = (DXGI_OUTDUPL_MOVE_RECT * (buffer_size // ctypes.sizeof(DXGI_OUTDUPL_MOVE_RECT)))()
+    required = wintypes.UINT()
+    duplication.GetFrameMoveRects(ctypes.sizeof(buffer), buffer, ctypes.byref(required))
+    count = required.value // ctypes.sizeof(DXGI_OUTDUPL_MOVE_RECT)
+    return [
+        ((m.SourcePoint.x, m.SourcePoint.y),
+         (m.DestinationRect.left, m.DestinationRect.top,
+          m.DestinationRect.right, m.DestinationRect.bottom))
+        for m in buffer[:count]
+    ]
+
+
+def dxgi_release_frame(duplication):
+    duplication.ReleaseFrame()
+
+
 def get_dxgi_resource(d3d_resource):
     return d3d_resource.QueryInterface(IDXGIResource)
 
 
 def dxgi_resource_release(dxgi_resource):
-    dxgi_resource.Release()
+    com_release(dxgi_resource)
 
 
 def get_shared_handle(dxgi_resource):
@@ -275,6 +365,19 @@ def get_shared_handle(dxgi_resource):
     return handle
 
 
+def get_keyed_mutex(d3d_resource):
+    return d3d_resource.QueryInterface(IDXGIKeyedMutex)
+
+
+def dxgi_acquire_sync(keyed_mutex, key, timeout_ms):
+    # WAIT_ABANDONED still hands over the mutex, only a timeout does not
+    return keyed_mutex.AcquireSync(key, timeout_ms) != WAIT_TIMEOUT
+
+
+def dxgi_release_sync(keyed_mutex, key):
+    keyed_mutex.ReleaseSync(key)
+
+
 def map_surface(resource):
     surface = resource.QueryInterface(IDXGISurface)
     dxgi_mapped_rect = DXGI_MAPPED_RECT()
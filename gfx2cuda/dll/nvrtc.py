@@ -0,0 +1,70 @@
+from ctypes import *
+
+from gfx2cuda.dll import LazyLibrary, bind, find_toolkit_library
+from gfx2cuda.exception import Gfx2CudaError, Gfx2CudaRuntimeError
+
+NVRTC_SUCCESS = 0
+
+_prototypes = {
+    'nvrtcGetErrorString': (c_char_p, [c_int]),
+    'nvrtcCreateProgram': (
+        c_int,
+        [POINTER(c_void_p), c_char_p, c_char_p, c_int, POINTER(c_char_p), POINTER(c_char_p)]),
+    'nvrtcCompileProgram': (c_int, [c_void_p, c_int, POINTER(c_char_p)]),
+    'nvrtcGetProgramLogSize': (c_int, [c_void_p, POINTER(c_size_t)]),
+    'nvrtcGetProgramLog': (c_int, [c_void_p, c_char_p]),
+    'nvrtcGetPTXSize': (c_int, [c_void_p, POINTER(c_size_t)]),
+    'nvrtcGetPTX': (c_int, [c_void_p, c_char_p]),
+    'nvrtcDestroyProgram': (c_int, [POINTER(c_void_p)]),
+}
+
+
+def load_library(path=None):
+    global nvrtc
+    path = path or find_toolkit_library('nvrtc')
+    if path is None:
+        raise Gfx2CudaError("NVRTC library not found, set CUDA_PATH to the toolkit's location")
+    nvrtc = bind(cdll.LoadLibrary(path), _prototypes)
+    return nvrtc
+
+
+def _raise(ret, func, log=None):
+    message = f"{func} failed with {nvrtc.nvrtcGetErrorString(ret).decode()} ({ret})"
+    if log:
+        message += f"\n{log}"
+    raise Gfx2CudaRuntimeError(message, ret)
+
+
+nvrtc = LazyLibrary(load_library)
+
+
+def _program_log(program):
+    size = c_size_t()
+    nvrtc.nvrtcGetProgramLogSize(program, byref(size))
+    log = create_string_buffer(size.value)
+    nvrtc.nvrtcGetProgramLog(program, log)
+    return log.value.decode(errors='replace')
+
+
+def nvrtc_compile(source, name, options=()):
+    # Returns the PTX of a CUDA C++ source
+    program = c_void_p()
+    ret = nvrtc.nvrtcCreateProgram(byref(program), source.encode(), name.encode(), 0, None, None)
+    if ret:
+        _raise(ret, 'nvrtcCreateProgram')
+    try:
+        options = (c_char_p * len(options))(*[option.encode() for option in options])
+        ret = nvrtc.nvrtcCompileProgram(program, len(options), options)
+        if ret:
+            _raise(ret, 'nvrtcCompileProgram', _program_log(program))
+        size = c_size_t()
+        ret = nvrtc.nvrtcGetPTXSize(program, byref(size))
+        if ret:
+            _raise(ret, 'nvrtcGetPTXSize')
+        ptx = create_string_buffer(size.value)
+        ret = nvrtc.nvrtcGetPTX(program, ptx)
+        if ret:
+            _raise(ret, 'nvrtcGetPTX')
+        return ptx.raw
+    finally:
+        nvrtc.nvrtcDestroyProgram(byref(program))
@@ -0,0 +1,103 @@
+import ctypes
+
+import numpy as np
+
+from gfx2cuda.exception import Gfx2CudaError
+
+kDLCPU = 1
+kDLCUDA = 2
+
+_type_codes = {'i': 0, 'u': 1, 'f': 2, 'c': 5, 'b': 6}
+
+
+class DLDevice(ctypes.Structure):
+    _fields_ = [
+        ('device_type', ctypes.c_int32),
+        ('device_id', ctypes.c_int32),
+    ]
+
+
+class DLDataType(ctypes.Structure):
+    _fields_ = [
+        ('code', ctypes.c_uint8),
+        ('bits', ctypes.c_uint8),
+        ('lanes', ctypes.c_uint16),
+    ]
+
+
+class DLTensor(ctypes.Structure):
+    _fields_ = [
+        ('data', ctypes.c_void_p),
+        ('device', DLDevice),
+        ('ndim', ctypes.c_int32),
+        ('dtype', DLDataType),
+        ('shape', ctypes.POINTER(ctypes.c_int64)),
+        ('strides', ctypes.POINTER(ctypes.c_int64)),
+        ('byte_offset', ctypes.c_uint64),
+    ]
+
+
+class DLManagedTensor(ctypes.Structure):
+    pass
+
+
+_Deleter = ctypes.CFUNCTYPE(None, ctypes.POINTER(DLManagedTensor))
+DLManagedTensor._fields_ = [
+    ('dl_tensor', DLTensor),
+    ('manager_ctx', ctypes.c_void_p),
+    ('deleter', _Deleter),
+]
+
+# Tensors handed out and not yet deleted by their consumer, with the objects they point into
+_alive = {}
+
+
+@_Deleter
+def _delete(managed):
+    _alive.pop(ctypes.addressof(managed.contents), None)
+
+
+# The destructor gets a capsule that is being deallocated, it must not be wrapped as a python
+# object
+_PyCapsule_Destructor = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+_PyCapsule_New = ctypes.pythonapi.PyCapsule_New
+_PyCapsule_New.restype = ctypes.py_object
+_PyCapsule_New.argtypes = [ctypes.c_void_p, ctypes.c_char_p, _PyCapsule_Destructor]
+_PyCapsule_IsValid = ctypes.pythonapi.PyCapsule_IsValid
+_PyCapsule_IsValid.restype = ctypes.c_int
+_PyCapsule_IsValid.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+_PyCapsule_GetPointer = ctypes.pythonapi.PyCapsule_GetPointer
+_PyCapsule_GetPointer.restype = ctypes.c_void_p
+_PyCapsule_GetPointer.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+
+
+@_PyCapsule_Destructor
+def _capsule_destructor(capsule):
+    # Consumers rename the capsule to "used_dltensor" and call the deleter themselves
+    if _PyCapsule_IsValid(capsule, b'dltensor'):
+        pointer = _PyCapsule_GetPointer(capsule, b'dltensor')
+        _delete(ctypes.cast(pointer, ctypes.POINTER(DLManagedTensor)))
+
+
+def to_dlpack(ptr, shape, dtype, device_type, device_id, owner):
+    # Wraps memory as a DLPack capsule that keeps owner alive until the consumer is done with it
+    dtype = np.dtype(dtype)
+    if dtype.kind not in _type_codes:
+        raise Gfx2CudaError(f"{dtype} has no DLPack data type")
+    managed = DLManagedTensor()
+    # Strides are in elements, row major
+    strides = [1] * len(shape)
+    for i in range(len(shape) - 1, 0, -1):
+        strides[i - 1] = strides[i] * shape[i]
+    strides = (ctypes.c_int64 * len(shape))(*strides)
+    shape = (ctypes.c_int64 * len(shape))(*shape)
+    tensor = managed.dl_tensor
+    tensor.data = ptr
+    tensor.device = DLDevice(device_type, device_id)
+    tensor.ndim = len(shape)
+    tensor.dtype = DLDataType(_type_codes[dtype.kind], dtype.itemsize * 8, 1)
+    tensor.shape = shape
+    tensor.strides = strides
+    managed.deleter = _delete
+    _alive[ctypes.addressof(managed)] = (managed, shape, strides, owner)
+    return _PyCapsule_New(ctypes.addressof(managed), b'dltensor', _capsule_destructor)
@@ -9,3 +9,9 @@ class Gfx2CudaFormatError(Gfx2CudaError):
 
 class Gfx2CudaUnsupoortedError(Gfx2CudaError):
     pass
+
+
+class Gfx2CudaRuntimeError(Gfx2CudaError):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
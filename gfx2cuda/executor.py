@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CopyExecutor:
+    # Runs copies on a pool of threads. Each job maps the texture, copies on the thread's default
+    # stream, unmaps and waits for the copy, its future resolves to the destination buffer. Jobs on
+    # the same texture take turns, jobs on different textures run concurrently.
+
+    def __init__(self, max_workers=None):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='gfx2cuda-copy')
+
+    def copy_to(self, tex, dst, **kwargs):
+        return self._executor.submit(self._copy, tex, 'copy_to', dst, kwargs)
+
+    def copy_from(self, tex, src, **kwargs):
+        return self._executor.submit(self._copy, tex, 'copy_from', src, kwargs)
+
+    @staticmethod
+    def _copy(tex, method, buf, kwargs):
+        with tex.lock:
+            tex.map()
+            try:
+                getattr(tex, method)(buf, **kwargs)
+            finally:
+                tex.unmap()
+            tex.wait()
+        return buf
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
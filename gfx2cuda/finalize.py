@@ -0,0 +1,89 @@
+import atexit
+import collections
+import sys
+import threading
+import time
+import traceback
+
+from gfx2cuda.exception import Gfx2CudaError
+
+
+class ReleaseQueue:
+    # Resources of collected textures and buffers are released here instead of in __del__, where
+    # unregistering from CUDA would synchronize in whatever code the garbage collector
+    # interrupted. A background thread releases them in batches once delay has passed since the
+    # first one arrived or batch_size are pending, flush() releases the pending ones on the
+    # calling thread.
+
+    def __init__(self, batch_size=64, delay=0.05):
+        self.batch_size = batch_size
+        self.delay = delay
+        self.released = 0
+        self.failed = 0
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        # Held while a batch is released, so flush() returns after the batch in progress too
+        self._releasing = threading.Lock()
+        self._thread = None
+
+    def defer(self, release):
+        if release is None:
+            return
+        if sys.is_finalizing():
+            # No thread will run anymore, release right away
+            self._run([release])
+            return
+        with self._cond:
+            self._pending.append(release)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='gfx2cuda-release',
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        # Releases everything pending and returns the number of released resources
+        with self._releasing:
+            with self._cond:
+                batch = list(self._pending)
+                self._pending.clear()
+            self._run(batch)
+        return len(batch)
+
+    def stats(self):
+        return {'pending': len(self._pending), 'released': self.released, 'failed': self.failed}
+
+    def _run(self, batch):
+        for release in batch:
+            try:
+                release()
+                self.released += 1
+            except (Exception, Gfx2CudaError):
+                # Like an exception in __del__, reported and otherwise ignored
+                self.failed += 1
+                traceback.print_exc()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.delay
+                while len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except (Exception, Gfx2CudaError):
+                # The thread must outlive anything a release leaves behind
+                traceback.print_exc()
+
+
+queue = ReleaseQueue()
+atexit.register(queue.flush)
+
+
+def defer(release):
+    queue.defer(release)
@@ -1,147 +1,114 @@
 import enum
-import numpy as np
 
 from gfx2cuda.exception import Gfx2CudaFormatError
 
+_itemsizes = {'uint8': 1, 'uint16': 2, 'float16': 2, 'uint32': 4, 'float32': 4}
+
 
 class TextureFormat(enum.Enum):
-    R8UNORM = (1, 1, True)
-    R8UINT = (1, 1, False)
-    R16UNORM = (2, 1, True)
-    R16UINT = (2, 1, False)
-    R32UINT = (4, 1, False)
-    R32FLOAT = (4, 1, False)
-
-    RG8UNORM = (1, 2, True)
-    RG8UINT = (1, 2, False)
-    RG16FLOAT = (2, 2, False)
-    RG16UNORM = (2, 2, True)
-    RG16UINT = (2, 2, False)
-    RG32FLOAT = (4, 2, False)
-    RG32UINT = (4, 2, False)
-
-    RGB32FLOAT = (4, 3, False)
-    RGB32UINT = (4, 3, False)
-
-    RGBA8UNORM = (1, 4, True)
-    RGBA8UINT = (1, 4, False)
-    RGBA16FLOAT = (2, 4, False)
-    RGBA16UNORM = (2, 4, True)
-    RGBA16UINT = (2, 4, False)
-    RGBA32FLOAT = (4, 4, False)
-    RGBA32UINT = (4, 4, False)
+    # DXGI format, channels, element type, normalized, channel order in memory and, for packed
+    # formats, the bits of each channel within one element
+    R8UNORM = (61, 1, 'uint8', True, 'R')
+    R8UINT = (62, 1, 'uint8', False, 'R')
+    R16UNORM = (56, 1, 'uint16', True, 'R')
+    R16UINT = (57, 1, 'uint16', False, 'R')
+    R16FLOAT = (54, 1, 'float16', False, 'R')
+    R32UINT = (42, 1, 'uint32', False, 'R')
+    R32FLOAT = (41, 1, 'float32', False, 'R')
+
+    RG8UNORM = (49, 2, 'uint8', True, 'RG')
+    RG8UINT = (50, 2, 'uint8', False, 'RG')
+    RG16FLOAT = (34, 2, 'float16', False, 'RG')
+    RG16UNORM = (35, 2, 'uint16', True, 'RG')
+    RG16UINT = (36, 2, 'uint16', False, 'RG')
+    RG32FLOAT = (16, 2, 'float32', False, 'RG')
+    RG32UINT = (17, 2, 'uint32', False, 'RG')
+
+    RGB32FLOAT = (6, 3, 'float32', False, 'RGB')
+    RGB32UINT = (7, 3, 'uint32', False, 'RGB')
+
+    RGBA8UNORM = (28, 4, 'uint8', True, 'RGBA')
+    RGBA8UNORM_SRGB = (29, 4, 'uint8', True, 'RGBA')
+    RGBA8UINT = (30, 4, 'uint8', False, 'RGBA')
+    BGRA8UNORM = (87, 4, 'uint8', True, 'BGRA')
+    BGRA8UNORM_SRGB = (91, 4, 'uint8', True, 'BGRA')
+    BGRX8UNORM = (88, 4, 'uint8', True, 'BGRX')
+    BGRX8UNORM_SRGB = (93, 4, 'uint8', True, 'BGRX')
+    RGBA16FLOAT = (10, 4, 'float16', False, 'RGBA')
+    RGBA16UNORM = (11, 4, 'uint16', True, 'RGBA')
+    RGBA16UINT = (12, 4, 'uint16', False, 'RGBA')
+    RGBA32FLOAT = (2, 4, 'float32', False, 'RGBA')
+    RGBA32UINT = (3, 4, 'uint32', False, 'RGBA')
+
+    R10G10B10A2UNORM = (24, 4, 'uint32', True, 'RGBA', (10, 10, 10, 2))
+    R10G10B10A2UINT = (25, 4, 'uint32', False, 'RGBA', (10, 10, 10, 2))
+    R11G11B10FLOAT = (26, 3, 'uint32', False, 'RGB', (11, 11, 10))
+
+    def __init__(self, dxgi_format, channels, dtype, normalized, order, bits=None):
+        self.dxgi_format = dxgi_format
+        self.channels = channels
+        self.dtype = dtype
+        self.normalized = normalized
+        self.order = order
+        self.srgb = self.name.endswith('_SRGB')
+        self.packed = bits is not None
+        # Bytes of one array element, a whole pixel for packed formats
+        self.size = _itemsizes[dtype]
+        self.bits = bits or (8 * self.size,) * channels
+        # Array elements per pixel
+        self.elements = 1 if self.packed else channels
+        self.pixel_size = self.size * self.elements
 
     @staticmethod
     def from_channels_and_dtype(channels, dtype, normalized=False):
-        try:
-            dtype = np.dtype(dtype)
-        except TypeError:
-            # try to remove prefix (eg. torch.uint32, or tf.uint32)
-            name = str(dtype).split('.')
-            dtype = np.dtype(name[1])
-
-        if normalized:
-            if channels == 1:
-                if dtype == np.uint8:
-                    return TextureFormat.R8UNORM
-                elif dtype == np.uint16:
-                    return TextureFormat.R8UNORM
-            if channels == 2:
-                if dtype == np.uint8:
-                    return TextureFormat.RG8UNORM
-                elif dtype == np.uint16:
-                    return TextureFormat.RG16UNORM
-            elif channels == 4:
-                if dtype == np.uint8:
-                    return TextureFormat.RGBA8UNORM
-                elif dtype == np.uint16:
-                    return TextureFormat.RGBA16UNORM
-        else:
-            if channels == 1:
-                if dtype == np.uint8:
-                    return TextureFormat.R8UINT
-                elif dtype == np.uint16:
-                    return TextureFormat.R16UINT
-                elif dtype == np.float32:
-                    return TextureFormat.R32FLOAT
-                elif dtype == np.uint32:
-                    return TextureFormat.R32UINT
-            if channels == 2:
-                if dtype == np.float16:
-                    return TextureFormat.RG16FLOAT
-                elif dtype == np.uint16:
-                    return TextureFormat.RG16UINT
-                elif dtype == np.float32:
-                    return TextureFormat.RG32FLOAT
-                elif dtype == np.uint32:
-                    return TextureFormat.RG32UINT
-            elif channels == 3:
-                if dtype == np.float32:
-                    return TextureFormat.RGB32FLOAT
-                elif dtype == np.uint32:
-                    return TextureFormat.RGB32UINT
-            elif channels == 4:
-                if dtype == np.uint8:
-                    return TextureFormat.RGBA8UINT
-                elif dtype == np.float16:
-                    return TextureFormat.RGBA16FLOAT
-                elif dtype == np.uint16:
-                    return TextureFormat.RGBA16UINT
-                elif dtype == np.float32:
-                    return TextureFormat.RGBA32FLOAT
-                elif dtype == np.uint32:
-                    return TextureFormat.RGBA32UINT
-        raise Gfx2CudaFormatError(f"Unsupported texture format for {channels} channels and {dtype}")
-
-    @property
-    def size(self):
-        return self.value[0]
-
-    @property
-    def channels(self):
-        return self.value[1]
-
-    @property
-    def normalized(self):
-        return self.value[2]
+        key = (channels, _dtype_name(dtype), normalized)
+        if key not in _channels_and_dtype_map:
+            raise Gfx2CudaFormatError(
+                f"Unsupported texture format for {channels} channels and {key[1]}")
+        return _channels_and_dtype_map[key]
 
     def get_pixel_size(self):
-        return self.channels * self.size
+        return self.pixel_size
+
+    def row_pitch(self, width):
+        return width * self.pixel_size
 
     def get_dxgi_format(self):
-        if self in _dxgi_format_map:
-            return _dxgi_format_map[self]
-        raise Gfx2CudaFormatError(f"Unsupported texture format {self}")
+        return self.dxgi_format
 
     @classmethod
     def from_dxgi_format(cls, format):
-        return _dxgi_forma_inv[format]
-
-
-
-_dxgi_format_map = {
-    TextureFormat.R8UNORM: 61,      # DXGI_FORMAT_R8_UNORM
-    TextureFormat.R8UINT: 62,       # DXGI_FORMAT_R8_UINT
-    TextureFormat.R16UNORM: 56,     # DXGI_FORMAT_R16_UNORM
-    TextureFormat.R16UINT: 57,      # DXGI_FORMAT_R16_UINT
-    TextureFormat.R32FLOAT: 41,     # DXGI_FORMAT_R32_FLOAT
-    TextureFormat.R32UINT: 42,      # DXGI_FORMAT_R32_UINT
-    TextureFormat.RG8UNORM: 49,     # DXGI_FORMAT_R8G8_UNORM
-    TextureFormat.RG8UINT: 50,      # DXGI_FORMAT_R8G8_UINT
-    TextureFormat.RG16FLOAT: 34,    # DXGI_FORMAT_R16G16_FLOAT
-    TextureFormat.RG16UNORM: 35,    # DXGI_FORMAT_R16G16_UNORM
-    TextureFormat.RG16UINT: 36,     # DXGI_FORMAT_R16G16_UINT
-    TextureFormat.RG32FLOAT: 16,    # DXGI_FORMAT_R32G32_FLOAT
-    TextureFormat.RG32UINT: 17,     # DXGI_FORMAT_R32G32_UINT
-    TextureFormat.RGB32FLOAT: 6,    # DXGI_FORMAT_R32G32B32_FLOAT
-    TextureFormat.RGB32UINT: 7,     # DXGI_FORMAT_R32G32B32_UINT
-    TextureFormat.RGBA8UNORM: 28,   # DXGI_FORMAT_R8G8B8A8_UNORM
-    TextureFormat.RGBA8UINT: 30,    # DXGI_FORMAT_R8G8B8A8_UINT
-    TextureFormat.RGBA16FLOAT: 10,  # DXGI_FORMAT_R16G16B16A16_FLOAT
-    TextureFormat.RGBA16UNORM: 11,  # DXGI_FORMAT_R16G16B16A16_UNORM
-    TextureFormat.RGBA16UINT: 12,   # DXGI_FORMAT_R16G16B16A16_UINT
-    TextureFormat.RGBA32FLOAT: 2,   # DXGI_FORMAT_R32G32B32A32_FLOAT
-    TextureFormat.RGBA32UINT: 3     # DXGI_FORMAT_R32G32B32A32_UINT
-}
-
-_dxgi_forma_inv = {v: k for k, v in _dxgi_format_map.items()}
+        if format not in _dxgi_format_map:
+            raise Gfx2CudaFormatError(f"Unsupported DXGI format {format}")
+        return _dxgi_format_map[format]
+
+
+_dxgi_format_map = {fmt.dxgi_format: fmt for fmt in TextureFormat}
+
+# Formats picked for plain arrays, the RGBA ordered linear variant of each element type
+_channels_and_dtype_map = {}
+for _fmt in TextureFormat:
+    if not _fmt.packed and not _fmt.srgb and _fmt.order.startswith('R'):
+        _channels_and_dtype_map.setdefault((_fmt.channels, _fmt.dtype, _fmt.normalized), _fmt)
+del _fmt
+
+# Names of the dtypes seen so far, e.g. numpy types, strings or torch.uint8
+_dtype_names = {'float': 'float32', 'half': 'float16'}
+
+
+def _dtype_name(dtype):
+    try:
+        return _dtype_names[dtype]
+    except (KeyError, TypeError):
+        pass
+    import numpy as np
+    try:
+        name = np.dtype(dtype).name
+    except TypeError:
+        # try to remove prefix (eg. torch.uint32, or tf.uint32)
+        name = np.dtype(str(dtype).split('.')[-1]).name
+    try:
+        _dtype_names[dtype] = name
+    except TypeError:
+        pass
+    return name
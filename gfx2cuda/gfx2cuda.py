@@ -1,16 +1,22 @@
-from gfx2cuda.backends import Backends, Device
+import threading
+import weakref
+
+import gfx2cuda.profiling
+from gfx2cuda.backends import Backends, Device, PeerTexture
+from gfx2cuda.cache import IpcCache
 from gfx2cuda.exception import Gfx2CudaError
 
 
 class Singleton(type):
+    # One instance per process, later calls return it
     _instances = {}
+    _lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
-        else:
-            print(f"Only 1 instance of {cls.__name__} is allowed per process! Returning the existing instance...")
-        return cls._instances[cls]
+        with cls._lock:
+            if cls not in cls._instances:
+                cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
+            return cls._instances[cls]
 
 
 class Gfx2Cuda(metaclass=Singleton):
@@ -20,7 +26,12 @@ class Gfx2Cuda(metaclass=Singleton):
         self.detect_devices()
         self.device = self.devices[0] if len(self.devices) > 0 else None
         self.device.init_context()
-        self._ipc_handle_map = dict()
+        # Guards the handle map and the pool setting
+        self._lock = threading.RLock()
+        # Textures created by this process by handle, they are opened as themselves while alive
+        self._owned = weakref.WeakValueDictionary()
+        self.ipc_cache = IpcCache()
+        self.pool = None
 
     def get_backend(self):
         return self.backend
@@ -32,26 +43,115 @@ class Gfx2Cuda(metaclass=Singleton):
     def _reset_devices(self):
         self.devices = []
 
-    def create_texture(self, width, height, format, device=None):
-        if device >= len(self.devices):
-            raise Gfx2CudaError("Out of bound CUDA device")
-        if self.device is not None and device is None:
-            tex = self.device.create_texture(width, height, format)
-        else:
-            if self.devices[device].has_cuda():
-                assert device == self.devices[device].dev
-                tex = self.devices[device].create_texture(width, height, format)
-            else:
-                raise Gfx2CudaError("Device has no CUDA capabilities.")
-        self._ipc_handle_map[tex.ipc_handle] = tex
-        return tex
+    def get_device(self, device=None):
+        # device is None for the default adapter, an index into self.devices or a Device
+        if device is None:
+            return self.device
+        if not isinstance(device, Device):
+            if not 0 <= device < len(self.devices):
+                raise Gfx2CudaError("Out of bound CUDA device")
+            device = self.devices[device]
+        if not device.has_cuda():
+            raise Gfx2CudaError("Device has no CUDA capabilities.")
+        return device
 
-    def lookup_ipc_handle(self, handle):
-        if handle in self._ipc_handle_map:
-            return self._ipc_handle_map[handle]
+    def find_device(self, luid):
+        for device in self.devices:
+            if device.luid == luid:
+                return self.get_device(device)
         return None
 
-    def open_ipc_handle(self, handle):
-        tex = self.device.open_ipc_handle(handle)
-        self._ipc_handle_map[handle] = tex
+    def create_texture(self, width, height, format, device=None, keyed_mutex=False, layers=1,
+                       cpu_access=False):
+        dev = self.get_device(device)
+        tex = None
+        if self.pool is not None:
+            tex = self.pool.acquire(width, height, format, dev, keyed_mutex, layers, cpu_access)
+        if tex is None:
+            tex = dev.create_texture(width, height, format, keyed_mutex, layers, cpu_access)
+            with self._lock:
+                self._owned[int(tex.ipc_handle)] = tex
+        if cpu_access:
+            # Staging buffers for double buffered readback of a whole layer, also for pooled
+            # textures
+            dev.host_pool.reserve(tex.nbytes // layers, 2)
         return tex
+
+    def set_texture_pool(self, pool):
+        with self._lock:
+            if self.pool is not None:
+                self._forget_textures(self.pool.clear())
+            self.pool = pool
+
+    def set_ipc_cache(self, cache):
+        with self._lock:
+            self.ipc_cache.clear()
+            self.ipc_cache = cache
+
+    def release_texture(self, tex):
+        # Gives a texture back. Opened textures return their reference to the IPC cache, textures
+        # created by this process are recycled when a texture pool is set.
+        with self._lock:
+            if self.ipc_cache.release(tex):
+                return
+            if self.pool is not None and tex._owner:
+                self._forget_textures(self.pool.release(tex))
+            else:
+                self._forget_textures([tex])
+
+    def _forget_textures(self, textures):
+        with self._lock:
+            for tex in textures:
+                if self._owned.get(int(tex.ipc_handle)) is tex:
+                    del self._owned[int(tex.ipc_handle)]
+
+    def _ipc_devices(self, handle, device):
+        # The resource is opened on the adapter it lives on and used on the requested one
+        source = self.find_device(getattr(handle, 'luid', None))
+        target = self.get_device(device)
+        if source is None:
+            source = target
+        elif device is None:
+            target = source
+        return source, target
+
+    def lookup_ipc_handle(self, handle, device=None):
+        # The texture for the handle if it is open, without taking a reference
+        source, target = self._ipc_devices(handle, device)
+        if source is target:
+            tex = self._owned.get(int(handle))
+            if tex is not None and not tex.closed:
+                return tex
+            return self.ipc_cache.peek(int(handle))
+        return self.ipc_cache.peek((int(handle), target.luid))
+
+    def open_ipc_handle(self, handle, device=None):
+        # Textures of this process are returned as they are, others come from the IPC cache
+        source, target = self._ipc_devices(handle, device)
+        if source is target:
+            tex = self._owned.get(int(handle))
+            if tex is not None and not tex.closed:
+                return tex
+            return self.ipc_cache.acquire(
+                int(handle), lambda: self._open(source.open_ipc_handle, source, handle))
+        return self.ipc_cache.acquire(
+            (int(handle), target.luid),
+            lambda: PeerTexture(self._open(source.open_ipc_handle, source, handle), target))
+
+    @staticmethod
+    def _open(open, device, handle, *args):
+        span = gfx2cuda.profiling.begin(device) if gfx2cuda.profiling.enabled else None
+        resource = open(int(handle), *args)
+        if span is not None:
+            span.end('open')
+        return resource
+
+    def create_buffer(self, shape, dtype, device=None):
+        return self.get_device(device).create_buffer(shape, dtype)
+
+    def open_ipc_buffer(self, handle, shape, dtype, device=None):
+        source, target = self._ipc_devices(handle, device)
+        if source is not target:
+            raise Gfx2CudaError(
+                "Shared buffers can only be opened on the adapter they were created on")
+        return self._open(source.open_ipc_buffer, source, handle, shape, dtype)
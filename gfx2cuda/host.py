@@ -0,0 +1,160 @@
+import collections
+import threading
+
+import gfx2cuda.finalize
+
+
+class PinnedPool:
+    # Page-locked host buffers of a device by size. Buffers given back with an event are reused
+    # once the event completed, idle buffers beyond max_bytes are freed, oldest first.
+
+    def __init__(self, device, max_bytes=256 * 1024 * 1024):
+        self.device = device
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.allocations = 0
+        self.hits = 0
+        # Idle buffers from least to most recently given back, with the event of their last copy
+        self._idle = collections.OrderedDict()
+        # Given back by HostBuffer finalizers, which must not take the lock
+        self._returned = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, nbytes):
+        with self._lock:
+            self._collect()
+            for ptr, (size, event) in self._idle.items():
+                if size == nbytes and (event is None or event.query()):
+                    del self._idle[ptr]
+                    self.nbytes -= size
+                    self.hits += 1
+                    return ptr
+            self.allocations += 1
+        return self.device.allocate_host(nbytes)
+
+    def release(self, ptr, nbytes, event=None):
+        # event is the copy still using the buffer, if any
+        self._returned.append((ptr, nbytes, event))
+
+    def reserve(self, nbytes, count=2):
+        # Allocates buffers ahead of the first copies, as many as fit into max_bytes
+        count = min(count, self.max_bytes // nbytes)
+        with self._lock:
+            self._collect()
+            missing = count - sum(1 for size, _ in self._idle.values() if size == nbytes)
+            self.allocations += max(missing, 0)
+        for _ in range(missing):
+            self.release(self.device.allocate_host(nbytes), nbytes)
+
+    def take(self, nbytes, shape, dtype):
+        # A buffer that goes back to the pool when the arrays viewing it are gone
+        return HostBuffer(self, self.acquire(nbytes), nbytes, shape, dtype)
+
+    def clear(self):
+        with self._lock:
+            self._collect()
+            freed = list(self._idle.items())
+            self._idle.clear()
+            self.nbytes = 0
+        for ptr, (_, event) in freed:
+            self._free(ptr, event)
+
+    def stats(self):
+        with self._lock:
+            self._collect()
+            return {'allocations': self.allocations, 'hits': self.hits, 'idle': len(self._idle),
+                    'nbytes': self.nbytes}
+
+    def _collect(self):
+        while self._returned:
+            ptr, nbytes, event = self._returned.popleft()
+            self._idle[ptr] = (nbytes, event)
+            self.nbytes += nbytes
+        while self.nbytes > self.max_bytes and self._idle:
+            ptr, (nbytes, event) = self._idle.popitem(last=False)
+            self.nbytes -= nbytes
+            self._free(ptr, event)
+
+    def _free(self, ptr, event):
+        # Freeing page-locked memory synchronizes the device, it is left to the release queue
+        def release():
+            if event is not None:
+                event.wait()
+            self.device.free_host(ptr)
+        gfx2cuda.finalize.defer(release)
+
+
+class HostBuffer:
+    # Page-locked memory viewed as a NumPy array, np.asarray(buffer) keeps the buffer alive
+
+    def __init__(self, pool, ptr, nbytes, shape, dtype):
+        import numpy as np
+        self.pool = pool
+        self.ptr = ptr
+        self.nbytes = nbytes
+        self.shape = tuple(shape)
+        self._typestr = np.dtype(dtype).str
+        self.event = None
+
+    @property
+    def __array_interface__(self):
+        return {'shape': self.shape, 'typestr': self._typestr, 'data': (self.ptr, False),
+                'version': 3}
+
+    def __del__(self):
+        self.pool.release(self.ptr, self.nbytes, self.event)
+
+
+class HostReadback:
+    # Reads a texture into host memory every frame without waiting for the copy. push() queues the
+    # copy of the current content and returns the frame pushed depth - 1 calls earlier, so with
+    # depth 2 the copy of frame N runs while the caller processes frame N - 1. A returned array is
+    # valid until it is dropped.
+
+    def __init__(self, tex, depth=2, rect=None, layer=0, stream=0):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.tex = tex
+        self.depth = depth
+        self.rect = rect
+        self.layer = layer
+        self.stream = stream
+        self.frames = 0
+        self._pending = collections.deque()
+
+    def push(self):
+        tex = self.tex
+        with tex.lock:
+            tex.map(self.stream)
+            try:
+                buf = tex._copy_to_host_async(self.rect, self.layer, self.stream)
+            finally:
+                tex.unmap(self.stream)
+        self.frames += 1
+        self._pending.append(buf)
+        if len(self._pending) < self.depth:
+            return None
+        return self._finish(self._pending.popleft())
+
+    def drain(self):
+        # The frames still in flight, oldest first
+        while self._pending:
+            yield self._finish(self._pending.popleft())
+
+    @staticmethod
+    def _finish(buf):
+        import numpy as np
+        buf.event.wait()
+        buf.event = None
+        return np.asarray(buf)
+
+    def close(self):
+        for buf in self._pending:
+            buf.event.wait()
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,82 @@
+import collections
+import threading
+
+
+class TexturePool:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._buckets = collections.defaultdict(list)
+        # Idle textures from least to most recently released
+        self._lru = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(width, height, format, device, keyed_mutex=False, layers=1, cpu_access=False):
+        # Every argument that changes how the texture is created
+        return width, height, format, device, keyed_mutex, layers, cpu_access
+
+    def acquire(self, width, height, format, device, keyed_mutex=False, layers=1,
+                cpu_access=False):
+        key = self.key(width, height, format, device, keyed_mutex, layers, cpu_access)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if not bucket:
+                self.misses += 1
+                return None
+            tex = bucket.pop()
+            del self._lru[id(tex)]
+            self.nbytes -= tex.nbytes
+            self.hits += 1
+            return tex
+
+    def release(self, tex):
+        # Returns the textures that were evicted to stay within the byte budget
+        if tex.closed:
+            return [tex]
+        # The next acquire must not get a texture that is still mapped or written by a copy
+        tex.set_persistent(False)
+        tex.wait()
+        key = self.key(tex.width, tex.height, tex.format, tex.device, tex.keyed_mutex, tex.layers,
+                       tex.cpu_access)
+        evicted = []
+        with self._lock:
+            if tex.nbytes > self.max_bytes:
+                self.evictions += 1
+                return [tex]
+            self._buckets[key].append(tex)
+            self._lru[id(tex)] = key
+            self.nbytes += tex.nbytes
+            while self.nbytes > self.max_bytes:
+                evicted.append(self._evict())
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            return [self._evict() for _ in range(len(self._lru))]
+
+    def _evict(self):
+        _, key = self._lru.popitem(last=False)
+        bucket = self._buckets[key]
+        tex = bucket.pop(0)
+        if not bucket:
+            del self._buckets[key]
+        self.nbytes -= tex.nbytes
+        self.evictions += 1
+        return tex
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'textures': len(self._lru),
+                'nbytes': self.nbytes,
+            }
+
+    def __len__(self):
+        return len(self._lru)
@@ -0,0 +1,172 @@
+import collections
+import os
+import threading
+import time
+
+# Checked first on the hot paths, so profiling costs one lookup and a branch while it is off
+enabled = False
+# Also time the stages on the GPU with CUDA events, resolved when the stats or the trace are read
+gpu_time = False
+
+# Counters incremented by every call of a stage
+_stage_counters = {
+    'map': 'maps',
+    'unmap': 'unmaps',
+    'get_mapped_array': 'mapped_arrays',
+    'memcpy2d': 'copies',
+    'memcpy3d': 'copies',
+    'convert': 'copies',
+    'flush': 'flushes',
+    'open': 'opens',
+}
+
+_lock = threading.Lock()
+_counters = collections.Counter()
+# Count, wall time, longest wall time, GPU time and bytes by texture and stage, times in ns
+_totals = {}
+# Trace events of the most recent stages
+_trace = collections.deque(maxlen=100000)
+# Stages whose GPU time is not known yet, with their timing events
+_pending = collections.deque()
+
+
+def enable(gpu=False):
+    global enabled, gpu_time
+    gpu_time = gpu
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _totals.clear()
+        _trace.clear()
+        _pending.clear()
+
+
+class Span:
+    # One call of a stage, from begin() to end()
+
+    __slots__ = ('target', 'stream', 'start', 'gpu_start')
+
+    def __init__(self, target, stream=None):
+        self.target = target
+        self.stream = stream
+        self.gpu_start = _timing_event(target, stream) if gpu_time and stream is not None else None
+        self.start = time.perf_counter_ns()
+
+    def end(self, stage, nbytes=0, count=1):
+        wall = time.perf_counter_ns() - self.start
+        events = None
+        if self.gpu_start is not None:
+            events = self.gpu_start, _timing_event(self.target, self.stream)
+        _record(stage, _label(self.target), self.start, wall, nbytes, count, events)
+
+
+def begin(target, stream=None):
+    # stream is the stream the stage is queued on, for its GPU time
+    return Span(target, stream)
+
+
+def _timing_event(target, stream):
+    # None for backends without CUDA
+    if isinstance(target, (list, tuple)):
+        target = target[0]
+    return target._timing_event(stream)
+
+
+def _label(target):
+    if isinstance(target, (list, tuple)):
+        return f"{len(target)} textures"
+    if hasattr(target, 'format'):
+        return f"{target.format.name} {target.width}x{target.height} {id(target):#x}"
+    return getattr(target, 'name', str(target))
+
+
+def _record(stage, label, start, wall, nbytes, count, events):
+    event = {
+        'name': stage,
+        'ph': 'X',
+        'ts': start / 1000,
+        'dur': wall / 1000,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': {'texture': label},
+    }
+    if nbytes:
+        event['args']['bytes'] = nbytes
+    with _lock:
+        _counters[_stage_counters.get(stage, stage)] += count
+        if nbytes:
+            _counters['bytes_copied'] += nbytes
+        total = _totals.get((label, stage))
+        if total is None:
+            total = _totals[(label, stage)] = [0, 0, 0, 0, 0]
+        total[0] += 1
+        total[1] += wall
+        total[2] = max(total[2], wall)
+        total[4] += nbytes
+        _trace.append(event)
+        if events is not None:
+            _pending.append((total, event, events))
+            _resolve(block=False)
+
+
+def _resolve(block=True):
+    # Adds the GPU time of finished stages, in the order they were queued
+    while _pending:
+        total, event, (start, end) = _pending[0]
+        if not block and not end.query():
+            return
+        end.wait()
+        gpu = end.elapsed_ms(start) * 1e6
+        total[3] += gpu
+        event['args']['gpu_us'] = gpu / 1000
+        _pending.popleft()
+
+
+def _summary(total):
+    count, wall, longest, gpu, nbytes = total
+    summary = {'count': count, 'total_ms': wall / 1e6, 'mean_ms': wall / 1e6 / count,
+               'max_ms': longest / 1e6}
+    if gpu:
+        summary['gpu_ms'] = gpu / 1e6
+    if nbytes:
+        summary['bytes'] = nbytes
+    return summary
+
+
+def stats():
+    with _lock:
+        _resolve()
+        stages = {}
+        textures = {}
+        for (label, stage), total in _totals.items():
+            merged = stages.setdefault(stage, [0, 0, 0, 0, 0])
+            merged[0] += total[0]
+            merged[1] += total[1]
+            merged[2] = max(merged[2], total[2])
+            merged[3] += total[3]
+            merged[4] += total[4]
+            textures.setdefault(label, {})[stage] = _summary(total)
+        return {
+            'counters': dict(_counters),
+            'stages': {stage: _summary(total) for stage, total in stages.items()},
+            'textures': textures,
+        }
+
+
+def dump_trace(path):
+    # Writes the recorded stages in the Chrome trace event format, for chrome://tracing or Perfetto
+    import json
+    with _lock:
+        _resolve()
+        events = list(_trace)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return len(events)
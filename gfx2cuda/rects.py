@@ -0,0 +1,74 @@
+import numpy as np
+
+# Rectangles are (x, y, width, height) tuples, like the rect argument of Texture.copy_to
+
+
+def from_ltrb(rects):
+    return [(left, top, right - left, bottom - top) for left, top, right, bottom in rects]
+
+
+def clip(rects, width, height):
+    clipped = []
+    for x, y, w, h in rects:
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, width), min(y + h, height)
+        if x1 > x0 and y1 > y0:
+            clipped.append((x0, y0, x1 - x0, y1 - y0))
+    return clipped
+
+
+def bounding_box(rects):
+    x0 = min(x for x, _, _, _ in rects)
+    y0 = min(y for _, y, _, _ in rects)
+    x1 = max(x + w for x, _, w, _ in rects)
+    y1 = max(y + h for _, y, _, h in rects)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def area(rects):
+    # Area of the union, overlapping parts are counted once
+    if not rects:
+        return 0
+    r = np.asarray(rects, dtype=np.int64)
+    xs = np.unique(np.concatenate([r[:, 0], r[:, 0] + r[:, 2]]))
+    ys = np.unique(np.concatenate([r[:, 1], r[:, 1] + r[:, 3]]))
+    covered = np.zeros((len(ys) - 1, len(xs) - 1), dtype=bool)
+    for x, y, w, h in r:
+        rows = slice(np.searchsorted(ys, y), np.searchsorted(ys, y + h))
+        covered[rows, np.searchsorted(xs, x):np.searchsorted(xs, x + w)] = True
+    return int((np.diff(ys)[:, None] * np.diff(xs)[None, :] * covered).sum())
+
+
+def coverage(rects, width, height):
+    return area(clip(rects, width, height)) / (width * height)
+
+
+def _near(a, b, gap):
+    return (
+        a[0] <= b[0] + b[2] + gap and b[0] <= a[0] + a[2] + gap
+        and a[1] <= b[1] + b[3] + gap and b[1] <= a[1] + a[3] + gap
+    )
+
+
+def coalesce(rects, gap=0, max_waste=0.25):
+    # Merges rects that overlap or are at most gap pixels apart into their bounding box, as long as
+    # at most max_waste of the box is not covered by them
+    rects = [tuple(rect) for rect in rects if rect[2] > 0 and rect[3] > 0]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                if not _near(rects[i], rects[j], gap):
+                    continue
+                box = bounding_box([rects[i], rects[j]])
+                box_area = box[2] * box[3]
+                if box_area - area([rects[i], rects[j]]) > max_waste * box_area:
+                    continue
+                rects[i] = box
+                del rects[j]
+                merged = True
+                break
+            if merged:
+                break
+    return rects
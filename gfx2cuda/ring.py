@@ -0,0 +1,197 @@
+import itertools
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import gfx2cuda
+from gfx2cuda.backends import _open_shared_memory
+from gfx2cuda.exception import Gfx2CudaError
+from gfx2cuda.format import TextureFormat
+
+_MAGIC = 0x67667832
+_DROP_OLDEST = 0
+_BLOCK = 1
+
+# Layout of the control block, followed by a texture handle, a sequence number and the number of
+# the frame it holds per slot
+_HEADER_MAGIC = 0
+_HEADER_SLOTS = 1
+_HEADER_HEIGHT = 2
+_HEADER_WIDTH = 3
+_HEADER_FORMAT = 4
+_HEADER_POLICY = 5
+_HEADER_WRITTEN = 6
+_HEADER_READ = 7
+_HEADER_DROPPED = 8
+_HEADER_TORN = 9
+_HEADER_LUID = 10
+_HEADER_SIZE = 11
+
+_ring_counter = itertools.count(1)
+
+
+class SharedTextureRing:
+    # Frame n (counting from 1) lives in slot (n - 1) % n_slots. A slot's sequence number is odd
+    # while the producer writes to it, readers retry when it changed during their copy.
+
+    def __init__(self, n_slots, shape, format, policy='drop_oldest', name=None, **kwargs):
+        if policy not in ('drop_oldest', 'block'):
+            raise ValueError(f"unknown backpressure policy {policy}")
+        self._owner = name is None
+        if self._owner:
+            name = f"gfx2cuda_ring_{os.getpid():x}_{next(_ring_counter)}"
+            size = (_HEADER_SIZE + 3 * n_slots) * 8
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._block = np.ndarray((_HEADER_SIZE + 3 * n_slots,), dtype=np.uint64,
+                                     buffer=self._shm.buf)
+            self._block[:] = 0
+            self.textures = [gfx2cuda.texture(list(shape), format, **kwargs)
+                             for _ in range(n_slots)]
+            self._block[_HEADER_SLOTS] = n_slots
+            self._block[_HEADER_HEIGHT] = shape[0]
+            self._block[_HEADER_WIDTH] = shape[1]
+            self._block[_HEADER_FORMAT] = format.get_dxgi_format()
+            self._block[_HEADER_POLICY] = _BLOCK if policy == 'block' else _DROP_OLDEST
+            handles = [tex.ipc_handle for tex in self.textures]
+            self._block[_HEADER_SIZE:_HEADER_SIZE + n_slots] = handles
+            # Adapter of the producer, 0 when the backend has no LUIDs
+            self._block[_HEADER_LUID] = self.textures[0].device.luid or 0
+            self._block[_HEADER_MAGIC] = _MAGIC
+        else:
+            self._shm = _open_shared_memory(name)
+            self._block = np.ndarray((len(self._shm.buf) // 8,), dtype=np.uint64,
+                                     buffer=self._shm.buf)
+            if self._block[_HEADER_MAGIC] != _MAGIC:
+                raise Gfx2CudaError(f"{name} is not a shared texture ring")
+            n_slots = int(self._block[_HEADER_SLOTS])
+            handles = self._block[_HEADER_SIZE:_HEADER_SIZE + n_slots]
+            luid = int(self._block[_HEADER_LUID]) or None
+            self.textures = [
+                gfx2cuda.open_ipc_texture(gfx2cuda.IpcHandle(int(handle), luid), **kwargs)
+                for handle in handles]
+        self.name = name
+        self.n_slots = n_slots
+        self.shape = (int(self._block[_HEADER_HEIGHT]), int(self._block[_HEADER_WIDTH]))
+        self.format = TextureFormat.from_dxgi_format(int(self._block[_HEADER_FORMAT]))
+        self.policy = 'block' if self._block[_HEADER_POLICY] == _BLOCK else 'drop_oldest'
+        self._seq = self._block[_HEADER_SIZE + n_slots:_HEADER_SIZE + 2 * n_slots]
+        self._frames = self._block[_HEADER_SIZE + 2 * n_slots:_HEADER_SIZE + 3 * n_slots]
+        self._writing = None
+        self._last_read = 0
+
+    @classmethod
+    def open(cls, name, **kwargs):
+        return cls(None, None, None, name=name, **kwargs)
+
+    def begin_write(self, timeout=None):
+        # Returns the texture of the next slot, it is published to readers by end_write
+        if self._writing is not None:
+            raise Gfx2CudaError("A write to the ring is already in progress")
+        frame = int(self._block[_HEADER_WRITTEN]) + 1
+        overwritten = frame - self.n_slots
+        if self.policy == 'block':
+            self._wait_for_reader(overwritten, timeout)
+        elif overwritten > int(self._block[_HEADER_READ]):
+            self._block[_HEADER_DROPPED] += 1
+        slot = (frame - 1) % self.n_slots
+        self._seq[slot] += 1
+        self._writing = frame
+        return self.textures[slot]
+
+    def end_write(self):
+        frame = self._writing
+        slot = (frame - 1) % self.n_slots
+        self._frames[slot] = frame
+        self._seq[slot] += 1
+        self._block[_HEADER_WRITTEN] = frame
+        self._writing = None
+        return frame
+
+    def write(self, src, timeout=None):
+        tex = self.begin_write(timeout)
+        try:
+            with tex:
+                tex.copy_from(src)
+            # The copy is only queued, the frame is published once it landed
+            tex.wait()
+        except BaseException:
+            # Leave the slot stable again but do not publish it
+            self._seq[(self._writing - 1) % self.n_slots] += 1
+            self._writing = None
+            raise
+        return self.end_write()
+
+    def _wait_for_reader(self, frame, timeout):
+        start = time.perf_counter()
+        delay = 1e-5
+        while frame > int(self._block[_HEADER_READ]):
+            if timeout is not None and time.perf_counter() - start > timeout:
+                raise Gfx2CudaError("Timed out waiting for a free slot in the ring")
+            time.sleep(delay)
+            delay = min(delay * 2, 1e-3)
+
+    def read_latest(self, dst, timeout=0):
+        # Copies the newest complete frame into dst and returns its number, or None when no frame
+        # newer than the previous read arrived within the timeout
+        start = time.perf_counter()
+        while True:
+            frame = int(self._block[_HEADER_WRITTEN])
+            if frame > self._last_read:
+                slot = (frame - 1) % self.n_slots
+                seq = int(self._seq[slot])
+                # Odd while the producer writes to the slot again, it is retried after the sleep.
+                # The producer may have lapped the reader since frame was read, the number of the
+                # frame in the slot is read under the sequence number like its pixels.
+                slot_frame = int(self._frames[slot])
+                if seq % 2 == 0 and slot_frame > self._last_read:
+                    tex = self.textures[slot]
+                    with tex:
+                        tex.copy_to(dst)
+                    # The slot may still be overwritten until the queued copy ran
+                    tex.wait()
+                    if int(self._seq[slot]) == seq:
+                        self._last_read = slot_frame
+                        # Newest frame read by any reader. A racing reader may set an older one,
+                        # which only makes the producer wait or count drops early.
+                        if slot_frame > int(self._block[_HEADER_READ]):
+                            self._block[_HEADER_READ] = slot_frame
+                        return slot_frame
+                    # The producer wrapped around and overwrote the slot during the copy
+                    self._block[_HEADER_TORN] += 1
+            if timeout is not None and time.perf_counter() - start >= timeout:
+                return None
+            time.sleep(1e-4)
+
+    def stats(self):
+        return {
+            'frames_written': int(self._block[_HEADER_WRITTEN]),
+            'frames_read': int(self._block[_HEADER_READ]),
+            'dropped_frames': int(self._block[_HEADER_DROPPED]),
+            'torn_reads': int(self._block[_HEADER_TORN]),
+        }
+
+    def close(self):
+        if self._shm is None:
+            return
+        if not self._owner:
+            # Return the opened textures to the IPC cache
+            for tex in self.textures:
+                gfx2cuda.release(tex)
+        self._block = None
+        self._seq = None
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,66 @@
+import gfx2cuda.dll.cuda
+
+
+def stream_handle(stream):
+    # The default stream is the calling thread's, so copies from several threads do not serialize
+    if stream is None or stream == 0:
+        return gfx2cuda.dll.cuda.cudaStreamPerThread
+    elif isinstance(stream, int):
+        return stream
+    elif hasattr(stream, 'cuda_stream'):
+        return stream.cuda_stream
+    raise ValueError("type of stream not understood as CUDA stream")
+
+
+class Event:
+    # Completion marker for work that already finished when the event was created
+
+    def query(self):
+        return True
+
+    def wait(self):
+        pass
+
+    def record(self, stream=0):
+        pass
+
+    def wait_stream(self, stream):
+        # Makes work queued on stream afterwards wait for the event
+        pass
+
+    def __await__(self):
+        # asyncio is only imported by code that awaits events
+        import gfx2cuda.aio
+        return gfx2cuda.aio.wait(self).__await__()
+
+
+class CudaEvent(Event):
+    def __init__(self, stream=0):
+        self._event = gfx2cuda.dll.cuda.cuda_event_create()
+        self.record(stream)
+
+    def record(self, stream=0):
+        gfx2cuda.dll.cuda.cuda_event_record(self._event, stream)
+
+    def query(self):
+        return gfx2cuda.dll.cuda.cuda_event_query(self._event)
+
+    def wait(self):
+        gfx2cuda.dll.cuda.cuda_event_synchronize(self._event)
+
+    def wait_stream(self, stream):
+        gfx2cuda.dll.cuda.cuda_stream_wait_event(stream, self._event)
+
+    def __del__(self):
+        gfx2cuda.dll.cuda.cuda_event_destroy(self._event)
+
+
+class TimingEvent(CudaEvent):
+    # Records a timestamp, used by gfx2cuda.profiling for the GPU time of a stage
+
+    def __init__(self, stream=0):
+        self._event = gfx2cuda.dll.cuda.cuda_event_create(timing=True)
+        self.record(stream)
+
+    def elapsed_ms(self, start):
+        return gfx2cuda.dll.cuda.cuda_event_elapsed_time(start._event, self._event)
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [8, 8, 4]
+
+
+class DelayedEvent(gfx2cuda.Event):
+    # Completes after a delay, like GPU work still in flight
+    def __init__(self, delay):
+        self.deadline = time.perf_counter() + delay
+
+    def query(self):
+        return time.perf_counter() >= self.deadline
+
+
+async def ticker(ticks):
+    # Keeps running while the events are pending, so the loop is not blocked
+    while True:
+        ticks.append(time.perf_counter())
+        await asyncio.sleep(0.001)
+
+
+async def main():
+    tex = gfx2cuda.texture(np.ones(shape, dtype=np.float32), backend=gfx2cuda.Backends.SIMULATED)
+    out = np.zeros(shape, dtype=np.float32)
+
+    async with tex.mapped():
+        assert tex._mapped
+        event = tex.copy_to_async(out)
+        await event
+    assert not tex._mapped
+    assert np.all(out == 1)
+    gfx2cuda.release(tex)
+
+    ticks = []
+    task = asyncio.ensure_future(ticker(ticks))
+    start = time.perf_counter()
+    events = [DelayedEvent(0.05), DelayedEvent(0.1), DelayedEvent(0.02)]
+    results = await asyncio.gather(*[gfx2cuda.wait(event) for event in events])
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    assert results == events
+    assert 0.1 <= elapsed < 0.5, elapsed
+    assert len(ticks) > 10, len(ticks)
+    # A single completion thread serves every wait
+    assert sum(thread.name == 'gfx2cuda-poller' for thread in threading.enumerate()) == 1
+
+    # Cancelled waits are dropped by the poller
+    waiter = asyncio.ensure_future(gfx2cuda.wait(DelayedEvent(0.05)))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.sleep(0.1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
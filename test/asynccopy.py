@@ -0,0 +1,32 @@
+import gfx2cuda
+import numpy as np
+
+
+if __name__ == "__main__":
+    shape = [4, 6, 4]
+    tex = gfx2cuda.texture(shape, gfx2cuda.TextureFormat.RGBA32FLOAT,
+                           backend=gfx2cuda.Backends.SIMULATED)
+    src = np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+    dst = np.zeros_like(src)
+
+    with tex:
+        event = tex.copy_from_async(src)
+        assert isinstance(event, gfx2cuda.Event) and event is tex._fence
+        event.wait()
+        assert event.query()
+
+        # Any stream handle, with the same region arguments as the synchronous copies
+        event = tex.copy_to_async(dst, stream=7)
+        event.wait()
+        assert event.query() and np.array_equal(dst, src)
+        crop = np.zeros([2, 3, 4], dtype=np.float32)
+        tex.copy_to_async(crop, rect=(1, 2, 3, 2)).wait()
+        assert np.array_equal(crop, src[2:4, 1:4])
+        tex.copy_from_async(crop, rect=(0, 0, 3, 2)).wait()
+    assert tex.is_ready()
+
+    with tex:
+        tex.copy_to(dst)
+    expected = src.copy()
+    expected[0:2, 0:3] = src[2:4, 1:4]
+    assert np.array_equal(dst, expected)
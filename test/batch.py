@@ -0,0 +1,47 @@
+import os
+
+# Two simulated adapters, set before the devices are discovered
+os.environ['GFX2CUDA_SIMULATED_ADAPTERS'] = '2'
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [4, 6, 4]
+
+
+if __name__ == "__main__":
+    backend = gfx2cuda.Backends.SIMULATED
+    textures = [gfx2cuda.texture(np.full(shape, i, dtype=np.float32), backend=backend)
+                for i in range(3)]
+    a, b, c = textures
+
+    # A texture listed twice is mapped once, the simulated backend raises on a second map
+    with gfx2cuda.map_many([a, b, a]) as mapped:
+        assert mapped == [a, b] and a._mapped and b._mapped
+    assert not a._mapped and not b._mapped
+
+    # Every destination gets the data of its texture
+    arrays = [np.zeros(shape, dtype=np.float32) for _ in textures]
+    gfx2cuda.copy_batch(zip(textures, arrays))
+    assert all(np.all(array == i) for i, array in enumerate(arrays))
+
+    # The textures are unmapped when a copy fails
+    try:
+        gfx2cuda.copy_batch([(a, arrays[0]), (b, np.zeros([2, 2, 4], dtype=np.float32))])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("copy into a too small array should fail")
+    assert not a._mapped and not b._mapped
+
+    # Textures shared from another adapter are mapped through their source, also next to it
+    tex = gfx2cuda.texture(np.full(shape, 7, dtype=np.float32), device=1)
+    peer = gfx2cuda.open_ipc_texture(tex.ipc_handle, device=0)
+    assert isinstance(peer, gfx2cuda.PeerTexture)
+    gfx2cuda.copy_batch([(a, arrays[0]), (peer, arrays[1]), (peer.source, arrays[2])])
+    assert np.all(arrays[0] == 0) and np.all(arrays[1] == 7) and np.all(arrays[2] == 7)
+    assert not peer.source._mapped
+
+    with gfx2cuda.map_many([]) as mapped:
+        assert mapped == []
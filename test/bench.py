@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+
+import gfx2cuda.bench
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        results = os.path.join(directory, 'results.json')
+        baseline = os.path.join(directory, 'baseline.json')
+        assert gfx2cuda.bench.main([
+            '--backend', 'simulated', '--formats', 'RGBA8UNORM', 'R8UNORM',
+            '--sizes', '64x64', '100x50', '--repeat', '5', '--ipc-repeat', '3',
+            '--ipc-size', '64x64', '--max-bytes', '19999', '-o', results]) == 0
+        with open(results) as f:
+            data = json.load(f)
+        assert data['meta']['backend'] == 'SIMULATED'
+        names = [entry['name'] for entry in data['results']]
+        assert names == [f"copy_{direction}/{fmt}/{size}" for fmt in ('RGBA8UNORM', 'R8UNORM')
+                         for size in ('64x64', '100x50') for direction in ('to', 'from')] + \
+            ['ipc_open/RGBA8UNORM/64x64', 'ipc_handoff/RGBA8UNORM/64x64'], names
+        for entry in data['results']:
+            if entry['format'] == 'RGBA8UNORM' and entry['width'] == 100:
+                assert 'skipped' in entry, entry
+                continue
+            assert entry['min_ms'] <= entry['p50_ms'] <= entry['p90_ms'] <= entry['p99_ms'] \
+                <= entry['max_ms']
+            assert entry['samples'] == (3 if entry['name'].startswith('ipc') else 5), entry
+
+        # Compared with itself nothing regressed, against a twice as fast baseline everything did
+        assert gfx2cuda.bench.main(['--compare', results, '--baseline', results]) == 0
+        for entry in data['results']:
+            if 'p50_ms' in entry:
+                entry['p50_ms'] /= 2
+        with open(baseline, 'w') as f:
+            json.dump(data, f)
+        assert gfx2cuda.bench.main(['--compare', results, '--baseline', baseline]) == 1
+        with open(results) as f:
+            regressions = gfx2cuda.bench.compare(data, json.load(f))
+        assert len(regressions) == 8, regressions
+        assert all(abs(r['ratio'] - 2) < 1e-9 for r in regressions), regressions
+
+    # A backend whose probe fails for lack of comtypes or D3D falls back to the simulated one
+    lazy_init = gfx2cuda._lazy_init
+    for error in (ImportError("No module named 'comtypes'"), AttributeError('D3D11CreateDevice')):
+        def failing_init(backend=None, error=error):
+            if backend is gfx2cuda.Backends.D3D11:
+                raise error
+            return lazy_init(backend)
+        gfx2cuda._lazy_init = failing_init
+        try:
+            assert gfx2cuda.bench.select_backend('d3d11') is gfx2cuda.Backends.SIMULATED
+        finally:
+            gfx2cuda._lazy_init = lazy_init
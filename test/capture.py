@@ -0,0 +1,50 @@
+import gfx2cuda
+import numpy as np
+
+
+shape = [4, 4, 4]
+
+
+class SyntheticSource(gfx2cuda.FrameSource):
+    def __init__(self, frames, timeouts=()):
+        fmt = gfx2cuda.TextureFormat.RGBA8UINT
+        super().__init__(shape[1], shape[0], fmt, gfx2cuda.Backends.SIMULATED)
+        self.texture = gfx2cuda.texture(shape, fmt, backend=self.backend)
+        self.frames = frames
+        self.timeouts = set(timeouts)
+        self.count = 0
+
+    def acquire(self, timeout_ms):
+        self.count += 1
+        if self.count in self.timeouts:
+            return None, 0
+        if self.count > self.frames:
+            return None, 0
+        with self.texture:
+            self.texture.copy_from(np.full(shape, self.count, dtype=np.uint8))
+        return self.texture, 2 if self.count == 3 else 1
+
+    def release(self):
+        pass
+
+
+if __name__ == "__main__":
+    # Every third frame, until the source runs out of frames
+    capture = gfx2cuda.Capture(source=SyntheticSource(frames=8), buffers=2)
+
+    values = [int(frame[0, 0, 0]) for frame in capture.frames(skip=2, on_timeout='stop')]
+    print(values)
+    assert values == [3, 6], values
+    assert capture.frames_captured == 2 and capture.frames_skipped == 6 and capture.timeouts == 1
+
+    capture = gfx2cuda.Capture(source=SyntheticSource(frames=8, timeouts=[2]), buffers=2)
+
+    frames = capture.frames(skip=1, on_timeout='repeat')
+    values = [int(next(frames)[0, 0, 0]) for _ in range(4)]
+    print(values)
+    assert values == [3, 5, 7, 7], values
+    assert capture.frames_captured == 3 and capture.frames_skipped == 4
+    assert capture.frames_dropped == 1
+    assert int(capture.latest()[0, 0, 0]) == 7
+
+    capture.close()
@@ -0,0 +1,50 @@
+import gfx2cuda
+import numpy as np
+
+from gfx2cuda.convert import kernel_source
+
+
+shape = [6, 8, 4]
+
+
+if __name__ == "__main__":
+    pixels = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    tex = gfx2cuda.texture(shape, gfx2cuda.TextureFormat.RGBA8UNORM,
+                           backend=gfx2cuda.Backends.SIMULATED)
+    with tex:
+        tex.copy_from(pixels)
+
+    mean = [0.485, 0.456, 0.406]
+    std = [0.229, 0.224, 0.225]
+    normalized = np.zeros(shape, dtype=np.float32)
+    model_input = np.zeros([3, 2, 4], dtype=np.float32)
+    half = np.zeros([6, 8, 1], dtype=np.float16)
+    with tex:
+        tex.copy_to(normalized, convert={})
+        tex.copy_to(model_input, rect=(2, 1, 4, 2),
+                    convert=gfx2cuda.Conversion(channels='BGR', mean=mean, std=std, layout='CHW'))
+        tex.copy_to(half, convert={'dtype': 'float16', 'channels': [3]})
+
+    assert np.allclose(normalized, pixels / 255.0)
+    expected = (pixels[1:3, 2:6, 2::-1] / 255.0 - mean) / std
+    assert np.allclose(model_input, expected.transpose(2, 0, 1), atol=1e-5)
+    assert np.allclose(half[..., 0], pixels[..., 3] / 255.0, atol=1e-3)
+
+    with tex:
+        for convert in ({'channels': 'RGBX'}, {'layout': 'WHC'}, {'dtype': 'int64'}):
+            try:
+                tex.copy_to(normalized, convert=convert)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"invalid conversion {convert} was accepted")
+        try:
+            tex.copy_to(model_input, convert={})
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("too small buffer was accepted")
+
+    source = kernel_source(gfx2cuda.TextureFormat.RGBA8UNORM,
+                           gfx2cuda.Conversion(channels='BGR', layout='CHW'))
+    assert 'tex2D<uchar4>' in source and '(2 * height + y) * width + x' in source
@@ -0,0 +1,149 @@
+import ctypes
+import functools
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import gfx2cuda.dll.cuda as cuda
+
+
+# Every runtime entry point returns cudaSuccess immediately, so the timings only measure the
+# Python side
+stub_source = r"""
+#include <stddef.h>
+#define EXPORT __attribute__((visibility("default")))
+EXPORT const char *cudaGetErrorName(int e) { return "cudaErrorStub"; }
+EXPORT int cudaGraphicsMapResources(int n, void **r, void *s) { return 0; }
+EXPORT int cudaGraphicsUnmapResources(int n, void **r, void *s) { return 0; }
+EXPORT int cudaGraphicsSubResourceGetMappedArray(void **a, void *r, unsigned i, unsigned l) {
+    *a = (void *)0x1000; return 0;
+}
+EXPORT int cudaMemcpy2DFromArrayAsync(void *d, size_t dp, void *s, size_t w, size_t h, size_t wb,
+                                      size_t hb, int k, void *st) { return 0; }
+EXPORT int cudaMemcpy2DToArrayAsync(void *d, size_t w, size_t h, void *s, size_t sp, size_t wb,
+                                    size_t hb, int k, void *st) { return 0; }
+EXPORT int cudaEventRecord(void *e, void *s) { return 0; }
+EXPORT int cudaEventQuery(void *e) { return 0; }
+EXPORT int cudaGraphicsUnregisterResource(void *r) { return 1; }
+"""
+
+# Device addresses above 4 GiB, as on 64-bit drivers
+dst_ptr = 0x7f0000002000
+src_ptr = 0x7f0000001000
+
+
+def build_stub(directory):
+    source = os.path.join(directory, 'cudart_stub.c')
+    path = os.path.join(directory, 'cudart_stub.so')
+    with open(source, 'w') as f:
+        f.write(stub_source)
+    subprocess.check_call(['cc', '-O2', '-shared', '-fPIC', source, '-o', path])
+    return path
+
+
+def unbound_calls(lib, resource, event):
+    # The previous binding style: no prototypes and fresh argument objects on every call
+    def map():
+        ret = lib.cudaGraphicsMapResources(1, ctypes.byref(resource), ctypes.c_void_p(2))
+        assert ret == 0, ret
+
+    def get_mapped_array():
+        array = ctypes.c_void_p()
+        ret = lib.cudaGraphicsSubResourceGetMappedArray(ctypes.byref(array), resource, 0, 0)
+        assert ret == 0, ret
+        return array.value
+
+    def memcpy2d_atod_async():
+        ret = lib.cudaMemcpy2DFromArrayAsync(ctypes.c_void_p(dst_ptr), 256,
+                                             ctypes.c_void_p(src_ptr), 0, 0, 256, 64, 3,
+                                             ctypes.c_void_p(2))
+        assert ret == 0, ret
+
+    def memcpy2d_dtoa_async():
+        ret = lib.cudaMemcpy2DToArrayAsync(ctypes.c_void_p(dst_ptr), 0, 0,
+                                           ctypes.c_void_p(src_ptr), 256, 256, 64, 3,
+                                           ctypes.c_void_p(2))
+        assert ret == 0, ret
+
+    def event_record():
+        ret = lib.cudaEventRecord(event, ctypes.c_void_p(2))
+        assert ret == 0, ret
+
+    def unmap():
+        ret = lib.cudaGraphicsUnmapResources(1, ctypes.byref(resource), ctypes.c_void_p(2))
+        assert ret == 0, ret
+
+    def frame():
+        map()
+        get_mapped_array()
+        memcpy2d_atod_async()
+        event_record()
+        unmap()
+
+    return {'map': map, 'get_mapped_array': get_mapped_array,
+            'memcpy2d_atod_async': memcpy2d_atod_async,
+            'memcpy2d_dtoa_async': memcpy2d_dtoa_async, 'event_record': event_record,
+            'unmap': unmap, 'frame': frame}
+
+
+def bound_calls(resource, event):
+    # The calls of Texture.map, copy_to_async and unmap on the calling thread's stream
+    stream = cuda.cudaStreamPerThread
+
+    def frame():
+        cuda.cuda_map_resource(resource, stream)
+        cuda.cuda_get_mapped_array(resource)
+        cuda.cuda_memcpy2d_atod_async(dst_ptr, src_ptr, 256, 64, stream)
+        cuda.cuda_event_record(event, stream)
+        cuda.cuda_unmap_resource(resource, stream)
+
+    return {
+        'map': functools.partial(cuda.cuda_map_resource, resource, stream),
+        'get_mapped_array': functools.partial(cuda.cuda_get_mapped_array, resource),
+        'memcpy2d_atod_async': functools.partial(cuda.cuda_memcpy2d_atod_async, dst_ptr,
+                                                 src_ptr, 256, 64, stream),
+        'memcpy2d_dtoa_async': functools.partial(cuda.cuda_memcpy2d_dtoa_async, dst_ptr,
+                                                 src_ptr, 256, 64, stream),
+        'event_record': functools.partial(cuda.cuda_event_record, event, stream),
+        'unmap': functools.partial(cuda.cuda_unmap_resource, resource, stream),
+        'frame': frame,
+    }
+
+
+def ns_per_call(funcs, number, rounds):
+    # Both styles are timed in alternating rounds and the fastest round counts, so load on the
+    # machine during part of the run affects both the same way
+    best = [float('inf')] * len(funcs)
+    for _ in range(rounds):
+        for i, func in enumerate(funcs):
+            best[i] = min(best[i], timeit.timeit(func, number=number) / number * 1e9)
+    return best
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as directory:
+        path = build_stub(directory)
+        unbound = unbound_calls(ctypes.CDLL(path), ctypes.c_void_p(0x10), ctypes.c_void_p(0x20))
+        cuda.load_library(path)
+        resource = cuda.GraphicsResource(ctypes.c_void_p(0x10))
+        bound = bound_calls(resource, ctypes.c_void_p(0x20))
+
+        assert cuda.cuda_get_mapped_array(resource) == 0x1000
+        try:
+            cuda.cuda_unregister_resource(resource)
+        except cuda.Gfx2CudaRuntimeError as e:
+            assert e.code == 1 and 'cudaErrorStub' in str(e)
+        else:
+            raise AssertionError("failed call did not raise")
+
+        print(f"{'call':<22}{'unbound ns':>12}{'bound ns':>12}{'speedup':>10}")
+        speedups = {}
+        for name in bound:
+            before, after = ns_per_call([unbound[name], bound[name]], number, rounds)
+            speedups[name] = before / after
+            print(f"{name:<22}{before:>12.0f}{after:>12.0f}{speedups[name]:>9.2f}x")
+        assert speedups['frame'] > 1, speedups
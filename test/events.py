@@ -0,0 +1,49 @@
+import time
+
+import gfx2cuda
+import numpy as np
+
+
+class DelayedEvent(gfx2cuda.Event):
+    # Completes a fixed time after it was created, like work still queued on the GPU
+    def __init__(self, delay):
+        self.done_at = time.perf_counter() + delay
+
+    def query(self):
+        return time.perf_counter() >= self.done_at
+
+    def wait(self):
+        time.sleep(max(self.done_at - time.perf_counter(), 0))
+
+
+if __name__ == "__main__":
+    shape = [4, 4, 4]
+    textures = [gfx2cuda.texture(shape, gfx2cuda.TextureFormat.RGBA32FLOAT,
+                                 backend=gfx2cuda.Backends.SIMULATED) for _ in range(2)]
+    tex = textures[0]
+    assert tex.is_ready()
+    with tex:
+        tex.copy_from(np.ones(shape, dtype=np.float32))
+    assert tex.is_ready()
+
+    # A copy in flight
+    tex._fence = DelayedEvent(0.05)
+    assert not tex.is_ready()
+    time.sleep(0.06)
+    assert tex.is_ready() and tex._fence is None
+
+    # Graphics work fenced on the device is covered by is_ready, wait and wait_all
+    tex.device.fence = lambda: DelayedEvent(0.05)
+    start = time.perf_counter()
+    for t in textures:
+        t.fence_graphics()
+    del tex.device.fence
+    assert not any(t.is_ready() for t in textures)
+    gfx2cuda.wait_all(textures)
+    assert time.perf_counter() - start >= 0.05
+    assert all(t.is_ready() for t in textures)
+    assert all(t._graphics_fence is None for t in textures)
+
+    tex.fence_graphics()
+    tex.wait()
+    assert tex.is_ready()
@@ -0,0 +1,38 @@
+import gfx2cuda
+import numpy as np
+
+from gfx2cuda import TextureFormat
+from gfx2cuda.convert import unpack
+
+
+if __name__ == "__main__":
+    # Every format is its own member and round trips through its DXGI code
+    assert len({fmt.dxgi_format for fmt in TextureFormat}) == len(TextureFormat)
+    assert TextureFormat.R32FLOAT is not TextureFormat.R32UINT
+    for fmt in TextureFormat:
+        assert TextureFormat.from_dxgi_format(fmt.get_dxgi_format()) is fmt
+
+    assert TextureFormat.from_channels_and_dtype(1, np.uint16, normalized=True) \
+        is TextureFormat.R16UNORM
+    assert TextureFormat.from_channels_and_dtype(4, 'uint8', normalized=True) \
+        is TextureFormat.RGBA8UNORM
+    assert TextureFormat.from_channels_and_dtype(4, '<f4') is TextureFormat.RGBA32FLOAT
+    assert TextureFormat.from_channels_and_dtype(1, 'float') is TextureFormat.R32FLOAT
+    assert TextureFormat.BGRA8UNORM.row_pitch(1920) == 7680
+    assert TextureFormat.R10G10B10A2UNORM.get_pixel_size() == 4
+
+    # BGRA textures are read in RGB order by name
+    shape = [2, 3, 4]
+    bgra = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    tex = gfx2cuda.texture(shape, TextureFormat.BGRA8UNORM, backend=gfx2cuda.Backends.SIMULATED)
+    rgb = np.zeros([2, 3, 3], dtype=np.uint8)
+    with tex:
+        tex.copy_from(bgra)
+        tex.copy_to(rgb, convert={'dtype': 'uint8', 'channels': 'RGB', 'normalize': False})
+    assert np.array_equal(rgb, bgra[..., 2::-1])
+
+    element = np.array([[[1023 | (512 << 10) | (0 << 20) | (3 << 30)]]], dtype=np.uint32)
+    assert np.array_equal(unpack(element, TextureFormat.R10G10B10A2UNORM)[0, 0], [1023, 512, 0, 3])
+    # 1.0 is exponent 15 with an empty mantissa, 0.5 is exponent 14
+    element = np.array([[[(15 << 6) | ((14 << 6) << 11) | ((15 << 5) << 22)]]], dtype=np.uint32)
+    assert np.array_equal(unpack(element, TextureFormat.R11G11B10FLOAT)[0, 0], [1.0, 0.5, 1.0])
@@ -0,0 +1,77 @@
+import gc
+
+import gfx2cuda
+import numpy as np
+
+
+if __name__ == "__main__":
+    backend = gfx2cuda.Backends.SIMULATED
+    shape = [6, 10, 4]
+    frame = np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+    tex = gfx2cuda.texture(frame, backend=backend, cpu_access=True)
+    pool = tex.device.host_pool
+    # cpu_access textures get their staging buffers up front
+    assert pool.stats()['idle'] == 2 and pool.stats()['allocations'] == 2, pool.stats()
+
+    with tex:
+        array = tex.copy_to_host()
+        assert array.shape == (6, 10, 4) and array.dtype == np.float32
+        assert np.array_equal(array, frame)
+        region = tex.copy_to_host(rect=(2, 1, 3, 4))
+        assert np.array_equal(region, frame[1:5, 2:5])
+        out = np.zeros_like(frame)
+        assert tex.copy_to_host(out) is out and np.array_equal(out, frame)
+        try:
+            tex.copy_to_host(np.zeros([2, 2], dtype=np.float32))
+            raise AssertionError("a too small out must be rejected")
+        except ValueError:
+            pass
+
+        tex.copy_from_host(np.full([2, 3, 4], -1, dtype=np.float32), dst_offset=(7, 4))
+        tex.copy_to(out)
+    expected = frame.copy()
+    expected[4:6, 7:10] = -1
+    assert np.array_equal(out, expected)
+    # Whole frames reused the reserved buffers, the region and the upload needed buffers of their
+    # own size
+    assert pool.stats()['allocations'] == 4, pool.stats()
+    del array, region
+    gc.collect()
+    allocations = pool.stats()['allocations']
+
+    # Frame n is returned by the push of frame n + 1
+    frames = []
+    with tex.readback(depth=2) as readback:
+        for i in range(5):
+            with tex:
+                tex.copy_from(np.full(shape, i, dtype=np.float32))
+            frame = readback.push()
+            if i == 0:
+                assert frame is None
+            else:
+                frames.append(frame[0, 0, 0])
+        frames += [frame[0, 0, 0] for frame in readback.drain()]
+    assert frames == [0, 1, 2, 3, 4], frames
+    del frame
+    # Staging buffers are recycled instead of allocated every frame
+    assert pool.stats()['allocations'] - allocations <= 1, pool.stats()
+    print(pool.stats())
+
+    # Pooled textures get their staging buffers too
+    gfx2cuda.set_texture_pool(gfx2cuda.TexturePool())
+    pooled = gfx2cuda.texture(shape, tex.format, cpu_access=True)
+    gfx2cuda.release(pooled)
+    pool.clear()
+    assert gfx2cuda.texture(shape, tex.format, cpu_access=True) is pooled
+    assert pool.stats()['idle'] == 2, pool.stats()
+
+    # Reservations are limited to the budget, buffers over it would be freed right away
+    pool.clear()
+    pool.max_bytes = tex.nbytes
+    gfx2cuda.texture(shape, tex.format, cpu_access=True)
+    assert pool.stats()['idle'] == 1, pool.stats()
+    allocations = pool.stats()['allocations']
+    pool.max_bytes = tex.nbytes // 2
+    gfx2cuda.texture(shape, tex.format, cpu_access=True)
+    assert pool.stats()['allocations'] == allocations and pool.stats()['idle'] == 0, pool.stats()
+    print(pool.stats())
@@ -0,0 +1,43 @@
+import os
+import statistics
+import subprocess
+import sys
+
+budget_ms = 50
+runs = 20
+
+# Modules that must stay out of `import gfx2cuda`, they are loaded when a backend or feature
+# needs them
+heavy = ['numpy', 'comtypes', 'multiprocessing.shared_memory', 'gfx2cuda.dll.d3d',
+         'gfx2cuda.dll.dxgi']
+
+probe = f"""
+import sys, time
+start = time.perf_counter()
+import gfx2cuda
+elapsed = time.perf_counter() - start
+print(elapsed * 1000, [name for name in {heavy!r} if name in sys.modules])
+"""
+
+
+def measure(env):
+    out = subprocess.check_output([sys.executable, '-c', probe], env=env, text=True)
+    ms, loaded = out.split(' ', 1)
+    return float(ms), eval(loaded)
+
+
+if __name__ == "__main__":
+    env = dict(os.environ)
+    # Time the import itself, not compiling the sources
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    measure(env)
+
+    times = []
+    for _ in range(runs):
+        ms, loaded = measure(env)
+        assert not loaded, f"import gfx2cuda loaded {loaded}"
+        times.append(ms)
+    median = statistics.median(times)
+    print(f"import gfx2cuda: median {median:.1f} ms, min {min(times):.1f} ms, "
+          f"max {max(times):.1f} ms")
+    assert median < budget_ms, f"import takes {median:.1f} ms, the budget is {budget_ms} ms"
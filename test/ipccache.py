@@ -0,0 +1,109 @@
+import gc
+import multiprocessing
+import threading
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [4, 4, 4]
+
+
+def f(handles):
+    gfx2cuda.set_ipc_cache(gfx2cuda.IpcCache(capacity=2), backend=gfx2cuda.Backends.SIMULATED)
+    cache = gfx2cuda.ipc_cache()
+
+    textures = [gfx2cuda.open_ipc_texture(handle) for handle in handles]
+    # Textures in use are never evicted, even above capacity
+    assert cache.stats() == {'opens': 4, 'hits': 0, 'evictions': 0, 'cached': 4, 'in_use': 4}
+    assert gfx2cuda.texture(int(handles[0])) is textures[0]
+
+    for tex in textures:
+        gfx2cuda.release(tex)
+    # The first texture was opened twice and is still in use, the next two were evicted on release
+    assert cache.stats() == {'opens': 4, 'hits': 1, 'evictions': 2, 'cached': 2, 'in_use': 1}
+    assert textures[1]._ptr is None and textures[1]._tex is None
+    assert textures[0]._ptr is not None and textures[3]._ptr is not None
+    gfx2cuda.release(textures[0])
+    assert cache.stats()['in_use'] == 0
+
+    # Cached textures are reopened without an open, evicted ones are opened again
+    assert gfx2cuda.open_ipc_texture(handles[3]) is textures[3]
+    reopened = gfx2cuda.open_ipc_texture(handles[1])
+    assert reopened is not textures[1]
+    array = np.zeros(shape, dtype=np.float32)
+    with reopened:
+        reopened.copy_to(array)
+    assert np.all(array == 1)
+    assert cache.stats()['opens'] == 5 and cache.stats()['hits'] == 2
+
+    # A texture dropped without release is not kept alive by the cache
+    del reopened
+    gc.collect()
+    stats = cache.stats()
+    assert stats['cached'] == 1 and stats['in_use'] == 1, stats
+    assert gfx2cuda.open_ipc_texture(handles[1]) is not None
+    assert cache.stats()['opens'] == 6
+
+
+class Opened:
+    closed = False
+
+    def _detach(self):
+        return None
+
+
+def test_concurrent_opens():
+    cache = gfx2cuda.IpcCache()
+    cached = cache.acquire('cached', Opened)
+    started = threading.Event()
+    finish = threading.Event()
+    opens = []
+
+    def slow_open():
+        opens.append(1)
+        started.set()
+        assert finish.wait(5)
+        return Opened()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.acquire('slow', slow_open)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+    # Hits on other keys do not wait for the open
+    assert cache.acquire('cached', Opened) is cached
+    finish.set()
+    for thread in threads:
+        thread.join()
+    # The key was opened once, the other threads got the same texture
+    assert len(opens) == 1 and len(results) == 3 and len(set(map(id, results))) == 1
+    assert cache.stats()['opens'] == 2 and cache.stats()['hits'] == 3, cache.stats()
+
+    # A failed open lets the next caller try again
+    def failing_open():
+        raise gfx2cuda.Gfx2CudaError("open failed")
+    try:
+        cache.acquire('failing', failing_open)
+        raise AssertionError("failed open did not raise")
+    except gfx2cuda.Gfx2CudaError:
+        pass
+    assert cache.acquire('failing', Opened) is not None
+
+
+if __name__ == "__main__":
+    test_concurrent_opens()
+
+    textures = [gfx2cuda.texture(np.full(shape, i, dtype=np.float32),
+                                 backend=gfx2cuda.Backends.SIMULATED) for i in range(4)]
+    # The process that created the textures gets them back as they are
+    assert gfx2cuda.open_ipc_texture(textures[1].ipc_handle) is textures[1]
+    assert gfx2cuda.ipc_cache().stats()['opens'] == 0
+
+    # A fresh consumer process, a forked one would inherit the producer's textures
+    handles = [tex.ipc_handle for tex in textures]
+    p = multiprocessing.get_context('spawn').Process(target=f, args=(handles,))
+    p.start()
+    p.join()
+    assert p.exitcode == 0
@@ -0,0 +1,42 @@
+from multiprocessing import Process
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [4, 4, 4]
+
+
+def f(handle):
+    tex = gfx2cuda.open_ipc_texture(handle, backend=gfx2cuda.Backends.SIMULATED)
+
+    array = np.zeros(shape, dtype=np.float32)
+
+    for i in range(5):
+        with tex.keyed(acquire_key=1, release_key=0, timeout_ms=5000):
+            tex.copy_to(array)
+            tex.copy_from(array + 1)
+
+
+if __name__ == "__main__":
+    array = np.zeros(shape, dtype=np.float32)
+
+    tex = gfx2cuda.texture(array, backend=gfx2cuda.Backends.SIMULATED, keyed_mutex=True)
+
+    p = Process(target=f, args=(tex.ipc_handle,))
+    p.start()
+
+    for i in range(5):
+        with tex.keyed(acquire_key=0, release_key=1, timeout_ms=5000):
+            tex.copy_to(array)
+            assert np.all(array == 2 * i), (array, i)
+            tex.copy_from(array + 1)
+
+    p.join()
+
+    assert tex.acquire(0, timeout_ms=5000)
+    with tex:
+        tex.copy_to(array)
+    assert np.all(array == 10)
+    assert not tex.acquire(0, timeout_ms=10)
+    tex.release(0)
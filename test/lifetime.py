@@ -0,0 +1,84 @@
+import gc
+import os
+import time
+
+import gfx2cuda
+import numpy as np
+
+
+def segment_exists(handle):
+    return os.path.exists(f"/dev/shm/gfx2cuda_{handle:x}")
+
+
+if __name__ == "__main__":
+    backend = gfx2cuda.Backends.SIMULATED
+    frame = np.ones([4, 8, 4], dtype=np.float32)
+
+    # close releases right away, also while mapped
+    tex = gfx2cuda.texture(frame, backend=backend)
+    handle = int(tex.ipc_handle)
+    tex.map()
+    tex.close()
+    assert tex.closed and not segment_exists(handle)
+    tex.close()
+
+    with gfx2cuda.closing(gfx2cuda.texture(frame, backend=backend)) as tex:
+        handle = int(tex.ipc_handle)
+        with tex:
+            tex.copy_to(np.zeros_like(frame))
+    assert tex.closed and not segment_exists(handle)
+
+    # Collected textures and buffers are queued and released later, or by flush_releases
+    gfx2cuda.finalize.queue.delay = 60
+    before = gfx2cuda.release_stats()
+    handles = []
+    for _ in range(3):
+        tex = gfx2cuda.texture(frame, backend=backend)
+        handles.append(int(tex.ipc_handle))
+    buf = gfx2cuda.shared_buffer([16], backend=backend)
+    handles.append(int(buf.ipc_handle))
+    del tex, buf
+    gc.collect()
+    stats = gfx2cuda.release_stats()
+    assert stats['pending'] == 4, stats
+    assert all(segment_exists(handle) for handle in handles)
+    assert gfx2cuda.flush_releases() == 4
+    stats = gfx2cuda.release_stats()
+    assert stats['pending'] == 0 and stats['released'] == before['released'] + 4, stats
+    assert not any(segment_exists(handle) for handle in handles)
+
+    # The background thread releases a full batch without waiting for the delay
+    gfx2cuda.finalize.queue.batch_size = 2
+    textures = [gfx2cuda.texture(frame, backend=backend) for _ in range(2)]
+    del textures
+    gc.collect()
+    for _ in range(1000):
+        if gfx2cuda.release_stats()['pending'] == 0:
+            break
+        time.sleep(0.001)
+    assert gfx2cuda.release_stats()['pending'] == 0
+
+
+    # A release raising a Gfx2CudaError is counted as failed, the thread keeps releasing
+    def fail():
+        raise gfx2cuda.exception.Gfx2CudaRuntimeError("release failed")
+
+    released = []
+    before = gfx2cuda.release_stats()
+    gfx2cuda.finalize.queue.delay = 0
+    gfx2cuda.finalize.defer(fail)
+    gfx2cuda.finalize.defer(lambda: released.append(1))
+    for _ in range(1000):
+        if gfx2cuda.release_stats()['pending'] == 0 and released:
+            break
+        time.sleep(0.001)
+    gfx2cuda.finalize.defer(lambda: released.append(2))
+    for _ in range(1000):
+        if len(released) == 2:
+            break
+        time.sleep(0.001)
+    stats = gfx2cuda.release_stats()
+    assert released == [1, 2], released
+    assert stats['failed'] == before['failed'] + 1, stats
+    assert stats['released'] == before['released'] + 2, stats
+    print(gfx2cuda.release_stats())
@@ -0,0 +1,69 @@
+import os
+import pickle
+from multiprocessing import Process
+
+# Two simulated adapters, set before the devices are discovered
+os.environ['GFX2CUDA_SIMULATED_ADAPTERS'] = '2'
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [4, 6, 4]
+
+
+def f(handle):
+    # Opened on the adapter it was created on
+    tex = gfx2cuda.open_ipc_texture(handle, backend=gfx2cuda.Backends.SIMULATED)
+    assert tex.device.luid == handle.luid
+
+    # Used from the other adapter through a staged peer copy
+    peer = gfx2cuda.open_ipc_texture(handle, device=0, backend=gfx2cuda.Backends.SIMULATED)
+    assert isinstance(peer, gfx2cuda.PeerTexture) and peer.device.luid != handle.luid
+    assert gfx2cuda.open_ipc_texture(handle, device=0) is peer
+
+    array = np.zeros(shape, dtype=np.float32)
+    with peer:
+        peer.copy_to(array)
+        assert np.all(array == 1), array
+        peer.copy_from(array + 1)
+
+    # rect and dst_offset mean the same as on the texture itself
+    src = np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+    twos = np.full(shape, 2, dtype=np.float32)
+    expected = np.zeros(shape, dtype=np.float32)
+    with tex:
+        tex.copy_from(src, rect=(2, 1, 2, 2), dst_offset=(1, 0))
+        tex.copy_to(expected)
+        tex.copy_from(twos)
+    with peer:
+        peer.copy_from(src, rect=(2, 1, 2, 2), dst_offset=(1, 0))
+        peer.copy_to(array)
+        assert np.array_equal(array, expected), array
+        # Into a wider buffer, the rows are pitched
+        wide = np.zeros([shape[0], shape[1] + 2, 4], dtype=np.float32)
+        peer.copy_to(wide, rect=(1, 0, 3, 2), dst_offset=(2, 1))
+        assert np.array_equal(wide[1:3, 2:5], expected[0:2, 1:4]), wide
+        wide[1:3, 2:5] = 0
+        assert not wide.any(), wide
+        peer.copy_from(twos)
+
+
+if __name__ == "__main__":
+    tex = gfx2cuda.texture(np.ones(shape, dtype=np.float32), device=1,
+                           backend=gfx2cuda.Backends.SIMULATED)
+    assert tex.device is gfx2cuda._instance.devices[1]
+
+    handle = tex.ipc_handle
+    assert handle.luid == tex.device.luid
+    assert pickle.loads(pickle.dumps(handle)).luid == handle.luid
+
+    p = Process(target=f, args=(handle,))
+    p.start()
+    p.join()
+    assert p.exitcode == 0
+
+    array = np.zeros(shape, dtype=np.float32)
+    with tex:
+        tex.copy_to(array)
+    assert np.all(array == 2), array
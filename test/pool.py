@@ -0,0 +1,79 @@
+import gfx2cuda
+import numpy as np
+
+
+class PendingEvent(gfx2cuda.Event):
+    # A copy that is still running until it is waited for
+    def __init__(self):
+        self.done = False
+
+    def query(self):
+        return self.done
+
+    def wait(self):
+        self.done = True
+
+
+if __name__ == "__main__":
+    backend = gfx2cuda.Backends.SIMULATED
+    fmt = gfx2cuda.TextureFormat.RGBA32FLOAT
+    shape = [4, 4, 4]
+    nbytes = 4 * 4 * fmt.get_pixel_size()
+    pool = gfx2cuda.TexturePool(max_bytes=3 * nbytes)
+    gfx2cuda.set_texture_pool(pool, backend=backend)
+
+    # Textures are recycled by size and format
+    a = gfx2cuda.texture(shape, fmt)
+    b = gfx2cuda.texture([4, 8, 4], fmt)
+    gfx2cuda.release(a)
+    gfx2cuda.release(b)
+    assert gfx2cuda.texture(shape, fmt) is a
+    assert gfx2cuda.texture([4, 8, 4], fmt) is b
+    assert gfx2cuda.texture(shape, gfx2cuda.TextureFormat.RGBA8UNORM) is not a
+    # Nor for a texture created with other flags
+    gfx2cuda.release(a)
+    d = gfx2cuda.texture(shape, fmt, cpu_access=True)
+    assert d is not a and d.cpu_access
+    gfx2cuda.release(d)
+    assert gfx2cuda.texture(shape, fmt) is a
+    assert gfx2cuda.texture(shape, fmt, cpu_access=True) is d
+    assert pool.stats() == {'hits': 4, 'misses': 4, 'evictions': 0, 'textures': 0, 'nbytes': 0}
+
+    # A texture is unmapped and its copy finished before it is pooled
+    a.map()
+    a.copy_from(np.ones(shape, dtype=np.float32))
+    event = a._fence = PendingEvent()
+    gfx2cuda.release(a)
+    assert not a._mapped and event.done and a.is_ready()
+    assert gfx2cuda.texture(shape, fmt) is a
+
+    c = gfx2cuda.texture(shape, fmt, persistent=True)
+    gfx2cuda.release(c)
+    assert not c.persistent and not c._mapped
+    assert gfx2cuda.texture(shape, fmt) is c
+
+    # The least recently released texture is evicted to stay within max_bytes
+    textures = [a, c] + [gfx2cuda.texture(shape, fmt) for _ in range(2)]
+    for tex in textures:
+        gfx2cuda.release(tex)
+    stats = pool.stats()
+    assert stats['evictions'] == 1 and stats['textures'] == 3, stats
+    assert stats['nbytes'] == 3 * nbytes, stats
+    assert all(gfx2cuda.texture(shape, fmt) is not a for _ in range(3))
+    assert len(pool) == 0
+
+    # Textures larger than the budget are not kept
+    big = gfx2cuda.texture([8, 8, 4], fmt)
+    gfx2cuda.release(big)
+    assert len(pool) == 0 and pool.stats()['evictions'] == 2
+
+    # Replacing the pool empties the old one
+    gfx2cuda.release(b)
+    assert len(pool) == 1
+    other = gfx2cuda.TexturePool()
+    gfx2cuda.set_texture_pool(other)
+    assert len(pool) == 0 and pool.stats()['evictions'] == 3
+    assert gfx2cuda.texture([4, 8, 4], fmt) is not b
+    assert other.stats()['misses'] == 1
+
+    print(pool.stats(), other.stats())
@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+
+import gfx2cuda
+import numpy as np
+
+
+if __name__ == "__main__":
+    backend = gfx2cuda.Backends.SIMULATED
+    frame = np.ones([16, 32, 4], dtype=np.float32)
+    out = np.zeros_like(frame)
+    tex = gfx2cuda.texture(frame, backend=backend)
+
+    # Nothing is recorded while profiling is off
+    with tex:
+        tex.copy_to(out)
+    assert gfx2cuda.stats() == {'counters': {}, 'stages': {}, 'textures': {}}
+
+    gfx2cuda.enable_profiling()
+    for _ in range(3):
+        with tex:
+            tex.copy_to(out)
+            tex.copy_from(out, rect=(0, 0, 8, 8))
+    # Creating a texture from an array maps it and copies the array
+    other = gfx2cuda.texture(frame, backend=backend)
+    with gfx2cuda.map_many([tex, other]):
+        tex.copy_rects_to(out, [(0, 0, 4, 4), (4, 4, 4, 4)])
+    gfx2cuda.disable_profiling()
+    with tex:
+        tex.copy_to(out)
+
+    stats = gfx2cuda.stats()
+    counters = stats['counters']
+    assert counters['maps'] == 6 and counters['unmaps'] == 6, counters
+    assert counters['copies'] == 9, counters
+    assert counters['bytes_copied'] == 4 * frame.nbytes + 3 * 8 * 8 * 16 + 2 * 4 * 4 * 16, counters
+    # One lookup per mapping, later copies reuse the mapped array
+    assert counters['mapped_arrays'] == 5, counters
+    stages = stats['stages']
+    assert stages['map']['count'] == 5 and stages['memcpy2d']['count'] == 8, stages
+    assert all(stage['total_ms'] >= stage['max_ms'] > 0 for stage in stages.values()), stages
+    assert 'gpu_ms' not in stages['memcpy2d']
+    assert len(stats['textures']) == 3, stats['textures'].keys()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trace.json')
+        count = gfx2cuda.dump_trace(path)
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+    assert count == len(events) == sum(stage['count'] for stage in stages.values())
+    assert {event['ph'] for event in events} == {'X'}
+
+    gfx2cuda.stats(reset=True)
+    assert gfx2cuda.stats()['counters'] == {}
+    print(json.dumps(stats['stages'], indent=1))
@@ -0,0 +1,54 @@
+import gfx2cuda
+import gfx2cuda.rects
+import numpy as np
+
+
+shape = [8, 8, 4]
+
+
+class DirtySource(gfx2cuda.FrameSource):
+    def __init__(self, updates):
+        fmt = gfx2cuda.TextureFormat.RGBA8UINT
+        super().__init__(shape[1], shape[0], fmt, gfx2cuda.Backends.SIMULATED)
+        self.texture = gfx2cuda.texture(shape, fmt, backend=self.backend)
+        self.updates = updates
+        self.image = np.zeros(shape, dtype=np.uint8)
+        self.count = 0
+
+    def acquire(self, timeout_ms):
+        if self.count >= len(self.updates):
+            return None, 0
+        self.count += 1
+        for x, y, w, h in self.updates[self.count - 1] or []:
+            self.image[y:y + h, x:x + w] = self.count
+        with self.texture:
+            self.texture.copy_from(self.image)
+        return self.texture, 1
+
+    def updated_rects(self):
+        return self.updates[self.count - 1]
+
+    def release(self):
+        pass
+
+
+if __name__ == "__main__":
+    rects = gfx2cuda.rects.coalesce([(0, 0, 4, 4), (2, 2, 4, 4), (4, 0, 2, 2), (10, 10, 1, 1)])
+    assert sorted(rects) == [(0, 0, 6, 6), (10, 10, 1, 1)], rects
+    # Touching rects whose bounding box would be mostly empty stay separate
+    assert len(gfx2cuda.rects.coalesce([(0, 0, 10, 1), (10, 0, 1, 10)])) == 2
+
+    assert gfx2cuda.rects.area([(0, 0, 4, 4), (2, 2, 4, 4)]) == 28
+    assert gfx2cuda.rects.coverage([(-2, -2, 4, 4)], 4, 4) == 0.25
+    assert gfx2cuda.rects.from_ltrb([(1, 2, 3, 5)]) == [(1, 2, 2, 3)]
+
+    source = DirtySource([[(0, 0, 8, 8)], [(1, 1, 2, 2)], [], [(4, 4, 4, 4), (0, 6, 2, 2)]])
+    capture = gfx2cuda.Capture(source=source, incremental=True)
+
+    fractions = []
+    for frame in capture.frames(on_timeout='stop'):
+        assert np.array_equal(frame, source.image)
+        fractions.append(capture.updated_fraction)
+
+    print(fractions)
+    assert fractions == [1.0, 4 / 64, 0.0, 20 / 64], fractions
@@ -0,0 +1,33 @@
+import gfx2cuda
+import numpy as np
+
+
+shape = [6, 8, 4]
+
+
+if __name__ == "__main__":
+    array = np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+
+    tex = gfx2cuda.texture(array, backend=gfx2cuda.Backends.SIMULATED)
+
+    crop = np.zeros([2, 3, 4], dtype=np.float32)
+    batch = np.zeros([3, 2, 2, 4], dtype=np.float32)
+    patch = np.full([2, 2, 4], -1, dtype=np.float32)
+
+    with tex as ptr:
+        tex.copy_to(crop, rect=(1, 2, 3, 2))
+        tex.copy_rects_to(batch, [(0, 0, 2, 2), (2, 2, 2, 2), (6, 4, 2, 2)])
+        tex.copy_from(patch, rect=(0, 0, 2, 2), dst_offset=(6, 4))
+        tex.copy_to(array)
+
+    assert np.array_equal(crop, np.arange(np.prod(shape)).reshape(shape)[2:4, 1:4])
+    assert np.array_equal(batch[1], array[2:4, 2:4])
+    assert np.array_equal(array[4:6, 6:8], patch)
+
+    with tex as ptr:
+        try:
+            tex.copy_to(crop, rect=(7, 0, 2, 2))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("rect outside of the texture should fail")
@@ -0,0 +1,121 @@
+from multiprocessing import Process
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [4, 4, 4]
+
+
+def f(name):
+    ring = gfx2cuda.SharedTextureRing.open(name, backend=gfx2cuda.Backends.SIMULATED)
+
+    array = np.zeros(shape, dtype=np.float32)
+    frames = [0]
+    while frames[-1] < 10:
+        frame = ring.read_latest(array, timeout=5)
+        assert frame is not None and frame > frames[-1]
+        assert np.all(array == frame)
+        frames.append(frame)
+
+    print(frames, ring.stats())
+    ring.close()
+
+
+if __name__ == "__main__":
+    ring = gfx2cuda.SharedTextureRing(3, shape, gfx2cuda.TextureFormat.RGBA32FLOAT, policy='block',
+                                      backend=gfx2cuda.Backends.SIMULATED)
+
+    p = Process(target=f, args=(ring.name,))
+    p.start()
+
+    for i in range(1, 11):
+        ring.write(np.full(shape, i, dtype=np.float32), timeout=5)
+
+    p.join()
+    assert p.exitcode == 0
+
+    stats = ring.stats()
+    assert stats['frames_written'] == 10 and stats['dropped_frames'] == 0
+
+    # Without a reader the producer can only fill the slots of frames that were already read
+    for i in range(11, 14):
+        ring.write(np.full(shape, i, dtype=np.float32), timeout=0)
+    try:
+        ring.write(np.full(shape, 14, dtype=np.float32), timeout=0.01)
+    except gfx2cuda.Gfx2CudaError:
+        pass
+    else:
+        raise AssertionError("blocking ring should time out without a reader")
+    assert ring.stats()['frames_written'] == 13
+
+    ring.close()
+
+    ring = gfx2cuda.SharedTextureRing(2, shape, gfx2cuda.TextureFormat.RGBA32FLOAT,
+                                      backend=gfx2cuda.Backends.SIMULATED)
+    for i in range(1, 6):
+        ring.write(np.full(shape, i, dtype=np.float32))
+
+    array = np.zeros(shape, dtype=np.float32)
+    assert ring.read_latest(array) == 5 and np.all(array == 5)
+    assert ring.read_latest(array) is None
+    assert ring.stats()['dropped_frames'] == 3, ring.stats()
+
+    ring.close()
+
+    # The producer laps a reader whose copy is still in flight, the read is torn and retried
+    ring = gfx2cuda.SharedTextureRing(1, shape, gfx2cuda.TextureFormat.RGBA32FLOAT,
+                                      backend=gfx2cuda.Backends.SIMULATED)
+    reader = gfx2cuda.SharedTextureRing.open(ring.name, backend=gfx2cuda.Backends.SIMULATED)
+    ring.write(np.full(shape, 1, dtype=np.float32))
+    tex = reader.textures[0]
+
+    def slow_wait():
+        del tex.wait
+        ring.write(np.full(shape, 2, dtype=np.float32))
+    tex.wait = slow_wait
+    assert reader.read_latest(array, timeout=0) is None
+    assert reader.stats()['torn_reads'] == 1
+    assert reader.read_latest(array) == 2 and np.all(array == 2)
+
+    # A slot the producer is still writing to is not read, and the timeout still applies
+    ring.write(np.full(shape, 3, dtype=np.float32))
+    ring.begin_write()
+    assert reader.read_latest(array, timeout=0) is None
+    assert reader.read_latest(array, timeout=0.01) is None and np.all(array == 2)
+    ring.end_write()
+    assert reader.read_latest(array) == 4
+
+    print(reader.stats())
+    reader.close()
+    ring.close()
+
+    # Two readers, the producer laps the first between its reads of the newest frame number and
+    # of the slot's sequence number. The frame returned is the one that was copied.
+    ring = gfx2cuda.SharedTextureRing(2, shape, gfx2cuda.TextureFormat.RGBA32FLOAT,
+                                      backend=gfx2cuda.Backends.SIMULATED)
+    readers = [gfx2cuda.SharedTextureRing.open(ring.name, backend=gfx2cuda.Backends.SIMULATED)
+               for _ in range(2)]
+    for i in range(1, 3):
+        ring.write(np.full(shape, i, dtype=np.float32))
+
+    class LappedSequence:
+        def __init__(self, seq):
+            self.seq = seq
+
+        def __getitem__(self, slot):
+            readers[0]._seq = self.seq
+            for i in range(3, 5):
+                ring.write(np.full(shape, i, dtype=np.float32))
+            return self.seq[slot]
+    readers[0]._seq = LappedSequence(readers[0]._seq)
+    frame = readers[0].read_latest(array)
+    assert frame == 4 and np.all(array == frame), (frame, array[0, 0])
+    assert readers[1].read_latest(array) == 4 and np.all(array == 4)
+    ring.write(np.full(shape, 5, dtype=np.float32))
+    for reader in readers:
+        assert reader.read_latest(array) == 5 and np.all(array == 5)
+    assert ring.stats()['frames_read'] == 5 and ring.stats()['torn_reads'] == 0, ring.stats()
+    for reader in readers:
+        reader.close()
+    ring.close()
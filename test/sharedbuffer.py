@@ -0,0 +1,74 @@
+from multiprocessing import Process
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [8, 16]
+
+
+def f(handle):
+    buf = gfx2cuda.open_ipc_buffer(handle, shape, 'float32', backend=gfx2cuda.Backends.SIMULATED)
+    with buf:
+        view = np.asarray(buf)
+        assert np.all(view == 1), view
+        view += 1
+
+
+if __name__ == "__main__":
+    buf = gfx2cuda.shared_buffer(shape, 'float32', backend=gfx2cuda.Backends.SIMULATED)
+    print(buf)
+
+    try:
+        buf.data_ptr()
+        raise AssertionError("unmapped buffer must not expose its pointer")
+    except gfx2cuda.Gfx2CudaError:
+        pass
+
+    with buf:
+        view = np.asarray(buf)
+        assert view.shape == tuple(shape) and view.dtype == np.float32
+        view[:] = 1
+        if hasattr(np, 'from_dlpack'):
+            tensor = np.from_dlpack(buf)
+            assert tensor.shape == tuple(shape)
+            assert tensor.__array_interface__['data'][0] == buf.data_ptr()
+            assert np.all(tensor == 1)
+            del tensor
+
+        # The consumer's stream waits for the map, None is the legacy default stream and -1 opts
+        # out
+        waits = []
+
+        class RecordingEvent(gfx2cuda.Event):
+            def wait_stream(self, stream):
+                waits.append(stream)
+        buf._record_event = lambda stream: RecordingEvent()
+        buf.__dlpack__(stream=5)
+        buf.__dlpack__()
+        buf.__dlpack__(stream=-1)
+        assert waits == [5, 1], waits
+        del buf._record_event
+
+    if hasattr(np, 'from_dlpack'):
+        flags = gfx2cuda.shared_buffer([4], 'bool', backend=gfx2cuda.Backends.SIMULATED)
+        with flags:
+            np.asarray(flags)[:] = [True, False, True, False]
+            tensor = np.from_dlpack(flags)
+            assert tensor.dtype == np.bool_ and tensor.tolist() == [True, False, True, False]
+            del tensor
+    times = gfx2cuda.shared_buffer([4], 'datetime64[s]', backend=gfx2cuda.Backends.SIMULATED)
+    with times:
+        try:
+            times.__dlpack__()
+            raise AssertionError("datetime64 has no DLPack data type")
+        except gfx2cuda.Gfx2CudaError:
+            pass
+
+    p = Process(target=f, args=(buf.ipc_handle,))
+    p.start()
+    p.join()
+    assert p.exitcode == 0
+
+    with buf:
+        assert np.all(np.asarray(buf) == 2)
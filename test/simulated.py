@@ -0,0 +1,57 @@
+from multiprocessing import Process
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [4, 4, 4]
+
+
+def f(handle):
+    tex = gfx2cuda.open_ipc_texture(handle, backend=gfx2cuda.Backends.SIMULATED)
+
+    print(tex)
+
+    array1 = np.ones(shape, dtype=np.float32)
+
+    with tex as ptr:
+        tex.copy_from(array1)
+
+
+if __name__ == "__main__":
+    array = np.zeros(shape, dtype=np.float32)
+
+    tex = gfx2cuda.texture(array, backend=gfx2cuda.Backends.SIMULATED)
+
+    p = Process(target=f, args=(tex.ipc_handle,))
+
+    p.start()
+    p.join()
+
+    with tex as ptr:
+        tex.copy_to(array)
+
+    print(array)
+
+    assert np.array_equal(array, np.ones(shape))
+
+    try:
+        tex.copy_to(array)
+    except gfx2cuda.Gfx2CudaError:
+        pass
+    else:
+        raise AssertionError("copy on unmapped texture should fail")
+
+    tex.set_persistent()
+
+    for _ in range(3):
+        with tex:
+            tex.copy_from(array)
+            tex.copy_to(array)
+
+    assert tex.saved_calls['map'] == 3 and tex.saved_calls['unmap'] == 3
+
+    tex.release_to_graphics()
+    with tex:
+        tex.copy_to(array)
+    assert tex.saved_calls['map'] == 3
@@ -0,0 +1,58 @@
+from multiprocessing import Process
+
+import gfx2cuda
+import numpy as np
+
+
+n, height, width = 3, 4, 5
+
+
+def f(handle):
+    tex = gfx2cuda.open_ipc_texture(handle, backend=gfx2cuda.Backends.SIMULATED)
+    assert tex.layers == n
+    batch = np.zeros([n, height, width, 4], dtype=np.float32)
+    with tex:
+        tex.copy_layers_to(batch)
+    assert batch[0, 0, 0, 0] == (n - 1) * height * width * 4
+
+if __name__ == "__main__":
+    tex = gfx2cuda.texture_array(n, height, width, gfx2cuda.TextureFormat.RGBA32FLOAT,
+                                 backend=gfx2cuda.Backends.SIMULATED)
+    print(tex)
+    assert tex.layers == n and tex.nbytes == n * height * width * 16
+
+    frames = np.arange(n * height * width * 4, dtype=np.float32).reshape(n, height, width, 4)
+    with tex:
+        for i in range(n):
+            tex.copy_from(frames[i], layer=i)
+        # All layers into one batch
+        batch = np.zeros_like(frames)
+        tex.copy_layers_to(batch)
+        assert np.array_equal(batch, frames)
+
+        # The same region of every layer
+        crop = np.zeros([n, 2, 3, 4], dtype=np.float32)
+        tex.copy_layers_to(crop, rect=(1, 2, 3, 2))
+        assert np.array_equal(crop, frames[:, 2:4, 1:4])
+
+        tex.copy_layers_from(frames[::-1].copy())
+        frame = np.zeros([height, width, 4], dtype=np.float32)
+        tex.copy_to(frame, layer=0)
+        assert np.array_equal(frame, frames[-1])
+
+        try:
+            tex.copy_layers_to(np.zeros([n - 1, height, width, 4], dtype=np.float32))
+            raise AssertionError("a buffer with the wrong number of layers must be rejected")
+        except ValueError:
+            pass
+        try:
+            tex.copy_to(frame, layer=n)
+            raise AssertionError("out of range layers must be rejected")
+        except ValueError:
+            pass
+
+    # Layers are part of the shared texture
+    p = Process(target=f, args=(tex.ipc_handle,))
+    p.start()
+    p.join()
+    assert p.exitcode == 0
@@ -0,0 +1,57 @@
+import os
+import time
+
+import gfx2cuda
+import numpy as np
+
+
+# 1080p RGBA8 frames, one texture and destination for each thread of the largest count
+height, width = 1080, 1920
+frames = 200
+thread_counts = [1, 2, 4, 8]
+rounds = 3
+# Allowed slowdown of the most threads against one, for the overhead of switching threads
+tolerance = 0.2
+
+
+def make_buffer(backend, value=0):
+    if backend == gfx2cuda.Backends.SIMULATED:
+        return np.full([height, width, 4], value, dtype=np.uint8)
+    import torch
+    return torch.full([height, width, 4], value, dtype=torch.uint8, device='cuda')
+
+
+if __name__ == "__main__":
+    backend = gfx2cuda.Backends[os.environ.get('GFX2CUDA_BACKEND', 'simulated').upper()]
+    count = max(thread_counts)
+    textures = [gfx2cuda.texture(make_buffer(backend, i), backend=backend) for i in range(count)]
+    outputs = [make_buffer(backend) for _ in range(count)]
+    nbytes = textures[0].nbytes
+
+    # Every run copies the same frames of all textures, only the number of threads differs. The
+    # thread counts run in alternating rounds and the fastest round counts, so load on the machine
+    # affects all of them the same way.
+    rates = dict.fromkeys(thread_counts, 0)
+    for _ in range(rounds):
+        for threads in thread_counts:
+            with gfx2cuda.CopyExecutor(max_workers=threads) as executor:
+                start = time.perf_counter()
+                futures = [executor.copy_to(textures[i % count], outputs[i % count])
+                           for i in range(frames)]
+                for future in futures:
+                    future.result()
+                elapsed = time.perf_counter() - start
+            rates[threads] = max(rates[threads], frames / elapsed)
+
+    print(f"{os.cpu_count()} CPUs, {backend.name} backend")
+    print(f"{'threads':<10}{'frames/s':>12}{'GB/s':>10}{'speedup':>10}")
+    baseline = rates[thread_counts[0]]
+    for threads, rate in rates.items():
+        print(f"{threads:<10}{rate:>12.0f}{rate * nbytes / 1e9:>10.2f}{rate / baseline:>10.2f}")
+    # Copies on per-thread streams must not serialize behind each other. Where there is nothing
+    # to overlap, on one CPU with the simulated backend, more threads must at least not be slower.
+    assert rates[count] >= baseline * (1 - tolerance), rates
+
+    for i, out in enumerate(outputs):
+        values = np.asarray(out) if backend == gfx2cuda.Backends.SIMULATED else out.cpu().numpy()
+        assert values.min() == i
@@ -0,0 +1,32 @@
+import threading
+
+import gfx2cuda
+import numpy as np
+
+
+shape = [16, 16, 4]
+
+if __name__ == "__main__":
+    tex = gfx2cuda.texture(np.ones(shape, dtype=np.float32), backend=gfx2cuda.Backends.SIMULATED)
+    handle = int(tex.ipc_handle)
+
+    # Opening the same handle from many threads yields one texture
+    opened = []
+    threads = [threading.Thread(target=lambda: opened.append(gfx2cuda.open_ipc_texture(handle)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 8 and all(t is opened[0] for t in opened)
+
+    # Jobs on the same texture take turns on its map
+    outputs = [np.zeros(shape, dtype=np.float32) for _ in range(32)]
+    with gfx2cuda.CopyExecutor(max_workers=4) as executor:
+        futures = [executor.copy_to(tex, out) for out in outputs]
+        assert all(future.result() is out for future, out in zip(futures, outputs))
+        executor.copy_from(tex, np.full(shape, 2, dtype=np.float32)).result()
+    assert all(np.all(out == 1) for out in outputs)
+    with tex:
+        tex.copy_to(outputs[0])
+    assert np.all(outputs[0] == 2)